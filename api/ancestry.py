@@ -0,0 +1,119 @@
+"""
+Denormalized ancestor chains
+
+Every member stores the IDs of its ancestors (nearest first, at most
+MAX_REFERRAL_DEPTH of them) packed as little-endian 64-bit integers.
+Chains never change after registration, so each worker keeps a bounded
+LRU of unpacked chains and payout paths can resolve the whole upline
+without touching the referral closure table.
+"""
+from array import array
+from collections import OrderedDict
+import sys
+import threading
+
+from django.conf import settings
+
+from .models import Member, ReferralRelation, MAX_REFERRAL_DEPTH
+
+_TYPECODE = 'q'
+
+
+def pack_ancestor_ids(ancestor_ids):
+    """Pack ancestor IDs into the on-disk byte representation"""
+    packed = array(_TYPECODE, ancestor_ids)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_ancestor_ids(data):
+    """Unpack a stored chain into a tuple of ancestor IDs, nearest first"""
+    if not data:
+        return ()
+    unpacked = array(_TYPECODE)
+    unpacked.frombytes(bytes(data))
+    if sys.byteorder != 'little':
+        unpacked.byteswap()
+    return tuple(unpacked)
+
+
+def chain_for_referrer(referrer):
+    """
+    Build the packed chain of a new member referred by `referrer`
+    """
+    if referrer is None:
+        return b''
+    ancestor_ids = (referrer.id,) + unpack_ancestor_ids(referrer.ancestor_chain)
+    return pack_ancestor_ids(ancestor_ids[:MAX_REFERRAL_DEPTH])
+
+
+class AncestorCache:
+    """
+    Bounded, thread-safe LRU of member ID -> ancestor ID tuple
+    """
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, member_id):
+        with self._lock:
+            ancestor_ids = self._entries.get(member_id)
+            if ancestor_ids is not None:
+                self._entries.move_to_end(member_id)
+            return ancestor_ids
+    
+    def put(self, member_id, ancestor_ids):
+        with self._lock:
+            self._entries[member_id] = ancestor_ids
+            self._entries.move_to_end(member_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+ancestor_cache = AncestorCache(settings.ANCESTOR_CACHE_SIZE)
+
+
+def get_ancestor_ids(member):
+    """
+    Return ancestor IDs of a member, nearest (level 1) first
+    
+    Args:
+        member: Member instance or member ID. An instance is unpacked in place
+            on a cache miss; a bare ID costs one two-column row read.
+    
+    Returns:
+        Tuple of ancestor IDs, empty for members without a referrer
+    """
+    member_id = member if isinstance(member, int) else member.id
+    
+    ancestor_ids = ancestor_cache.get(member_id)
+    if ancestor_ids is not None:
+        return ancestor_ids
+    
+    if isinstance(member, int):
+        chain, referrer_id = Member.objects.filter(id=member_id).values_list(
+            'ancestor_chain', 'referrer_id'
+        ).first() or (b'', None)
+    else:
+        chain, referrer_id = member.ancestor_chain, member.referrer_id
+    
+    if not chain and referrer_id is not None:
+        # Chain not backfilled yet: read the closure table, and do not cache
+        # the answer so that the backfilled chain is picked up later
+        return tuple(ReferralRelation.objects.filter(descendant_id=member_id).order_by(
+            'level'
+        ).values_list('ancestor_id', flat=True)[:MAX_REFERRAL_DEPTH])
+    
+    ancestor_ids = unpack_ancestor_ids(chain)
+    ancestor_cache.put(member_id, ancestor_ids)
+    return ancestor_ids
@@ -0,0 +1,153 @@
+"""
+Atomic balance mutations
+
+Every credit and debit is a single conditional UPDATE on the member row
+that returns the resulting balance, so concurrent workers crediting the
+same member never lose updates and no Python copy of Member has to be
+read, modified and written back.
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+from .models import Member
+
+# Transaction currency type -> Member balance column
+BALANCE_FIELDS = {
+    'cash': 'cash_balance',
+    'v_coins': 'v_coins_balance',
+}
+
+_CENT = Decimal('0.01')
+
+
+class InsufficientBalance(Exception):
+    """Raised when a debit would take a balance below zero"""
+
+
+def _to_decimal(value):
+    # SQLite may hand arithmetic results back as int or float
+    return Decimal(str(value)).quantize(_CENT)
+
+
+def _balance_field(currency_type):
+    try:
+        return BALANCE_FIELDS[currency_type]
+    except KeyError:
+        raise ValueError(f'Unknown currency type: {currency_type}')
+
+
+def credit(member_id, currency_type, amount):
+    """
+    Add amount to a member balance
+    
+    Args:
+        member_id: ID of the member to credit
+        currency_type: 'cash' or 'v_coins'
+        amount: Positive Decimal amount
+    
+    Returns:
+        New balance as Decimal
+    
+    Raises:
+        Member.DoesNotExist: If there is no such member
+    """
+    field = connection.ops.quote_name(_balance_field(currency_type))
+    table = connection.ops.quote_name(Member._meta.db_table)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {field} = {field} + %s WHERE id = %s RETURNING {field}',
+            [amount, member_id]
+        )
+        row = cursor.fetchone()
+    
+    if row is None:
+        raise Member.DoesNotExist(f'Member {member_id} does not exist')
+    return _to_decimal(row[0])
+
+
+def debit(member_id, currency_type, amount):
+    """
+    Subtract amount from a member balance only if the balance covers it
+    
+    Args:
+        member_id: ID of the member to debit
+        currency_type: 'cash' or 'v_coins'
+        amount: Positive Decimal amount
+    
+    Returns:
+        New balance as Decimal
+    
+    Raises:
+        InsufficientBalance: If the balance is lower than amount
+        Member.DoesNotExist: If there is no such member
+    """
+    field = connection.ops.quote_name(_balance_field(currency_type))
+    table = connection.ops.quote_name(Member._meta.db_table)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {field} = {field} - %s '
+            f'WHERE id = %s AND {field} >= %s RETURNING {field}',
+            [amount, member_id, amount]
+        )
+        row = cursor.fetchone()
+    
+    if row is None:
+        if not Member.objects.filter(id=member_id).exists():
+            raise Member.DoesNotExist(f'Member {member_id} does not exist')
+        raise InsufficientBalance(f'Insufficient {currency_type} balance for member {member_id}')
+    return _to_decimal(row[0])
+
+
+def credit_many(credits):
+    """
+    Apply credits to several members with a single UPDATE
+    
+    Args:
+        credits: Iterable of (member_id, currency_type, amount); several
+            entries for the same member and currency are summed
+    
+    Returns:
+        Dict of member ID -> {currency_type: new balance}
+    """
+    totals = {}
+    for member_id, currency_type, amount in credits:
+        key = (member_id, _balance_field(currency_type))
+        totals[key] = totals.get(key, Decimal('0')) + Decimal(amount)
+    
+    if not totals:
+        return {}
+    
+    quote = connection.ops.quote_name
+    table = quote(Member._meta.db_table)
+    assignments = []
+    params = []
+    
+    for field in BALANCE_FIELDS.values():
+        whens = [(member_id, amount) for (member_id, f), amount in totals.items() if f == field]
+        if not whens:
+            continue
+        cases = ' '.join('WHEN %s THEN %s' for _ in whens)
+        assignments.append(f'{quote(field)} = {quote(field)} + CASE id {cases} ELSE 0 END')
+        for member_id, amount in whens:
+            params.extend([member_id, amount])
+    
+    member_ids = sorted({member_id for member_id, _ in totals})
+    placeholders = ', '.join(['%s'] * len(member_ids))
+    params.extend(member_ids)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {", ".join(assignments)} '
+            f'WHERE id IN ({placeholders}) '
+            f'RETURNING id, {quote("cash_balance")}, {quote("v_coins_balance")}',
+            params
+        )
+        rows = cursor.fetchall()
+    
+    return {
+        member_id: {'cash': _to_decimal(cash), 'v_coins': _to_decimal(v_coins)}
+        for member_id, cash, v_coins in rows
+    }
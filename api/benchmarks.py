@@ -0,0 +1,1143 @@
+"""
+Performance scenarios for `manage.py benchmark`
+
+Every scenario runs against a throwaway test database and writes one
+result line per measured configuration.
+"""
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from collections import deque
+from io import StringIO
+
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import F
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import balances
+from .ancestry import chain_for_referrer, pack_ancestor_ids
+from .models import Member, ReferralRelation, MAX_REFERRAL_DEPTH
+
+SCENARIOS = {}
+
+
+def scenario(name, default_sizes, file_database=False):
+    """
+    Register a benchmark scenario under the given name
+    
+    Scenarios that open connections from several threads need a file-backed
+    test database instead of the default in-memory one.
+    """
+    def decorator(func):
+        func.file_database = file_database
+        SCENARIOS[name] = (func, default_sizes)
+        return func
+    return decorator
+
+
+def timed(func, repeat=5):
+    """
+    Run func several times and return (p50, p95) latency in milliseconds
+    along with the number of SQL statements issued by the last run
+    """
+    samples = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95_index = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+    return statistics.median(samples), samples[p95_index], len(queries)
+
+
+def call_view(view_class, method, path, user, data=None, **kwargs):
+    """
+    Call an API view directly, bypassing URL routing and cookie auth
+    """
+    factory = APIRequestFactory()
+    request = getattr(factory, method)(path, data, format='json')
+    force_authenticate(request, user=user)
+    return view_class.as_view()(request, **kwargs)
+
+
+def create_members(count, prefix, **fields):
+    """
+    Bulk insert synthetic members with deterministic unique identifiers
+    """
+    offset = Member.objects.count()
+    members = [
+        Member(
+            telegram_id=10_000_000_000 + offset + i,
+            first_name=f'{prefix}{i}',
+            referral_code=f'{prefix[:4].upper()}{offset + i:012d}',
+            **fields
+        )
+        for i in range(count)
+    ]
+    return Member.objects.bulk_create(members, batch_size=5000)
+
+
+def build_synthetic_tree(size, fanout=4):
+    """
+    Create a root member with `size` descendants spread breadth-first
+    over at most MAX_REFERRAL_DEPTH levels, closure rows included
+    
+    Returns:
+        The root Member instance
+    """
+    root = create_members(1, 'root')[0]
+    ancestors = {root.id: []}
+    queue = deque([(root.id, 0)])
+    pending = []
+    created = 0
+    
+    while created < size and queue:
+        parent_id, depth = queue.popleft()
+        if depth >= MAX_REFERRAL_DEPTH:
+            continue
+        batch = min(fanout, size - created)
+        pending.extend((parent_id, depth + 1) for _ in range(batch))
+        created += batch
+        # Flush lazily so children of the current level get real IDs
+        if not queue or len(pending) >= 5000:
+            queue.extend(_flush_tree_level(pending, ancestors))
+            pending = []
+    
+    if pending:
+        _flush_tree_level(pending, ancestors)
+    
+    call_command('rebuild_referral_counters', stdout=StringIO())
+    root.refresh_from_db()
+    return root
+
+
+def _flush_tree_level(pending, ancestors):
+    members = create_members(len(pending), 'node')
+    relations = []
+    created = []
+    
+    for member, (parent_id, depth) in zip(members, pending):
+        member.referrer_id = parent_id
+        chain = ([parent_id] + ancestors[parent_id])[:MAX_REFERRAL_DEPTH]
+        ancestors[member.id] = chain
+        member.ancestor_chain = pack_ancestor_ids(chain)
+        relations.extend(
+            ReferralRelation(ancestor_id=ancestor_id, descendant_id=member.id, level=level)
+            for level, ancestor_id in enumerate(chain, start=1)
+        )
+        created.append((member.id, depth))
+    
+    Member.objects.bulk_update(members, ['referrer', 'ancestor_chain'], batch_size=5000)
+    ReferralRelation.objects.bulk_create(relations, batch_size=5000)
+    return created
+
+
+@scenario('referral_tree', default_sizes=[1_000, 10_000, 100_000])
+def referral_tree(write, sizes):
+    """
+    GET /api/user/{id}/referral-tree over synthetic downlines
+    """
+    from .views import ReferralTreeView
+    
+    for size in sizes:
+        root = build_synthetic_tree(size)
+        
+        def request():
+            response = call_view(
+                ReferralTreeView, 'get', f'/api/user/{root.id}/referral-tree',
+                root, user_id=root.id
+            )
+            assert response.status_code == 200, response.status_code
+        
+        p50, p95, queries = timed(request, repeat=3)
+        write(f'descendants={size:<8} queries={queries:<3} p50={p50:9.1f}ms p95={p95:9.1f}ms')
+
+
+def legacy_build_referral_chain(new_user, referrer):
+    """
+    Previous ORM implementation of build_referral_chain, kept for comparison
+    """
+    from .views import increment_referral_counters
+    
+    ancestor_relations = ReferralRelation.objects.filter(
+        descendant=referrer,
+        level__lt=MAX_REFERRAL_DEPTH
+    ).select_related('ancestor')
+    
+    relations_to_create = [
+        ReferralRelation(ancestor=referrer, descendant=new_user, level=1)
+    ]
+    for relation in ancestor_relations:
+        if relation.ancestor.id != new_user.id:
+            relations_to_create.append(ReferralRelation(
+                ancestor=relation.ancestor,
+                descendant=new_user,
+                level=relation.level + 1
+            ))
+    
+    ReferralRelation.objects.bulk_create(relations_to_create, ignore_conflicts=True)
+    increment_referral_counters({
+        relation.ancestor_id: relation.level for relation in relations_to_create
+    })
+
+
+@scenario('registration', default_sizes=[200, 1_000])
+def registration(write, sizes):
+    """
+    Sequential registrations under a referrer sitting 10 levels deep
+    """
+    from django.db import transaction
+    from .views import build_referral_chain
+    
+    # A straight line of 10 members so every registration writes 10 closure rows
+    build_synthetic_tree(MAX_REFERRAL_DEPTH, fanout=1)
+    referrer = Member.objects.order_by('-id').first()
+    
+    for size in sizes:
+        for label, build_chain in (
+            ('legacy', legacy_build_referral_chain),
+            ('set-based', build_referral_chain),
+        ):
+            members = create_members(size, label)
+            
+            with CaptureQueriesContext(connection) as queries:
+                with transaction.atomic():
+                    build_chain(members[0], referrer)
+            
+            started = time.perf_counter()
+            for member in members[1:]:
+                with transaction.atomic():
+                    build_chain(member, referrer)
+            elapsed = time.perf_counter() - started
+            timed_count = len(members) - 1
+            
+            write(
+                f'registrations={size:<6} impl={label:<9} '
+                f'queries/reg={len(queries)} '
+                f'throughput={timed_count / elapsed:8.0f}/s '
+                f'avg={elapsed / timed_count * 1000:6.2f}ms'
+            )
+
+
+def create_leaves(count, referrer):
+    """
+    Register `count` members under referrer through the regular chain builder
+    """
+    from .views import build_referral_chain
+    
+    leaves = []
+    for member in create_members(count, 'leaf', referrer=referrer):
+        member.ancestor_chain = chain_for_referrer(referrer)
+        member.save(update_fields=['ancestor_chain'])
+        build_referral_chain(member, referrer)
+        leaves.append(member)
+    return leaves
+
+
+def build_ranked_line(depth=MAX_REFERRAL_DEPTH):
+    """
+    Straight line of members with mixed user types, returns the deepest one
+    """
+    build_synthetic_tree(depth, fanout=1)
+    line = list(Member.objects.order_by('-id')[:depth + 1])
+    for index, member in enumerate(line):
+        member.user_type = 'influencer' if index % 2 else 'player'
+        member.rank = ('standard', 'silver', 'gold', 'platinum')[index % 4]
+    Member.objects.bulk_update(line, ['user_type', 'rank'])
+    return line[0]
+
+
+@scenario('first_tournament', default_sizes=[200])
+def first_tournament(write, sizes):
+    """
+    POST /api/tournament/first-completed for members with a full 10-level upline
+    """
+    from .views import FirstTournamentCompletedView
+    
+    referrer = build_ranked_line()
+    
+    for size in sizes:
+        leaves = iter(create_leaves(size, referrer))
+        
+        def request():
+            leaf = next(leaves)
+            response = call_view(
+                FirstTournamentCompletedView, 'post', '/api/tournament/first-completed',
+                leaf, {'user_id': leaf.id, 'tournament_id': leaf.id}
+            )
+            assert len(response.data['bonuses_distributed']) == MAX_REFERRAL_DEPTH
+        
+        p50, p95, queries = timed(request, repeat=size)
+        write(f'events={size:<6} statements={queries:<3} p50={p50:7.2f}ms p95={p95:7.2f}ms')
+
+
+def legacy_credit(member_id, currency_type, amount):
+    """
+    Read-modify-write credit as the views did before balances.credit existed
+    """
+    field = balances.BALANCE_FIELDS[currency_type]
+    member = Member.objects.get(id=member_id)
+    setattr(member, field, getattr(member, field) + amount)
+    member.save(update_fields=[field])
+
+
+def run_concurrent_credits(credit_func, member_id, threads, per_thread):
+    """
+    Credit one member from several threads at once
+    
+    Returns:
+        Tuple of (elapsed seconds, number of failed credits)
+    """
+    barrier = threading.Barrier(threads)
+    failures = []
+    
+    def worker():
+        barrier.wait()
+        try:
+            for _ in range(per_thread):
+                try:
+                    credit_func(member_id, 'cash', Decimal('1.00'))
+                except Exception:
+                    failures.append(1)
+        finally:
+            connection.close()
+    
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, len(failures)
+
+
+@scenario('balance_contention', default_sizes=[2, 8, 16], file_database=True)
+def balance_contention(write, sizes):
+    """
+    Concurrent credits to a single hot member, read-modify-write vs atomic UPDATE
+    
+    Sizes are thread counts; every thread issues the same number of credits.
+    """
+    per_thread = 200
+    member = create_members(1, 'hot')[0]
+    
+    for threads in sizes:
+        for label, credit_func in (('legacy', legacy_credit), ('atomic', balances.credit)):
+            Member.objects.filter(id=member.id).update(cash_balance=0)
+            elapsed, failures = run_concurrent_credits(credit_func, member.id, threads, per_thread)
+            
+            member.refresh_from_db()
+            applied = threads * per_thread - failures
+            lost = applied - int(member.cash_balance)
+            write(
+                f'threads={threads:<3} {label:<7} credits={applied:<5} lost={lost:<5} '
+                f'errors={failures:<4} rate={applied / elapsed:8.0f}/s'
+            )
+
+
+@scenario('payout_queue', default_sizes=[1, 5, 10])
+def payout_queue(write, sizes):
+    """
+    First tournament webhook latency, synchronous payout vs queued job
+    
+    Sizes are upline depths. Queued jobs are drained afterwards to report
+    worker throughput.
+    """
+    from django.test import override_settings
+    
+    from .jobs import process_batch
+    from .views import FirstTournamentCompletedView
+    
+    requests = 200
+    
+    for depth in sizes:
+        connection.queries_log.clear()
+        referrer = build_ranked_line(depth - 1) if depth > 1 else create_members(1, 'root')[0]
+        
+        for label, async_mode in (('sync', False), ('queued', True)):
+            leaves = iter(create_leaves(requests, referrer))
+            
+            def request():
+                leaf = next(leaves)
+                call_view(
+                    FirstTournamentCompletedView, 'post', '/api/tournament/first-completed',
+                    leaf, {'user_id': leaf.id, 'tournament_id': leaf.id}
+                )
+            
+            with override_settings(PAYOUTS_ASYNC=async_mode):
+                p50, p95, queries = timed(request, repeat=requests)
+            write(
+                f'depth={depth:<3} {label:<7} statements={queries:<3} '
+                f'p50={p50:7.2f}ms p95={p95:7.2f}ms'
+            )
+        
+        started = time.perf_counter()
+        drained = 0
+        while True:
+            succeeded, failed = process_batch(100)
+            if not succeeded + failed:
+                break
+            drained += succeeded
+        elapsed = time.perf_counter() - started
+        write(f'depth={depth:<3} worker  jobs={drained:<5} rate={drained / elapsed:8.0f}/s')
+
+
+def build_events(members, count):
+    """
+    Alternate first tournament and deposit events over distinct members
+    """
+    events = []
+    for index, member in enumerate(members[:count]):
+        if index % 2:
+            events.append({'type': 'deposit', 'user_id': member.id, 'amount': '100', 'deposit_id': f'D{index}'})
+        else:
+            events.append({'type': 'first_tournament', 'user_id': member.id, 'tournament_id': 'T1'})
+    return events
+
+
+@scenario('event_batch', default_sizes=[1, 100, 10_000])
+def event_batch(write, sizes):
+    """
+    POST /api/events/batch vs one webhook call per event
+    
+    Every measurement runs in a rolled back transaction over the same tree.
+    """
+    from django.db import transaction as db_transaction
+    
+    from .views import DepositProcessedView, EventBatchView, FirstTournamentCompletedView
+    
+    root = build_synthetic_tree(max(sizes), fanout=4)
+    Member.objects.annotate(odd=F('id') % 2).filter(odd=1).update(user_type='influencer')
+    members = list(Member.objects.exclude(id=root.id).order_by('-id'))
+    
+    def measure(func):
+        with db_transaction.atomic():
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            db_transaction.set_rollback(True)
+        return elapsed
+    
+    for size in sizes:
+        events = build_events(members, size)
+        
+        def batch():
+            response = call_view(EventBatchView, 'post', '/api/events/batch', root, events)
+            assert response.data['processed'] == size
+        
+        # Single calls are capped so large sizes finish in reasonable time
+        single_events = events[:1_000]
+        
+        def single():
+            for event in single_events:
+                if event['type'] == 'deposit':
+                    call_view(DepositProcessedView, 'post', '/api/deposit/processed', root, event)
+                else:
+                    call_view(FirstTournamentCompletedView, 'post', '/api/tournament/first-completed', root, event)
+        
+        batch_rate = size / measure(batch)
+        single_rate = len(single_events) / measure(single)
+        write(f'events={size:<6} batch={batch_rate:8.0f}/s single={single_rate:8.0f}/s')
+
+
+@scenario('event_replay', default_sizes=[1, 10])
+def event_replay(write, sizes):
+    """
+    First tournament webhook: first delivery vs retried delivery
+    
+    Sizes are upline depths.
+    """
+    from .views import FirstTournamentCompletedView
+    
+    requests = 200
+    
+    for depth in sizes:
+        connection.queries_log.clear()
+        referrer = build_ranked_line(depth - 1) if depth > 1 else create_members(1, 'root')[0]
+        leaves = create_leaves(requests, referrer)
+        
+        for label in ('first', 'retry'):
+            pending = iter(leaves)
+            
+            def request():
+                leaf = next(pending)
+                call_view(
+                    FirstTournamentCompletedView, 'post', '/api/tournament/first-completed',
+                    leaf, {'user_id': leaf.id, 'tournament_id': 'T1'}
+                )
+            
+            p50, p95, queries = timed(request, repeat=requests)
+            write(
+                f'depth={depth:<3} {label:<6} statements={queries:<3} '
+                f'p50={p50:7.2f}ms p95={p95:7.2f}ms'
+            )
+
+
+@scenario('auth', default_sizes=[1_000])
+def auth(write, sizes):
+    """
+    CookieAuthentication.authenticate overhead per request
+    """
+    from django.test import RequestFactory
+    
+    from .sessions import create_api_session
+    from .views import CookieAuthentication
+    
+    member = create_members(1, 'auth')[0]
+    token = create_api_session(member)
+    request = RequestFactory().get('/api/auth/me')
+    request.COOKIES['session_token'] = token
+    authentication = CookieAuthentication()
+    
+    for size in sizes:
+        p50, p95, queries = timed(lambda: authentication.authenticate(request), repeat=size)
+        write(
+            f'requests={size:<6} queries={queries:<2} '
+            f'p50={p50 * 1000:7.1f}us p95={p95 * 1000:7.1f}us'
+        )
+
+
+@scenario('login', default_sizes=[500])
+def login(write, sizes):
+    """
+    Repeated POST /api/auth/telegram from one device, unchanged vs changed profile
+    
+    The changed case (new name, no session cookie) writes like every login
+    did before logins skipped unchanged profiles and reused sessions.
+    """
+    from django.test import RequestFactory
+    
+    from .views import TelegramAuthView
+    
+    member = create_members(1, 'login')[0]
+    factory = RequestFactory()
+    view = TelegramAuthView.as_view()
+    counter = iter(range(10**9))
+    
+    def post(first_name, token=None):
+        request = factory.post('/api/auth/telegram', {
+            'telegram_id': member.telegram_id,
+            'first_name': first_name,
+            'auth_date': 1,
+            'hash': 'x',
+        }, content_type='application/json')
+        if token:
+            request.COOKIES['session_token'] = token
+        response = view(request)
+        assert response.status_code == 200
+        return response.cookies['session_token'].value
+    
+    token = post(member.first_name)
+    
+    def unchanged():
+        post(member.first_name, token)
+    
+    def changed():
+        post(f'renamed{next(counter)}')
+    
+    for size in sizes:
+        for label, func in (('changed', changed), ('unchanged', unchanged)):
+            # Restore the stored profile so "unchanged" really is unchanged
+            post(member.first_name, token)
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            writes = sum(1 for query in queries.captured_queries if not query['sql'].startswith('SELECT'))
+            p50, p95, statements = timed(func, repeat=size)
+            write(
+                f'logins={size:<5} {label:<9} statements={statements:<2} writes={writes:<2} '
+                f'p50={p50:6.2f}ms p95={p95:6.2f}ms'
+            )
+
+
+@scenario('referral_codes', default_sizes=[1_000])
+def referral_codes(write, sizes):
+    """
+    Member creation with an empty referral code pool vs a filled one
+    """
+    create_members(50_000, 'existing')
+    telegram_ids = iter(range(20_000_000_000, 30_000_000_000))
+    
+    def register():
+        Member.objects.create(telegram_id=next(telegram_ids), first_name='new')
+    
+    for size in sizes:
+        for label in ('generated', 'pooled'):
+            if label == 'pooled':
+                call_command('refill_referral_codes', '--target', str(size), stdout=StringIO())
+            p50, p95, queries = timed(register, repeat=size)
+            write(
+                f'members={size:<6} {label:<9} statements={queries:<2} '
+                f'p50={p50:6.3f}ms p95={p95:6.3f}ms'
+            )
+
+
+@scenario('registration_flood', default_sizes=[10_000, 100_000])
+def registration_flood(write, sizes):
+    """
+    Registrations where 90% carry an invalid referral code, with the
+    member existence checks answered by SQLite vs by the Bloom filter
+    """
+    from .bloom import member_filter
+    from .views import RegisterWithReferralView
+    
+    factory = APIRequestFactory()
+    view = RegisterWithReferralView.as_view()
+    telegram_ids = iter(range(50_000_000_000, 60_000_000_000))
+    attempts = 2_000
+    
+    def register(referrer_code):
+        request = factory.post('/api/user/register', {
+            'telegram_id': next(telegram_ids),
+            'first_name': 'flood',
+            'referrer_code': referrer_code,
+        }, format='json')
+        return view(request)
+    
+    for size in sizes:
+        create_members(size - Member.objects.count(), 'flood')
+        codes = list(Member.objects.values_list('referral_code', flat=True)[:attempts // 10])
+        workload = [
+            codes[i // 10] if i % 10 == 0 else f'BAD{i:05d}'
+            for i in range(attempts)
+        ]
+        
+        for label in ('sqlite', 'bloom'):
+            member_filter.build()
+            if label == 'sqlite':
+                # A saturated filter answers "maybe" to everything
+                for bloom in (member_filter.telegram_ids, member_filter.referral_codes):
+                    bloom.bits[:] = b'\xff' * len(bloom.bits)
+            
+            samples = []
+            probes = 0
+            for referrer_code in workload:
+                connection.queries_log.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    register(referrer_code)
+                    samples.append((time.perf_counter() - started) * 1000)
+                probes += sum(
+                    1 for query in queries
+                    if query['sql'].startswith('SELECT') and 'FROM "members"' in query['sql']
+                )
+            samples.sort()
+            
+            write(
+                f'members={size:<7} {label:<6} member_selects/request={probes / attempts:5.2f} '
+                f'p50={statistics.median(samples):6.3f}ms p95={samples[int(0.95 * (len(samples) - 1))]:6.3f}ms'
+            )
+            if label == 'bloom':
+                stats = member_filter.stats()
+                for column in ('telegram_ids', 'referral_codes'):
+                    write(
+                        f'members={size:<7} {column:<14} negatives={stats[column]["negatives"]:<5} '
+                        f'false_positives={stats[column]["false_positives"]:<3} '
+                        f'observed_fp_rate={stats[column]["false_positive_rate"]:.4f} '
+                        f'expected_fp_rate={stats[column]["expected_false_positive_rate"]:.4f}'
+                    )
+
+
+@scenario('deep_pages', default_sizes=[1, 100, 1_000, 10_000])
+def deep_pages(write, sizes):
+    """
+    Admin transaction log at increasing depth, OFFSET pages vs cursors
+    """
+    from .models import Transaction
+    from .pagination import encode_cursor
+    from .views import AdminTransactionListView
+    
+    page_size = 20
+    admin, member = create_members(2, 'pages')
+    admin.is_admin = True
+    transactions = [
+        Transaction(user=member, amount=Decimal('1.00'), currency_type='v_coins', transaction_type='referral_bonus')
+        for _ in range(max(sizes) * page_size)
+    ]
+    Transaction.objects.bulk_create(transactions, batch_size=5000)
+    ordered = Transaction.objects.order_by('-created_at', '-id')
+    
+    for page in sizes:
+        paths = {'offset': f'/api/admin/transactions?page={page}&page_size={page_size}'}
+        if page == 1:
+            paths['cursor'] = f'/api/admin/transactions?cursor=&page_size={page_size}'
+        else:
+            boundary = ordered[(page - 1) * page_size - 1]
+            paths['cursor'] = (
+                f'/api/admin/transactions?cursor={encode_cursor(boundary, "next")}&page_size={page_size}'
+            )
+        
+        for label, path in paths.items():
+            def get():
+                response = call_view(AdminTransactionListView, 'get', path, admin)
+                assert len(response.data['results']) == page_size
+            
+            p50, p95, queries = timed(get, repeat=20)
+            write(
+                f'page={page:<6} {label:<6} statements={queries:<2} '
+                f'p50={p50:7.3f}ms p95={p95:7.3f}ms'
+            )
+
+
+@scenario('list_serialization', default_sizes=[20, 100])
+def list_serialization(write, sizes):
+    """
+    Fetch and serialize one page of each hot list endpoint, DRF model
+    serializers vs values() row serializers
+    """
+    from django.utils import timezone
+    
+    from .models import Notification, Transaction, Withdrawal
+    from .row_serializers import NotificationRowSerializer, TransactionRowSerializer, WithdrawalRowSerializer
+    from .serializers import NotificationSerializer, TransactionSerializer, WithdrawalSerializer
+    
+    member, related = create_members(2, 'rows')
+    count = max(sizes)
+    Transaction.objects.bulk_create([
+        Transaction(
+            user=member, amount=Decimal('12.50'), currency_type='v_coins', transaction_type='depth_bonus',
+            related_user=related, referral_level=2, description='Depth bonus from rows1 (level 2)'
+        )
+        for _ in range(count)
+    ])
+    Withdrawal.objects.bulk_create([
+        Withdrawal(
+            user=member, amount=Decimal('500'), method='card', wallet_address='4111111111111111',
+            status='completed', processed_at=timezone.now(), transaction_id='tx'
+        )
+        for _ in range(count)
+    ])
+    Notification.objects.bulk_create([
+        Notification(
+            user=member, title='Depth Bonus', message='Level 2 referral completed first tournament!',
+            notification_type='tournament_bonus', data={'amount': '12.50'}
+        )
+        for _ in range(count)
+    ])
+    
+    endpoints = (
+        ('transactions', Transaction.objects.select_related('related_user'), TransactionSerializer, TransactionRowSerializer),
+        ('withdrawals', Withdrawal.objects.all(), WithdrawalSerializer, WithdrawalRowSerializer),
+        ('notifications', Notification.objects.all(), NotificationSerializer, NotificationRowSerializer),
+    )
+    for size in sizes:
+        for name, queryset, model_serializer, row_serializer in endpoints:
+            page = queryset.filter(user=member).order_by('-created_at', '-id')
+            runs = (
+                ('drf', lambda: model_serializer(page[:size], many=True).data),
+                ('rows', lambda: row_serializer.serialize(row_serializer.rows(page)[:size])),
+            )
+            for label, func in runs:
+                p50, p95, queries = timed(func, repeat=50)
+                write(
+                    f'rows={size:<4} {name:<13} {label:<4} p50={p50:6.3f}ms p95={p95:6.3f}ms '
+                    f'rows/s={size / p50 * 1000:9,.0f}'
+                )
+
+
+@scenario('member_earnings', default_sizes=[1_000, 10_000, 100_000])
+def member_earnings(write, sizes):
+    """
+    Lifetime earnings of a member with many bonus rows, SUM over
+    transactions vs the MemberEarnings summary
+    """
+    from django.db.models import Sum
+    
+    from .earnings import rebuild_earnings, total_earnings
+    from .models import Transaction
+    
+    member, related = create_members(2, 'earnings')
+    
+    def aggregated():
+        return Transaction.objects.filter(
+            user=member,
+            transaction_type__in=['referral_bonus', 'depth_bonus', 'deposit_percent']
+        ).aggregate(total=Sum('amount'))['total'] or 0
+    
+    def summarized():
+        return total_earnings(member.id)
+    
+    for size in sizes:
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=member, amount=Decimal('12.50'), currency_type='v_coins', transaction_type='depth_bonus',
+                related_user=related, referral_level=2
+            )
+            for _ in range(size - Transaction.objects.filter(user=member).count())
+        ], batch_size=5000)
+        rebuild_earnings()
+        assert aggregated() == summarized()
+        
+        for label, func in (('sum', aggregated), ('summary', summarized)):
+            p50, p95, queries = timed(func, repeat=20)
+            write(
+                f'bonus_rows={size:<7} {label:<8} statements={queries:<2} '
+                f'p50={p50:7.3f}ms p95={p95:7.3f}ms'
+            )
+
+
+def legacy_analytics_series(start_date, now):
+    """AdminAnalyticsView series as computed before the daily rollups"""
+    from django.db.models import Sum
+    
+    from .models import Transaction
+    
+    registrations_by_day = []
+    for i in range((now.date() - start_date.date()).days + 1):
+        date = start_date.date() + timedelta(days=i)
+        registrations_by_day.append({
+            'date': date.isoformat(),
+            'count': Member.objects.filter(created_at__date=date).count()
+        })
+    activity_by_day = []
+    for i in range((now.date() - start_date.date()).days + 1):
+        date = start_date.date() + timedelta(days=i)
+        transactions = Transaction.objects.filter(created_at__date=date)
+        activity_by_day.append({
+            'date': date.isoformat(),
+            'transactions_count': transactions.count(),
+            'total_amount': float(transactions.aggregate(total=Sum('amount'))['total'] or 0)
+        })
+    return registrations_by_day, activity_by_day
+
+
+@scenario('analytics', default_sizes=[7, 30, 365])
+def analytics(write, sizes):
+    """
+    Admin analytics series over a period of `size` days, per-day queries
+    vs the daily rollups
+    """
+    from django.utils import timezone
+    
+    from .models import Transaction
+    from .rollups import activity_series, rebuild_rollups
+    
+    now = timezone.now()
+    members = create_members(2_000, 'analytics')
+    Transaction.objects.bulk_create([
+        Transaction(user=members[i % len(members)], amount=Decimal('10.00'), currency_type='v_coins',
+                    transaction_type='depth_bonus')
+        for i in range(10_000)
+    ], batch_size=5000)
+    # Spread members and transactions over the last year
+    for model in (Member, Transaction):
+        ids = list(model.objects.values_list('id', flat=True))
+        for day in range(366):
+            model.objects.filter(id__in=ids[day::366]).update(created_at=now - timedelta(days=day))
+    rebuild_rollups()
+    
+    for size in sizes:
+        start_date = now - timedelta(days=size)
+        assert legacy_analytics_series(start_date, now) == activity_series(
+            timezone.localdate(start_date), timezone.localdate(now)
+        )
+        runs = (
+            ('per_day', lambda: legacy_analytics_series(start_date, now)),
+            ('rollups', lambda: activity_series(timezone.localdate(start_date), timezone.localdate(now))),
+            ('weekly', lambda: activity_series(timezone.localdate(start_date), timezone.localdate(now), 'week')),
+        )
+        for label, func in runs:
+            # The per-day path calls SQLite's Python date cast for every row and query
+            p50, p95, queries = timed(func, repeat=1 if label == 'per_day' else 5)
+            write(
+                f'days={size:<4} {label:<8} statements={queries:<4} '
+                f'p50={p50:9.3f}ms p95={p95:9.3f}ms'
+            )
+
+
+def legacy_admin_stats():
+    """AdminStatsView statistics as computed before the shared snapshot"""
+    from django.db.models import Sum
+    
+    from .models import Transaction, Withdrawal
+    
+    return {
+        'total_users': Member.objects.count(),
+        'total_players': Member.objects.filter(user_type='player').count(),
+        'total_influencers': Member.objects.filter(user_type='influencer').count(),
+        'total_v_coins': float(Member.objects.aggregate(total=Sum('v_coins_balance'))['total'] or 0),
+        'total_cash_payouts': float(Transaction.objects.filter(
+            transaction_type='withdrawal'
+        ).aggregate(total=Sum('amount'))['total'] or 0),
+        'total_transactions': Transaction.objects.count(),
+        'pending_withdrawals': Withdrawal.objects.filter(status='pending').count(),
+        'pending_withdrawals_amount': float(Withdrawal.objects.filter(
+            status='pending'
+        ).aggregate(total=Sum('amount'))['total'] or 0)
+    }
+
+
+@scenario('admin_stats', default_sizes=[10_000, 100_000], file_database=True)
+def admin_stats_scenario(write, sizes):
+    """
+    AdminStatsView polled by the dashboard: eight separate aggregates vs one
+    per table vs the shared snapshot, fresh and stale
+    """
+    from .models import Transaction, Withdrawal
+    from .snapshots import admin_stats, compute_admin_stats
+    from .views import AdminStatsView
+    
+    admin = create_members(1, 'statsadmin', is_admin=True)[0]
+    
+    for size in sizes:
+        members = create_members(size - Member.objects.count(), 'stats', v_coins_balance=Decimal('5.00'))
+        Transaction.objects.bulk_create([
+            Transaction(user=member, amount=Decimal('10.00'), currency_type='cash', transaction_type=transaction_type)
+            for member in members
+            for transaction_type in ('deposit_percent', 'withdrawal')
+        ], batch_size=5000)
+        Withdrawal.objects.bulk_create([
+            Withdrawal(user=member, amount=Decimal('10.00'), method='card', wallet_address='x')
+            for member in members[::10]
+        ], batch_size=5000)
+        assert legacy_admin_stats() == compute_admin_stats()
+        
+        admin_stats.reset()
+        admin_stats.refresh()
+        
+        def stale_request():
+            admin_stats.computed_at -= timedelta(seconds=admin_stats.ttl)
+            admin_stats._attempted_at = float('-inf')
+            call_view(AdminStatsView, 'get', '/api/admin/stats', admin)
+        
+        runs = (
+            ('separate', legacy_admin_stats, 5),
+            ('grouped', compute_admin_stats, 5),
+            ('fresh', lambda: call_view(AdminStatsView, 'get', '/api/admin/stats', admin), 200),
+            ('stale', stale_request, 5),
+        )
+        for label, func, repeat in runs:
+            p50, p95, queries = timed(func, repeat=repeat)
+            if admin_stats._thread is not None:
+                admin_stats._thread.join()
+            write(
+                f'members={size:<7} {label:<9} statements={queries:<2} '
+                f'p50={p50:8.3f}ms p95={p95:8.3f}ms'
+            )
+
+
+@scenario('leaderboard', default_sizes=[10_000, 100_000])
+def leaderboard(write, sizes):
+    """
+    Top referrers of a tree with `size` members: closure table group-by vs
+    the in-memory leaderboards, plus the cost of reloading the boards
+    """
+    from django.db.models import Count
+    
+    from .earnings import total_earnings_many
+    from .leaderboard import leaderboards
+    from .models import MemberEarnings
+    from .views import LeaderboardView
+    
+    for size in sizes:
+        root = build_synthetic_tree(size - Member.objects.count(), fanout=4)
+        MemberEarnings.objects.all().delete()
+        MemberEarnings.objects.bulk_create([
+            MemberEarnings(member_id=member_id, total=Decimal(count) * Decimal('12.50'))
+            for member_id, count in Member.objects.filter(
+                total_referrals_count__gt=0
+            ).values_list('id', 'total_referrals_count')
+        ], batch_size=5000)
+        leaf = Member.objects.order_by('-id').first()
+        
+        def closure_group_by():
+            referrers = list(Member.objects.annotate(
+                referrals_count=Count('descendant_relations')
+            ).filter(referrals_count__gt=0).order_by('-referrals_count')[:10])
+            total_earnings_many([referrer.id for referrer in referrers])
+        
+        leaderboards.reset()
+        reload_ms = timed(leaderboards.refresh, repeat=3)[0]
+        write(f'members={size:<7} reload   p50={reload_ms:9.3f}ms')
+        
+        runs = (
+            ('group_by', closure_group_by, 3),
+            ('top10', lambda: leaderboards.board('descendants').top(10), 200),
+            ('rank', lambda: leaderboards.board('earnings').rank(leaf.id), 200),
+            ('endpoint', lambda: call_view(LeaderboardView, 'get', '/api/leaderboard?by=earnings', root), 200),
+        )
+        for label, func, repeat in runs:
+            p50, p95, queries = timed(func, repeat=repeat)
+            write(
+                f'members={size:<7} {label:<8} statements={queries:<2} '
+                f'p50={p50:9.3f}ms p95={p95:9.3f}ms'
+            )
+
+
+def legacy_user_search(search):
+    """AdminUserListView search page as computed before the FTS5 index"""
+    from django.db.models import Q
+    
+    queryset = Member.objects.filter(
+        Q(username__icontains=search) |
+        Q(first_name__icontains=search) |
+        Q(last_name__icontains=search) |
+        Q(telegram_id__icontains=search)
+    ).order_by('-created_at', '-id')
+    return queryset.count(), list(queryset[:20])
+
+
+def indexed_user_search(search):
+    """AdminUserListView search page through api.search"""
+    from .search import search_filter
+    
+    queryset = Member.objects.filter(search_filter(search)).order_by('-created_at', '-id')
+    return queryset.count(), list(queryset[:20])
+
+
+@scenario('member_search', default_sizes=[100_000, 1_000_000])
+def member_search(write, sizes):
+    """
+    Admin user search over `size` members: LIKE '%x%' scans vs the FTS5 and
+    identifier prefix indexes, paginated and ranked
+    """
+    import random
+    
+    from .search import ranked_search
+    
+    generator = random.Random(0)
+    syllables = ['an', 'iv', 'ser', 'gei', 'ma', 'ria', 'pet', 'rov', 'ole', 'ga', 'dmi', 'try', 'ko', 'lya', 'ni', 'na']
+    
+    def name():
+        return ''.join(generator.choice(syllables) for _ in range(generator.randint(2, 4))).capitalize()
+    
+    searches = ['ivan', 'ivan petr', 'an', '1000001234', 'ROOT', 'zzzz']
+    
+    for size in sizes:
+        while Member.objects.count() < size:
+            offset = Member.objects.count()
+            Member.objects.bulk_create([
+                Member(
+                    telegram_id=10_000_000_000 + offset + i,
+                    username=f'user{offset + i}' if i % 3 else None,
+                    first_name=name(),
+                    last_name=name(),
+                    referral_code=f'ROOT{offset + i:012d}'
+                )
+                for i in range(min(50_000, size - offset))
+            ], batch_size=5000)
+        
+        for search in searches:
+            # Substring and prefix matching differ, so the counts are reported, not compared
+            write(
+                f'members={size:<8} search={search!r:<13} like_matches={legacy_user_search(search)[0]} '
+                f'prefix_matches={indexed_user_search(search)[0]}'
+            )
+            runs = (
+                ('like', lambda: legacy_user_search(search), 1 if size > 100_000 else 3),
+                ('indexed', lambda: indexed_user_search(search), 5),
+                ('ranked', lambda: ranked_search(Member.objects.all(), search, 10), 5),
+            )
+            for label, func, repeat in runs:
+                p50, p95, queries = timed(func, repeat=repeat)
+                write(
+                    f'members={size:<8} search={search!r:<13} {label:<8} statements={queries:<2} '
+                    f'p50={p50:9.3f}ms p95={p95:9.3f}ms'
+                )
+
+
+def run_mixed_load(threads, seconds, write_transaction, members):
+    """
+    Run a read-heavy mix of list reads and bonus-like write transactions
+    from several threads for a fixed time
+    
+    Every fifth operation of a thread is a write: read the member, credit
+    it and record a transaction, like the bonus paths do.
+    
+    Returns:
+        Dict of operation kind -> (count, sorted latencies in ms) plus the
+        number of operations that failed with a locked database
+    """
+    import random
+    
+    from django.db import OperationalError
+    
+    from .models import Transaction
+    
+    barrier = threading.Barrier(threads)
+    latencies = {'read': [], 'write': []}
+    errors = []
+    
+    def read(member_id):
+        list(Transaction.objects.filter(user_id=member_id).order_by('-created_at')[:20])
+    
+    def write(member_id):
+        with write_transaction():
+            Member.objects.filter(id=member_id).values_list('cash_balance', flat=True).first()
+            balances.credit(member_id, 'cash', Decimal('1.00'))
+            Transaction.objects.create(
+                user_id=member_id, amount=Decimal('1.00'), currency_type='cash', transaction_type='deposit_percent'
+            )
+    
+    def worker(seed):
+        generator = random.Random(seed)
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        try:
+            operation = 0
+            while time.perf_counter() < deadline:
+                kind = 'write' if operation % 5 == 0 else 'read'
+                operation += 1
+                started = time.perf_counter()
+                try:
+                    (write if kind == 'write' else read)(generator.choice(members))
+                except OperationalError:
+                    errors.append(kind)
+                    continue
+                latencies[kind].append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+    
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return {kind: sorted(samples) for kind, samples in latencies.items()}, len(errors)
+
+
+@scenario('sqlite_profile', default_sizes=[2, 4, 8], file_database=True)
+def sqlite_profile(write, sizes):
+    """
+    Mixed read/write load from `size` threads on a file database: SQLite
+    defaults with deferred transactions vs the tuned profile with
+    BEGIN IMMEDIATE
+    """
+    from django.conf import settings
+    from django.db import transaction
+    from django.test.utils import override_settings
+    
+    from .db import immediate_atomic
+    from .models import Transaction
+    
+    seconds = 3
+    members = [member.id for member in create_members(200, 'load')]
+    Transaction.objects.bulk_create([
+        Transaction(user_id=member_id, amount=Decimal('1.00'), currency_type='cash', transaction_type='deposit_percent')
+        for member_id in members
+        for _ in range(50)
+    ], batch_size=5000)
+    
+    profiles = (
+        ('default', {'journal_mode': 'delete'}, 5.0, transaction.atomic),
+        ('tuned', settings.SQLITE_PRAGMAS, settings.DATABASES['default']['OPTIONS']['timeout'], immediate_atomic),
+    )
+    for threads in sizes:
+        for label, pragmas, timeout, write_transaction in profiles:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                # The journal mode persists in the file, switch it with no other connection open
+                connection.close()
+                connection.settings_dict['OPTIONS']['timeout'] = timeout
+                connection.ensure_connection()
+                latencies, errors = run_mixed_load(threads, seconds, write_transaction, members)
+            
+            summary = []
+            for kind in ('read', 'write'):
+                samples = latencies[kind] or [0.0]
+                p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+                summary.append(f'{kind}s={len(latencies[kind]) / seconds:7.0f}/s p95={p95:7.2f}ms')
+            write(f'threads={threads:<2} {label:<8} {" ".join(summary)} locked={errors}')
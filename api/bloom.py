@@ -0,0 +1,237 @@
+"""
+Per-worker Bloom filters in front of member existence checks
+
+Registration probes the members table for the telegram ID and the
+referral code of every request, and during bot floods most of those
+probes miss. Each worker keeps a Bloom filter of both columns so
+definite negatives are answered without touching the database. Only a
+filter hit falls through to the normal indexed lookup.
+
+The filters are built by a full scan on a background thread, first
+when the worker needs them and again at twice the size once they are
+full. Until a build is done every check answers "maybe". Members
+inserted by other workers (id above the scanned watermark) are caught up
+at most every MEMBER_FILTER_REFRESH_SECONDS, and members created by this
+worker are added immediately.
+
+A filter miss can therefore only be trusted for members that existed at
+the last catch-up. A telegram ID miss merely skips the lookup, since
+the unique constraint rejects a duplicate anyway. A referral code miss
+would reject the registration, so it catches up early and checks again,
+at most once per MEMBER_FILTER_MISS_REFRESH_SECONDS. A flood of invalid
+codes thus costs each worker a handful of catch-up scans per second, and
+a code registered elsewhere is rejected for at most that long.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Member
+from .snapshots import start_background_refresh
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter with hit/miss counters
+    """
+    
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.negatives = 0
+        self.positives = 0
+        self.false_positives = 0
+    
+    def _positions(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+    
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def peek(self, value):
+        """Membership test that leaves the counters alone"""
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+    
+    def __contains__(self, value):
+        found = self.peek(value)
+        if found:
+            self.positives += 1
+        else:
+            self.negatives += 1
+        return found
+    
+    def record_false_positive(self):
+        """Count a filter hit that the database did not confirm"""
+        self.false_positives += 1
+    
+    def stats(self):
+        """
+        Counters plus observed and expected false positive rates
+        """
+        absent_checks = self.negatives + self.false_positives
+        fill_ratio = 1 - math.exp(-self.hash_count * self.count / self.size)
+        return {
+            'items': self.count,
+            'capacity': self.capacity,
+            'size_bytes': len(self.bits),
+            'hash_count': self.hash_count,
+            'negatives': self.negatives,
+            'positives': self.positives,
+            'false_positives': self.false_positives,
+            'false_positive_rate': self.false_positives / absent_checks if absent_checks else 0.0,
+            'expected_false_positive_rate': fill_ratio ** self.hash_count,
+        }
+
+
+class MemberExistenceFilter:
+    """
+    Bloom filters of member telegram IDs and referral codes for one worker
+    """
+    
+    def __init__(self, capacity, error_rate, refresh_seconds, miss_refresh_seconds):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        # Build the filters on a background thread (off in tests)
+        self.background = True
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+    
+    def reset(self):
+        """Drop the filters; they are rebuilt on next use"""
+        self.telegram_ids = None
+        self.referral_codes = None
+        self.watermark = 0
+        self.refreshed_at = 0.0
+    
+    def _scan(self, telegram_ids, referral_codes, watermark):
+        """Add members above watermark to the filters, return the new watermark"""
+        rows = Member.objects.filter(id__gt=watermark).order_by('id').values_list(
+            'id', 'telegram_id', 'referral_code'
+        )
+        for member_id, telegram_id, referral_code in rows.iterator(chunk_size=10000):
+            telegram_ids.add(telegram_id)
+            referral_codes.add(referral_code)
+            watermark = member_id
+        return watermark
+    
+    def build(self):
+        """
+        Scan every member into new filters and swap them in
+        """
+        capacity = max(self.capacity, Member.objects.count() * 2)
+        telegram_ids = BloomFilter(capacity, self.error_rate)
+        referral_codes = BloomFilter(capacity, self.error_rate)
+        watermark = self._scan(telegram_ids, referral_codes, 0)
+        with self._lock:
+            self.telegram_ids, self.referral_codes = telegram_ids, referral_codes
+            # Members inserted while the scan ran
+            self.watermark = self._scan(telegram_ids, referral_codes, watermark)
+            self.refreshed_at = time.monotonic()
+    
+    def _schedule_build(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.background:
+                self._thread = start_background_refresh(self.build, 'member-filter')
+                return
+        self.build()
+    
+    def refresh(self, force=False, max_age=None):
+        """
+        Catch up with members inserted since the last scan
+        
+        Schedules a build if the filters are missing or full.
+        
+        Args:
+            force: Catch up even if the last scan is recent
+            max_age: Seconds the last scan may be old, refresh_seconds by default
+        """
+        if max_age is None:
+            max_age = self.refresh_seconds
+        telegram_ids = self.telegram_ids
+        if telegram_ids is None or telegram_ids.count >= telegram_ids.capacity:
+            # Full filters degrade quickly, they are rebuilt at twice the size
+            self._schedule_build()
+        with self._lock:
+            if self.telegram_ids is None:
+                return
+            if not force and time.monotonic() - self.refreshed_at < max_age:
+                return
+            self.watermark = self._scan(self.telegram_ids, self.referral_codes, self.watermark)
+            self.refreshed_at = time.monotonic()
+    
+    def add(self, member):
+        """Record a member created by this worker"""
+        with self._lock:
+            if self.telegram_ids is None:
+                return
+            self.telegram_ids.add(member.telegram_id)
+            self.referral_codes.add(member.referral_code)
+    
+    def may_have_telegram_id(self, telegram_id):
+        """
+        False means no member had this telegram ID at the last catch-up
+        
+        Only for skipping lookups: a member registered by another worker
+        since then is missed.
+        """
+        self.refresh()
+        telegram_ids = self.telegram_ids
+        if telegram_ids is None:
+            return True
+        return telegram_id in telegram_ids
+    
+    def may_have_referral_code(self, referral_code):
+        """
+        False means no member had this referral code at a catch-up at most
+        miss_refresh_seconds ago
+        """
+        self.refresh()
+        if self.referral_codes is None:
+            return True
+        if not self.referral_codes.peek(referral_code):
+            # The code may belong to a member just registered by another worker
+            self.refresh(max_age=self.miss_refresh_seconds)
+        return referral_code in self.referral_codes
+    
+    def record_false_positive(self, name):
+        """Count a hit of the named filter that the database did not confirm"""
+        bloom = getattr(self, name)
+        if bloom is not None:
+            bloom.record_false_positive()
+    
+    def stats(self):
+        if self.telegram_ids is None:
+            return {}
+        return {
+            'watermark': self.watermark,
+            'telegram_ids': self.telegram_ids.stats(),
+            'referral_codes': self.referral_codes.stats(),
+        }
+
+
+member_filter = MemberExistenceFilter(
+    settings.MEMBER_FILTER_CAPACITY,
+    settings.MEMBER_FILTER_ERROR_RATE,
+    settings.MEMBER_FILTER_REFRESH_SECONDS,
+    settings.MEMBER_FILTER_MISS_REFRESH_SECONDS
+)
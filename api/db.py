@@ -0,0 +1,56 @@
+"""
+SQLite connection profile and write transactions
+
+Every new connection runs the SQLITE_PRAGMAS of the settings: WAL
+journaling lets readers proceed while a writer commits, synchronous=NORMAL
+is durable across application crashes in WAL mode, and the mmap, page
+cache and temp_store pragmas keep hot pages in memory. The busy timeout
+and persistent connections are regular DATABASES settings.
+
+Django starts transactions with a plain (deferred) BEGIN, which only
+takes the write lock at the first write. When two such transactions have
+both read, one of them cannot upgrade and fails with "database is locked"
+at once, without waiting for the busy timeout. Bonus and withdrawal
+paths use immediate_atomic instead, which takes the write lock at BEGIN,
+so concurrent writers queue up on the busy timeout instead.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver applying settings.SQLITE_PRAGMAS
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    atomic() whose outermost transaction starts with BEGIN IMMEDIATE on SQLite
+    
+    Nested blocks are savepoints of the enclosing transaction as usual.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    
+    # Connecting resets transaction_mode from the settings, so connect first
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN has been issued, later transactions use the default again
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
@@ -0,0 +1,144 @@
+"""
+Per-member earnings rollup
+
+Stats and admin views used to SUM every bonus transaction of a member on
+each request. MemberEarnings keeps those totals instead: every code path
+inserting bonus transactions calls record_earnings in the same database
+transaction, which folds the new rows into the summaries with batched
+upserts.
+rebuild_earnings recomputes all summaries from the transactions table and
+backs the reconcile_earnings command.
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+from .models import MemberEarnings, Transaction
+
+# Transaction types that count as earnings
+EARNING_TYPES = ('referral_bonus', 'depth_bonus', 'deposit_percent')
+
+# Summary columns besides the total, by currency and by type
+CURRENCY_COLUMNS = {
+    'v_coins': 'v_coins_total',
+    'cash': 'cash_total',
+}
+TYPE_COLUMNS = {transaction_type: f'{transaction_type}_total' for transaction_type in EARNING_TYPES}
+
+SUMMARY_COLUMNS = ['total'] + list(CURRENCY_COLUMNS.values()) + list(TYPE_COLUMNS.values())
+
+# Members per upsert statement
+UPSERT_BATCH_SIZE = 1000
+
+_CENT = Decimal('0.01')
+
+
+def record_earnings(transactions):
+    """
+    Add bonus transactions to their recipients' summaries
+    
+    Transactions of other types are ignored. Must run in the transaction
+    inserting them.
+    
+    Args:
+        transactions: Iterable of Transaction instances
+    """
+    deltas = {}
+    for transaction in transactions:
+        if transaction.transaction_type not in EARNING_TYPES:
+            continue
+        amount = Decimal(transaction.amount)
+        row = deltas.setdefault(transaction.user_id, dict.fromkeys(SUMMARY_COLUMNS, Decimal('0')))
+        row['total'] += amount
+        row[CURRENCY_COLUMNS[transaction.currency_type]] += amount
+        row[TYPE_COLUMNS[transaction.transaction_type]] += amount
+    
+    if not deltas:
+        return
+    
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in SUMMARY_COLUMNS)
+    row_placeholder = '(' + ', '.join(['%s'] * (len(SUMMARY_COLUMNS) + 1)) + ')'
+    assignments = ', '.join(
+        f'{quote(column)} = {quote(column)} + excluded.{quote(column)}' for column in SUMMARY_COLUMNS
+    )
+    rows = sorted(deltas.items())
+    
+    with connection.cursor() as cursor:
+        # Chunked to stay under SQLite's bound parameter limit
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            chunk = rows[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for member_id, row in chunk:
+                params.append(member_id)
+                params.extend(row[column] for column in SUMMARY_COLUMNS)
+            cursor.execute(
+                f'INSERT INTO {quote(MemberEarnings._meta.db_table)} ({quote("member_id")}, {columns}) '
+                f'VALUES {", ".join([row_placeholder] * len(chunk))} '
+                f'ON CONFLICT ({quote("member_id")}) DO UPDATE SET {assignments}',
+                params
+            )
+
+
+def total_earnings(member_id):
+    """Return the lifetime earnings of a member as Decimal"""
+    total = MemberEarnings.objects.filter(member_id=member_id).values_list('total', flat=True).first()
+    return Decimal(str(total or 0)).quantize(_CENT)
+
+
+def member_total_earnings(member):
+    """
+    Return the lifetime earnings of a member loaded with select_related('earnings')
+    """
+    try:
+        total = member.earnings.total
+    except MemberEarnings.DoesNotExist:
+        total = 0
+    return Decimal(str(total)).quantize(_CENT)
+
+
+def total_earnings_many(member_ids):
+    """
+    Return lifetime earnings of several members
+    
+    Returns:
+        Dict of member ID -> Decimal, members without earnings included
+    """
+    totals = dict(MemberEarnings.objects.filter(member_id__in=member_ids).values_list('member_id', 'total'))
+    return {
+        member_id: Decimal(str(totals.get(member_id) or 0)).quantize(_CENT)
+        for member_id in member_ids
+    }
+
+
+def rebuild_earnings():
+    """
+    Recompute every summary from the transactions table
+    
+    Must run inside a transaction.
+    
+    Returns:
+        Number of members with earnings
+    """
+    quote = connection.ops.quote_name
+    aggregates = ['SUM(amount)']
+    aggregates += [
+        'SUM(CASE WHEN currency_type = %s THEN amount ELSE 0 END)' for _ in CURRENCY_COLUMNS
+    ]
+    aggregates += [
+        'SUM(CASE WHEN transaction_type = %s THEN amount ELSE 0 END)' for _ in TYPE_COLUMNS
+    ]
+    params = list(CURRENCY_COLUMNS) + list(TYPE_COLUMNS) + list(EARNING_TYPES)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(MemberEarnings._meta.db_table)}')
+        cursor.execute(
+            f'INSERT INTO {quote(MemberEarnings._meta.db_table)} '
+            f'({quote("member_id")}, {", ".join(quote(column) for column in SUMMARY_COLUMNS)}) '
+            f'SELECT user_id, {", ".join(aggregates)} '
+            f'FROM {quote(Transaction._meta.db_table)} '
+            f'WHERE transaction_type IN ({", ".join(["%s"] * len(EARNING_TYPES))}) '
+            f'GROUP BY user_id',
+            params
+        )
+        return cursor.rowcount
@@ -0,0 +1,69 @@
+"""
+Idempotency ledger for integration events
+
+Every applied first tournament and deposit event is recorded in
+ProcessedEvent together with the response it produced, in the same
+transaction as its payouts. Retries are answered from the ledger with a
+single unique index probe instead of re-running the payout logic.
+"""
+from django.db.models import Q
+
+from .models import ProcessedEvent
+
+
+def event_key(event_type, user_id=None, deposit_id=None):
+    """
+    Ledger key of an event: the member for first tournaments, the deposit otherwise
+    """
+    if event_type == 'first_tournament':
+        return event_type, str(user_id)
+    return event_type, str(deposit_id)
+
+
+def get_stored_response(event_type, external_id):
+    """
+    Return the stored response of an already processed event or None
+    """
+    return ProcessedEvent.objects.filter(
+        event_type=event_type,
+        external_id=external_id
+    ).values_list('response', flat=True).first()
+
+
+def get_stored_responses(keys):
+    """
+    Return stored responses for several (event_type, external_id) keys
+    
+    Returns:
+        Dict of key -> stored response for the keys already processed
+    """
+    external_ids = {}
+    for event_type, external_id in keys:
+        external_ids.setdefault(event_type, []).append(external_id)
+    if not external_ids:
+        return {}
+    
+    condition = Q()
+    for event_type, ids in external_ids.items():
+        condition |= Q(event_type=event_type, external_id__in=ids)
+    
+    return {
+        (event_type, external_id): response
+        for event_type, external_id, response in ProcessedEvent.objects.filter(
+            condition
+        ).values_list('event_type', 'external_id', 'response')
+    }
+
+
+def record_processed_event(event_type, external_id, response):
+    """
+    Record an event as processed; must run in the transaction applying it
+    
+    Raises:
+        IntegrityError: If the event has already been recorded
+    """
+    ProcessedEvent.objects.create(
+        event_type=event_type,
+        external_id=external_id,
+        response=response
+    )
@@ -0,0 +1,153 @@
+"""
+Durable payout job queue
+
+Webhooks running in async mode only record a PayoutJob row and return 202.
+The process_payout_jobs worker claims due jobs in batches and runs each
+one in its own transaction together with the status change, so a job is
+either fully paid and marked done or rolled back and retried later.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .db import immediate_atomic
+from .idempotency import event_key, get_stored_response
+from .models import Member, PayoutJob
+
+
+def enqueue_payout(job_type, dedupe_key, payload):
+    """
+    Queue a payout job unless one already exists for the same source event
+    
+    Args:
+        job_type: 'first_tournament' or 'deposit'
+        dedupe_key: Unique key of the source event
+        payload: JSON serializable job arguments
+    
+    Returns:
+        Tuple of (PayoutJob, created)
+    """
+    return PayoutJob.objects.get_or_create(
+        dedupe_key=dedupe_key,
+        defaults={
+            'job_type': job_type,
+            'payload': payload,
+            'run_after': timezone.now(),
+        }
+    )
+
+
+def claim_jobs(batch_size):
+    """
+    Atomically mark up to batch_size due jobs as processing
+    
+    Jobs left in processing by a crashed worker are reclaimed once their
+    lease has expired.
+    
+    Returns:
+        List of claimed PayoutJob instances in queue order
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.PAYOUT_JOB_LEASE_SECONDS)
+    adapt = connection.ops.adapt_datetimefield_value
+    table = connection.ops.quote_name(PayoutJob._meta.db_table)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET status = %s, locked_at = %s, attempts = attempts + 1 '
+            f'WHERE id IN ('
+            f'SELECT id FROM {table} '
+            f'WHERE (status = %s AND run_after <= %s) OR (status = %s AND locked_at < %s) '
+            f'ORDER BY id LIMIT %s'
+            f') RETURNING id',
+            ['processing', adapt(now), 'pending', adapt(now), 'processing', adapt(stale), batch_size]
+        )
+        job_ids = [row[0] for row in cursor.fetchall()]
+    
+    return list(PayoutJob.objects.filter(id__in=job_ids).order_by('id'))
+
+
+def _run_first_tournament(payload):
+    from .views import process_first_tournament_event
+    
+    stored = get_stored_response(*event_key('first_tournament', user_id=payload['user_id']))
+    if stored is not None:
+        return stored['bonuses_distributed']
+    user = Member.objects.get(id=payload['user_id'])
+    return process_first_tournament_event(user, payload['tournament_id'])['bonuses_distributed']
+
+
+def _run_deposit(payload):
+    from .views import process_deposit_event
+    
+    stored = get_stored_response(*event_key('deposit', deposit_id=payload['deposit_id']))
+    if stored is not None:
+        return stored['bonuses_distributed']
+    user = Member.objects.get(id=payload['user_id'])
+    amount = Decimal(payload['amount'])
+    return process_deposit_event(user, amount, payload['deposit_id'])['bonuses_distributed']
+
+
+JOB_HANDLERS = {
+    'first_tournament': _run_first_tournament,
+    'deposit': _run_deposit,
+}
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff in seconds after the given number of failed attempts
+    """
+    return settings.PAYOUT_JOB_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome
+    
+    Returns:
+        True if the job succeeded
+    """
+    try:
+        with immediate_atomic():
+            result = JOB_HANDLERS[job.job_type](job.payload)
+            PayoutJob.objects.filter(id=job.id).update(
+                status='done',
+                result=result,
+                last_error='',
+                processed_at=timezone.now()
+            )
+        return True
+    except Exception as exc:
+        if job.attempts >= settings.PAYOUT_JOB_MAX_ATTEMPTS:
+            fields = {'status': 'failed', 'processed_at': timezone.now()}
+        else:
+            fields = {
+                'status': 'pending',
+                'run_after': timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            }
+        PayoutJob.objects.filter(id=job.id).update(
+            last_error=f'{type(exc).__name__}: {exc}',
+            locked_at=None,
+            **fields
+        )
+        return False
+
+
+def process_batch(batch_size):
+    """
+    Claim and run one batch of due jobs
+    
+    Returns:
+        Tuple of (succeeded, failed) job counts
+    """
+    succeeded = failed = 0
+    for job in claim_jobs(batch_size):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
@@ -0,0 +1,120 @@
+"""
+Top-referrer leaderboards
+
+The scores are counters that are already maintained on write:
+Member.total_referrals_count and referrals_level_1 move with the closure
+table on registration, and MemberEarnings.total with every bonus payout.
+Each of them has a descending index.
+
+Every worker keeps the non-zero scores of each board sorted in memory, so
+top-N is a slice and a member's rank is one binary search. The boards are
+loaded from the score indexes on first use and reloaded once older than
+LEADERBOARD_REFRESH_SECONDS, on a background thread while requests keep
+reading the previous copy.
+"""
+from bisect import bisect_left
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Member, MemberEarnings
+from .snapshots import start_background_refresh
+
+# Board name -> (model, member ID column, score column)
+BOARDS = {
+    'descendants': (Member, 'id', 'total_referrals_count'),
+    'direct': (Member, 'id', 'referrals_level_1'),
+    'earnings': (MemberEarnings, 'member_id', 'total'),
+}
+
+
+class Board:
+    """
+    Members with a positive score, best first (ties by member ID)
+    """
+    
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (-row[1], row[0]))
+        self.member_ids = [member_id for member_id, _ in rows]
+        # Negated scores, ascending, for bisect
+        self._keys = [-score for _, score in rows]
+        self.scores = dict(rows)
+    
+    def __len__(self):
+        return len(self.member_ids)
+    
+    def _rank_of_score(self, score):
+        # Competition ranking: 1 + number of members with a higher score
+        return bisect_left(self._keys, -score) + 1
+    
+    def top(self, limit):
+        """List of (member ID, rank, score) of the first limit members"""
+        return [
+            (member_id, self._rank_of_score(self.scores[member_id]), self.scores[member_id])
+            for member_id in self.member_ids[:limit]
+        ]
+    
+    def rank(self, member_id):
+        """
+        Rank and score of a member
+        
+        Returns:
+            Tuple of (rank, score), rank is None for members without a score
+        """
+        score = self.scores.get(member_id)
+        if score is None:
+            return None, 0
+        return self._rank_of_score(score), score
+
+
+class Leaderboards:
+    """
+    Per-worker in-memory copy of every board
+    """
+    
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        # Reload stale boards on a background thread (off in tests)
+        self.background = True
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+    
+    def reset(self):
+        """Drop the boards; they are reloaded on next use"""
+        self.boards = None
+        self.loaded_at = float('-inf')
+    
+    def refresh(self):
+        """Reload every board from the score indexes"""
+        boards = {}
+        for name, (model, id_column, score_column) in BOARDS.items():
+            rows = model.objects.filter(**{f'{score_column}__gt': 0}).values_list(id_column, score_column)
+            boards[name] = Board(rows)
+        self.boards = boards
+        self.loaded_at = time.monotonic()
+    
+    def board(self, name):
+        """Return the named board, scheduling a reload if it is stale"""
+        boards = self.boards
+        if boards is None:
+            with self._lock:
+                if self.boards is None:
+                    self.refresh()
+            return self.boards[name]
+        if time.monotonic() - self.loaded_at >= self.refresh_seconds:
+            self._schedule_refresh()
+        return boards[name]
+    
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.background:
+                self._thread = start_background_refresh(self.refresh, 'leaderboards')
+                return
+        self.refresh()
+
+
+leaderboards = Leaderboards(settings.LEADERBOARD_REFRESH_SECONDS)
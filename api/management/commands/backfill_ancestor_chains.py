@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.ancestry import ancestor_cache, pack_ancestor_ids
+from api.models import Member, ReferralRelation
+
+
+class Command(BaseCommand):
+    help = 'Backfill packed ancestor chains on members from the closure table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of members updated per statement batch'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        
+        rows = ReferralRelation.objects.order_by(
+            'descendant_id', 'level'
+        ).values_list('descendant_id', 'ancestor_id')
+        
+        updated = 0
+        batch = []
+        current_id = None
+        chain = []
+        
+        def flush():
+            nonlocal updated
+            Member.objects.bulk_update(batch, ['ancestor_chain'])
+            updated += len(batch)
+            batch.clear()
+        
+        with transaction.atomic():
+            # Members without any ancestor relation end up with an empty chain
+            Member.objects.exclude(ancestor_chain=b'').update(ancestor_chain=b'')
+            
+            for descendant_id, ancestor_id in rows.iterator(chunk_size=batch_size):
+                if descendant_id != current_id:
+                    if current_id is not None:
+                        batch.append(Member(id=current_id, ancestor_chain=pack_ancestor_ids(chain)))
+                        if len(batch) >= batch_size:
+                            flush()
+                    current_id = descendant_id
+                    chain = []
+                chain.append(ancestor_id)
+            
+            if current_id is not None:
+                batch.append(Member(id=current_id, ancestor_chain=pack_ancestor_ids(chain)))
+            if batch:
+                flush()
+        
+        ancestor_cache.clear()
+        self.stdout.write(
+            f'Backfilled ancestor chains for {updated} members '
+            f'in {time.monotonic() - started:.2f}s'
+        )
@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from api.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = 'Run a performance scenario against a throwaway test database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            help='Override the default workload sizes of the scenario'
+        )
+    
+    def handle(self, *args, **options):
+        func, default_sizes = SCENARIOS[options['scenario']]
+        sizes = options['sizes'] or default_sizes
+        
+        if func.file_database and connection.vendor == 'sqlite':
+            # Threads cannot share the default in-memory test database
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.mkdtemp(), 'benchmark.sqlite3'
+            )
+        
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            aliases={'default'},
+            serialized_aliases=set()
+        )
+        try:
+            self.stdout.write(f"==> {options['scenario']}")
+            func(self.stdout.write, sizes)
+        finally:
+            teardown_databases(old_config, verbosity=0)
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Drain queued bonus payout jobs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of jobs claimed per batch'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit as soon as no due jobs are left'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total_succeeded = total_failed = 0
+        started = time.monotonic()
+        
+        while True:
+            close_old_connections()
+            succeeded, failed = process_batch(batch_size)
+            total_succeeded += succeeded
+            total_failed += failed
+            
+            if succeeded + failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+        
+        self.stdout.write(
+            f'Processed {total_succeeded} payout jobs ({total_failed} failed attempts) '
+            f'in {time.monotonic() - started:.2f}s'
+        )
@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import ApiSession
+
+
+class Command(BaseCommand):
+    help = 'Delete expired API and legacy Django sessions in small batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of sessions deleted per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to sleep between batches so writers can take the lock'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running and sweep again every N seconds'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options['batch_size'], options['pause'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+    
+    def sweep(self, batch_size, pause):
+        started = time.monotonic()
+        now = timezone.now()
+        
+        # Both lookups are served by the expiry index of each table
+        purged = {
+            'api': self.purge(ApiSession.objects.filter(expires_at__lte=now), batch_size, pause),
+            'legacy': self.purge(Session.objects.filter(expire_date__lte=now), batch_size, pause),
+        }
+        
+        self.stdout.write(
+            f"Purged {purged['api']} expired API sessions and {purged['legacy']} "
+            f"legacy sessions in {time.monotonic() - started:.2f}s"
+        )
+    
+    def purge(self, queryset, batch_size, pause):
+        purged = 0
+        while True:
+            with transaction.atomic():
+                keys = list(queryset.values_list('pk', flat=True)[:batch_size])
+                if not keys:
+                    return purged
+                queryset.model.objects.filter(pk__in=keys).delete()
+            purged += len(keys)
+            if len(keys) < batch_size:
+                return purged
+            time.sleep(pause)
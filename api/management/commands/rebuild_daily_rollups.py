@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily analytics rollups from members and transactions'
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        
+        with transaction.atomic():
+            rows = rebuild_rollups()
+        
+        self.stdout.write(
+            f'Rebuilt {rows} daily rollup rows in {time.monotonic() - started:.2f}s'
+        )
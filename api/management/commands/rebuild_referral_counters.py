@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from api.models import Member, ReferralRelation, REFERRAL_LEVEL_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized downline counters on members from the closure table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of members updated per statement batch'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        fields = ['total_referrals_count'] + REFERRAL_LEVEL_FIELDS
+        
+        level_counts = {
+            field: Count('id', filter=Q(level=level))
+            for level, field in enumerate(REFERRAL_LEVEL_FIELDS, start=1)
+        }
+        rows = ReferralRelation.objects.values('ancestor_id').annotate(
+            total_referrals_count=Count('id'),
+            **level_counts
+        ).order_by('ancestor_id')
+        
+        updated = 0
+        with transaction.atomic():
+            # Members without descendants have no closure rows at all
+            Member.objects.update(**{field: 0 for field in fields})
+            
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(Member(id=row['ancestor_id'], **{
+                    field: row[field] for field in fields
+                }))
+                if len(batch) >= batch_size:
+                    Member.objects.bulk_update(batch, fields)
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                Member.objects.bulk_update(batch, fields)
+                updated += len(batch)
+        
+        self.stdout.write(
+            f'Rebuilt referral counters for {updated} members '
+            f'in {time.monotonic() - started:.2f}s'
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.earnings import SUMMARY_COLUMNS, rebuild_earnings
+from api.models import MemberEarnings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-member earnings summaries from bonus transactions and report drift'
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        
+        with transaction.atomic():
+            before = {
+                row[0]: row[1:]
+                for row in MemberEarnings.objects.values_list('member_id', *SUMMARY_COLUMNS)
+            }
+            rebuilt = rebuild_earnings()
+            after = {
+                row[0]: row[1:]
+                for row in MemberEarnings.objects.values_list('member_id', *SUMMARY_COLUMNS)
+            }
+        
+        drifted = sum(
+            1 for member_id in before.keys() | after.keys()
+            if before.get(member_id) != after.get(member_id)
+        )
+        self.stdout.write(
+            f'Rebuilt earnings of {rebuilt} members, {drifted} had drifted, '
+            f'in {time.monotonic() - started:.2f}s'
+        )
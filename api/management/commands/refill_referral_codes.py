@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import ReferralCodePool, random_referral_code
+
+
+class Command(BaseCommand):
+    help = 'Top up the pool of pre-validated unique referral codes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            type=int,
+            default=settings.REFERRAL_CODE_POOL_SIZE,
+            help='Number of unused codes the pool should hold'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of candidate codes checked and inserted per batch'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running and top up again every N seconds'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            self.refill(options['target'], options['batch_size'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+    
+    def refill(self, target, batch_size):
+        started = time.monotonic()
+        initial_size = pool_size = ReferralCodePool.objects.count()
+        
+        while pool_size < target:
+            candidates = {random_referral_code() for _ in range(min(batch_size, target - pool_size))}
+            # One statement per batch, skipping codes already taken by members
+            ReferralCodePool.add_unused(candidates)
+            pool_size = ReferralCodePool.objects.count()
+        
+        self.stdout.write(
+            f'Pool holds {pool_size} referral codes ({max(pool_size - initial_size, 0)} added) '
+            f'in {time.monotonic() - started:.2f}s'
+        )
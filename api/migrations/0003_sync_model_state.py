@@ -0,0 +1,61 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_update_rank_choices'),
+    ]
+
+    operations = [
+        migrations.RenameIndex(
+            model_name='notification',
+            new_name='notificatio_user_id_c4e471_idx',
+            old_name='notificati_user_id_7c4a21_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='referralrelation',
+            new_name='referral_re_ancesto_a7e8c0_idx',
+            old_name='referral_re_ancesto_f6d3db_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='referralrelation',
+            new_name='referral_re_descend_ac4adc_idx',
+            old_name='referral_re_descend_8ae20c_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='transaction',
+            new_name='transaction_user_id_ced08a_idx',
+            old_name='transaction_user_id_40a583_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='transaction',
+            new_name='transaction_transac_ddda52_idx',
+            old_name='transaction_transac_df1d5f_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='withdrawal',
+            new_name='withdrawals_user_id_38a9fa_idx',
+            old_name='withdrawals_user_id_b29c93_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='withdrawal',
+            new_name='withdrawals_status_6bc8da_idx',
+            old_name='withdrawals_status_8e0f42_idx',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='withdrawal',
+            name='rejection_reason',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='withdrawal',
+            name='transaction_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+REFERRAL_LEVEL_FIELDS = [f'referrals_level_{level}' for level in range(1, 11)]
+BACKFILL_BATCH_SIZE = 2000
+
+
+def build_referral_counters(apps, schema_editor):
+    """
+    Count every member's descendants per level from the closure table
+    """
+    Member = apps.get_model('api', 'Member')
+    ReferralRelation = apps.get_model('api', 'ReferralRelation')
+    fields = ['total_referrals_count'] + REFERRAL_LEVEL_FIELDS
+    
+    rows = ReferralRelation.objects.values('ancestor_id').annotate(
+        total_referrals_count=Count('id'),
+        **{
+            field: Count('id', filter=Q(level=level))
+            for level, field in enumerate(REFERRAL_LEVEL_FIELDS, start=1)
+        }
+    ).order_by('ancestor_id')
+    
+    batch = []
+    for row in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        batch.append(Member(id=row['ancestor_id'], **{field: row[field] for field in fields}))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            Member.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Member.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='total_referrals_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_6',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_7',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_8',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_9',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='referrals_level_10',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(build_referral_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+from array import array
+import sys
+
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def pack_ancestor_ids(ancestor_ids):
+    packed = array('q', ancestor_ids)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def backfill_ancestor_chains(apps, schema_editor):
+    """
+    Pack every member's closure rows, nearest ancestor first, into its chain
+    """
+    Member = apps.get_model('api', 'Member')
+    ReferralRelation = apps.get_model('api', 'ReferralRelation')
+    
+    rows = ReferralRelation.objects.order_by('descendant_id', 'level').values_list(
+        'descendant_id', 'ancestor_id'
+    )
+    batch = []
+    current_id = None
+    chain = []
+    for descendant_id, ancestor_id in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        if descendant_id != current_id:
+            if current_id is not None:
+                batch.append(Member(id=current_id, ancestor_chain=pack_ancestor_ids(chain)))
+                if len(batch) >= BACKFILL_BATCH_SIZE:
+                    Member.objects.bulk_update(batch, ['ancestor_chain'])
+                    batch = []
+            current_id = descendant_id
+            chain = []
+        chain.append(ancestor_id)
+    if current_id is not None:
+        batch.append(Member(id=current_id, ancestor_chain=pack_ancestor_ids(chain)))
+    if batch:
+        Member.objects.bulk_update(batch, ['ancestor_chain'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_member_referral_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='ancestor_chain',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(backfill_ancestor_chains, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_processed_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='auth_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
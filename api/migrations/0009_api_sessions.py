@@ -0,0 +1,54 @@
+import hashlib
+
+import django.db.models.deletion
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_live_sessions(apps, schema_editor):
+    # Keep users logged in: move unexpired django_session logins over
+    Session = apps.get_model('sessions', 'Session')
+    ApiSession = apps.get_model('api', 'ApiSession')
+    Member = apps.get_model('api', 'Member')
+    
+    store = SessionStore()
+    member_ids = set(Member.objects.values_list('id', flat=True))
+    batch = []
+    for session in Session.objects.filter(expire_date__gt=timezone.now()).iterator(chunk_size=2000):
+        user_id = store.decode(session.session_data).get('user_id')
+        if user_id not in member_ids:
+            continue
+        batch.append(ApiSession(
+            token_hash=hashlib.sha256(session.session_key.encode()).hexdigest(),
+            user_id=user_id,
+            expires_at=session.expire_date
+        ))
+        if len(batch) >= 2000:
+            ApiSession.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ApiSession.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_member_auth_version'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiSession',
+            fields=[
+                ('token_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_sessions', to='api.member')),
+            ],
+            options={
+                'db_table': 'api_sessions',
+            },
+        ),
+        migrations.RunPython(copy_live_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_api_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralCodePool',
+            fields=[
+                ('code', models.CharField(max_length=20, primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'referral_code_pool',
+            },
+        ),
+    ]
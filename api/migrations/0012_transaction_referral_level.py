@@ -0,0 +1,52 @@
+import re
+
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 5000
+
+LEVEL_PATTERN = re.compile(r'level (\d+)', re.IGNORECASE)
+
+
+def backfill_referral_level(apps, schema_editor):
+    """
+    Parse the level out of bonus descriptions, one id range at a time
+    """
+    Transaction = apps.get_model('api', 'Transaction')
+    bonuses = Transaction.objects.filter(
+        transaction_type__in=['referral_bonus', 'depth_bonus', 'deposit_percent'],
+        referral_level__isnull=True
+    )
+    last_id = Transaction.objects.aggregate(last_id=models.Max('id'))['last_id'] or 0
+    
+    for start in range(0, last_id, BACKFILL_CHUNK_SIZE):
+        ids_by_level = {}
+        rows = bonuses.filter(
+            id__gt=start,
+            id__lte=start + BACKFILL_CHUNK_SIZE
+        ).values_list('id', 'description')
+        for transaction_id, description in rows:
+            match = LEVEL_PATTERN.search(description)
+            if match:
+                ids_by_level.setdefault(int(match.group(1)), []).append(transaction_id)
+        for level, ids in ids_by_level.items():
+            Transaction.objects.filter(id__in=ids).update(referral_level=level)
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0011_keyset_pagination_indexes'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='referral_level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_referral_level, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'referral_level'], name='transaction_user_id_4014ab_idx'),
+        ),
+    ]
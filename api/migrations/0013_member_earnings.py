@@ -0,0 +1,60 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+EARNING_TYPES = ['referral_bonus', 'depth_bonus', 'deposit_percent']
+
+
+def build_earnings(apps, schema_editor):
+    """
+    Summarize existing bonus transactions per member
+    """
+    Transaction = apps.get_model('api', 'Transaction')
+    MemberEarnings = apps.get_model('api', 'MemberEarnings')
+    
+    rows = Transaction.objects.filter(transaction_type__in=EARNING_TYPES).values('user_id').annotate(
+        total=Sum('amount'),
+        v_coins_total=Sum('amount', filter=Q(currency_type='v_coins')),
+        cash_total=Sum('amount', filter=Q(currency_type='cash')),
+        **{
+            f'{transaction_type}_total': Sum('amount', filter=Q(transaction_type=transaction_type))
+            for transaction_type in EARNING_TYPES
+        }
+    ).order_by('user_id')
+    
+    MemberEarnings.objects.bulk_create(
+        (
+            MemberEarnings(member_id=row.pop('user_id'), **{
+                column: value or 0 for column, value in row.items()
+            })
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0012_transaction_referral_level'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='MemberEarnings',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='earnings', serialize=False, to='api.member')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('v_coins_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cash_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('referral_bonus_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('depth_bonus_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('deposit_percent_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'db_table': 'member_earnings',
+                'indexes': [models.Index(fields=['-total'], name='member_earn_total_c4e5c2_idx')],
+            },
+        ),
+        migrations.RunPython(build_earnings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    """
+    Roll up existing members and transactions per day
+    """
+    Member = apps.get_model('api', 'Member')
+    Transaction = apps.get_model('api', 'Transaction')
+    DailyRollup = apps.get_model('api', 'DailyRollup')
+    
+    rollups = [
+        DailyRollup(date=row['day'], kind='registration', count=row['total'])
+        for row in Member.objects.annotate(day=TruncDate('created_at')).values('day').annotate(
+            total=Count('id')
+        ).order_by()
+    ]
+    rollups += [
+        DailyRollup(
+            date=row['day'],
+            kind=row['transaction_type'],
+            currency_type=row['currency_type'],
+            count=row['total'],
+            amount=row['amount']
+        )
+        for row in Transaction.objects.annotate(day=TruncDate('created_at')).values(
+            'day', 'transaction_type', 'currency_type'
+        ).annotate(total=Count('id'), amount=Sum('amount')).order_by()
+    ]
+    DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0013_member_earnings'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kind', models.CharField(max_length=30)),
+                ('currency_type', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'db_table': 'daily_rollups',
+                'unique_together': {('date', 'kind', 'currency_type')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
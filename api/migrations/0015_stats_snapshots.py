@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0014_daily_rollups'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='StatsSnapshot',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('data', models.JSONField()),
+                ('computed_at', models.DateTimeField()),
+                ('refreshing_until', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'stats_snapshots',
+            },
+        ),
+    ]
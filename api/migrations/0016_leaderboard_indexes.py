@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0015_stats_snapshots'),
+    ]
+    
+    operations = [
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['-total_referrals_count'], name='members_total_r_b90e17_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['-referrals_level_1'], name='members_referra_61b053_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+NAME_COLUMNS = 'username, first_name, last_name'
+OLD_NAMES = 'old.username, old.first_name, old.last_name'
+NEW_NAMES = 'new.username, new.first_name, new.last_name'
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0016_leaderboard_indexes'),
+    ]
+    
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                # External content table over members, rowid is the member ID
+                f"CREATE VIRTUAL TABLE member_search USING fts5("
+                f"{NAME_COLUMNS}, content='members', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+                f"CREATE TRIGGER member_search_insert AFTER INSERT ON members BEGIN "
+                f"INSERT INTO member_search(rowid, {NAME_COLUMNS}) VALUES (new.id, {NEW_NAMES}); "
+                f"END",
+                f"CREATE TRIGGER member_search_delete AFTER DELETE ON members BEGIN "
+                f"INSERT INTO member_search(member_search, rowid, {NAME_COLUMNS}) "
+                f"VALUES ('delete', old.id, {OLD_NAMES}); "
+                f"END",
+                f"CREATE TRIGGER member_search_update AFTER UPDATE OF {NAME_COLUMNS} ON members BEGIN "
+                f"INSERT INTO member_search(member_search, rowid, {NAME_COLUMNS}) "
+                f"VALUES ('delete', old.id, {OLD_NAMES}); "
+                f"INSERT INTO member_search(rowid, {NAME_COLUMNS}) VALUES (new.id, {NEW_NAMES}); "
+                f"END",
+                "INSERT INTO member_search(member_search) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER member_search_update",
+                "DROP TRIGGER member_search_delete",
+                "DROP TRIGGER member_search_insert",
+                "DROP TABLE member_search",
+            ]
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('api', '0017_member_search'),
+    ]
+    
+    operations = [
+        migrations.RemoveField(
+            model_name='member',
+            name='auth_version',
+        ),
+    ]
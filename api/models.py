@@ -1,7 +1,23 @@
-from django.db import models
+from django.db import connection, models
 import secrets
 import string
 
+MAX_REFERRAL_DEPTH = 10
+
+# Materialized per-level downline counters on Member, level 1 first
+REFERRAL_LEVEL_FIELDS = [
+    f'referrals_level_{level}' for level in range(1, MAX_REFERRAL_DEPTH + 1)
+]
+
+
+REFERRAL_CODE_CHARACTERS = string.ascii_uppercase + string.digits
+REFERRAL_CODE_LENGTH = 8
+
+
+def random_referral_code():
+    """Random referral code candidate, not checked for uniqueness"""
+    return ''.join(secrets.choice(REFERRAL_CODE_CHARACTERS) for _ in range(REFERRAL_CODE_LENGTH))
+
 
 class Member(models.Model):
     """Custom user model for the referral system"""
@@ -33,6 +49,8 @@ class Member(models.Model):
         related_name='referrals'
     )
     referral_code = models.CharField(max_length=20, unique=True, db_index=True)
+    # Packed ancestor IDs, nearest first; immutable after registration
+    ancestor_chain = models.BinaryField(default=b'', blank=True)
     
     user_type = models.CharField(
         max_length=20,
@@ -63,6 +81,19 @@ class Member(models.Model):
     
     active_referrals_count = models.IntegerField(default=0)
     
+    # Downline counters maintained together with the referral closure table
+    total_referrals_count = models.IntegerField(default=0)
+    referrals_level_1 = models.IntegerField(default=0)
+    referrals_level_2 = models.IntegerField(default=0)
+    referrals_level_3 = models.IntegerField(default=0)
+    referrals_level_4 = models.IntegerField(default=0)
+    referrals_level_5 = models.IntegerField(default=0)
+    referrals_level_6 = models.IntegerField(default=0)
+    referrals_level_7 = models.IntegerField(default=0)
+    referrals_level_8 = models.IntegerField(default=0)
+    referrals_level_9 = models.IntegerField(default=0)
+    referrals_level_10 = models.IntegerField(default=0)
+    
     is_admin = models.BooleanField(default=False)
     is_blocked = models.BooleanField(default=False)
     
@@ -72,6 +103,12 @@ class Member(models.Model):
     class Meta:
         db_table = 'members'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            # Leaderboard scores
+            models.Index(fields=['-total_referrals_count']),
+            models.Index(fields=['-referrals_level_1']),
+        ]
     
     def __str__(self):
         return f"{self.username or self.telegram_id} ({self.user_type})"
@@ -86,6 +123,20 @@ class Member(models.Model):
         """Always return False (required for DRF)"""
         return False
     
+    @property
+    def direct_referrals_count(self):
+        """Number of direct (level 1) referrals"""
+        return self.referrals_level_1
+    
+    def referrals_by_level(self):
+        """Return non-empty downline counts keyed by level as string"""
+        levels = {}
+        for level, field in enumerate(REFERRAL_LEVEL_FIELDS, start=1):
+            count = getattr(self, field)
+            if count:
+                levels[str(level)] = count
+        return levels
+    
     def has_perm(self, perm, obj=None):
         """Check if user has a specific permission (required for DRF permissions)"""
         return self.is_admin
@@ -97,16 +148,99 @@ class Member(models.Model):
     @staticmethod
     def generate_referral_code():
         """Generate a unique referral code"""
-        characters = string.ascii_uppercase + string.digits
         while True:
-            code = ''.join(secrets.choice(characters) for _ in range(8))
-            if not Member.objects.filter(referral_code=code).exists():
+            code = random_referral_code()
+            if Member.objects.filter(referral_code=code).exists():
+                continue
+            # Pooled codes are reserved for future registrations
+            if not ReferralCodePool.objects.filter(code=code).exists():
                 return code
     
     def save(self, *args, **kwargs):
         if not self.referral_code:
-            self.referral_code = self.generate_referral_code()
+            # Pre-validated pool first, probing generation only if it ran dry
+            self.referral_code = ReferralCodePool.claim() or self.generate_referral_code()
+        adding = self._state.adding
+        if adding and self.referrer_id and not self.ancestor_chain:
+            from .ancestry import chain_for_referrer
+            self.ancestor_chain = chain_for_referrer(self.referrer)
         super().save(*args, **kwargs)
+        if adding:
+            from .bloom import member_filter
+            member_filter.add(self)
+
+
+class ReferralCodePool(models.Model):
+    """Unused referral codes already checked against members, claimed at registration"""
+    
+    code = models.CharField(max_length=20, primary_key=True)
+    
+    class Meta:
+        db_table = 'referral_code_pool'
+    
+    def __str__(self):
+        return self.code
+    
+    @classmethod
+    def claim(cls):
+        """
+        Atomically remove one code from the pool
+        
+        Returns:
+            The claimed code, or None if the pool is empty
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE code = (SELECT code FROM {table} LIMIT 1) RETURNING code'
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    
+    @classmethod
+    def add_unused(cls, codes):
+        """
+        Add the codes that no member has taken and the pool does not hold yet
+        
+        The members check runs in the INSERT itself, so a code taken by
+        fallback generation meanwhile cannot enter the pool.
+        
+        Returns:
+            Number of codes added
+        """
+        codes = list(codes)
+        if not codes:
+            return 0
+        table = connection.ops.quote_name(cls._meta.db_table)
+        members = connection.ops.quote_name(Member._meta.db_table)
+        values = ', '.join(['(%s)'] * len(codes))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR IGNORE INTO {table} (code) '
+                f'SELECT candidate.column1 FROM (VALUES {values}) AS candidate '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {members} WHERE referral_code = candidate.column1)',
+                codes
+            )
+            return cursor.rowcount
+
+
+class ApiSession(models.Model):
+    """API login session identified by the SHA-256 hash of its cookie token"""
+    
+    token_hash = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='api_sessions'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'api_sessions'
+    
+    def __str__(self):
+        return f"{self.user} - session until {self.expires_at}"
 
 
 class ReferralRelation(models.Model):
@@ -169,6 +303,8 @@ class Transaction(models.Model):
         blank=True,
         related_name='related_transactions'
     )
+    # Depth of related_user below user for referral bonuses, None otherwise
+    referral_level = models.PositiveSmallIntegerField(null=True, blank=True)
     
     description = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -177,14 +313,94 @@ class Transaction(models.Model):
         db_table = 'transactions'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
             models.Index(fields=['transaction_type']),
+            models.Index(fields=['user', 'referral_level']),
         ]
     
     def __str__(self):
         return f"{self.user} - {self.amount} {self.currency_type} ({self.transaction_type})"
 
 
+class MemberEarnings(models.Model):
+    """
+    Lifetime bonus earnings of a member, kept in step with bonus transactions
+    
+    Updated in the transaction inserting the bonuses (see api.earnings) and
+    rebuilt from the transactions table by the reconcile_earnings command.
+    """
+    
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='earnings'
+    )
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    
+    # By currency
+    v_coins_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cash_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    
+    # By transaction type
+    referral_bonus_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    depth_bonus_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    deposit_percent_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    
+    class Meta:
+        db_table = 'member_earnings'
+        indexes = [
+            models.Index(fields=['-total']),
+        ]
+    
+    def __str__(self):
+        return f"{self.member_id}: {self.total}"
+
+
+class DailyRollup(models.Model):
+    """
+    Per-day activity counters for analytics
+    
+    One row per day and kind, where kind is 'registration' or a transaction
+    type; transaction rows are further split by currency. Maintained on
+    write by api.rollups and rebuilt by the rebuild_daily_rollups command.
+    """
+    
+    date = models.DateField()
+    kind = models.CharField(max_length=30)
+    currency_type = models.CharField(max_length=20, blank=True, default='')
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    
+    class Meta:
+        db_table = 'daily_rollups'
+        unique_together = [['date', 'kind', 'currency_type']]
+    
+    def __str__(self):
+        return f"{self.date} {self.kind} {self.currency_type}: {self.count}"
+
+
+class StatsSnapshot(models.Model):
+    """
+    Last computed value of an expensive aggregate, shared by all workers
+    
+    Maintained by api.snapshots. refreshing_until is the lease of the worker
+    currently recomputing the value.
+    """
+    
+    name = models.CharField(max_length=50, primary_key=True)
+    data = models.JSONField()
+    computed_at = models.DateTimeField()
+    refreshing_until = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'stats_snapshots'
+    
+    def __str__(self):
+        return f"{self.name} at {self.computed_at}"
+
+
 class Withdrawal(models.Model):
     """Withdrawal requests from users"""
     
@@ -226,6 +442,8 @@ class Withdrawal(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -265,6 +483,7 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read', '-created_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -287,4 +506,70 @@ class PushSubscription(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user} - Push Subscription"
\ No newline at end of file
+        return f"{self.user} - Push Subscription"
+
+
+class ProcessedEvent(models.Model):
+    """Idempotency ledger of applied integration events and their responses"""
+    
+    EVENT_TYPE_CHOICES = [
+        ('first_tournament', 'First Tournament'),
+        ('deposit', 'Deposit'),
+    ]
+    
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPE_CHOICES)
+    # deposit_id for deposits, member ID for first tournaments
+    external_id = models.CharField(max_length=255)
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'processed_events'
+        unique_together = [['event_type', 'external_id']]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.external_id}"
+
+
+class PayoutJob(models.Model):
+    """Queued bonus payout processed by the process_payout_jobs worker"""
+    
+    JOB_TYPE_CHOICES = [
+        ('first_tournament', 'First Tournament'),
+        ('deposit', 'Deposit'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_type = models.CharField(max_length=30, choices=JOB_TYPE_CHOICES)
+    # Unique per source event so a retried webhook never queues a second payout
+    dedupe_key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'payout_jobs'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+    
+    def __str__(self):
+        return f"{self.job_type} {self.dedupe_key} ({self.status})"
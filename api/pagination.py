@@ -0,0 +1,159 @@
+"""
+Shared pagination for list endpoints
+
+Lists are ordered newest first by (created_at, id). Two modes are
+supported:
+
+- Page numbers (?page=N, the default): OFFSET slicing with an exact
+  count, unchanged for existing clients. Deep pages get slower because
+  SQLite has to walk every skipped row.
+- Cursors (?cursor=, empty for the first page): the opaque cursor holds
+  the (created_at, id) of the boundary row, so every page is one index
+  range scan no matter how deep it is. The count is omitted unless
+  ?with_count=true asks for it, and is then served from a short-lived
+  cache instead of a full count on every page.
+"""
+import base64
+import hashlib
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+
+
+def encode_cursor(item, direction):
+    """
+    Return the opaque cursor pointing past item in direction ('next' or 'previous')
+    
+    item is a model instance or a values() row with created_at and id.
+    """
+    if isinstance(item, dict):
+        created_at, item_id = item['created_at'], item['id']
+    else:
+        created_at, item_id = item.created_at, item.id
+    payload = json.dumps([created_at.isoformat(), item_id, direction[0]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Returns:
+        Tuple of (created_at, id, direction)
+    
+    Raises:
+        ParseError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+        if created_at is None or not isinstance(item_id, int) or direction not in ('n', 'p'):
+            raise ValueError(cursor)
+    except (ValueError, TypeError):
+        raise ParseError('Invalid cursor')
+    return created_at, item_id, 'next' if direction == 'n' else 'previous'
+
+
+def cached_count(queryset):
+    """
+    Count queryset, reusing the result for PAGINATION_COUNT_CACHE_TTL seconds
+    """
+    sql, params = queryset.query.sql_with_params()
+    key = 'pagination-count:' + hashlib.sha256(f'{sql}{params}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+    return count
+
+
+def paginate(request, queryset, page, page_size):
+    """
+    Paginate queryset newest first by page number or by cursor
+    
+    Args:
+        request: The request, for the mode and the next/previous links
+        queryset: Filtered, unordered queryset of a model with created_at,
+            either of instances or of values() rows including id and created_at
+        page: Page number, ignored in cursor mode
+        page_size: Number of items per page
+    
+    Returns:
+        Tuple of (items, {'count', 'next', 'previous'}) where count is None
+        in cursor mode unless the request asked for it
+    """
+    cursor = request.query_params.get('cursor')
+    if cursor is None:
+        return _paginate_by_page(request, queryset, page, page_size)
+    return _paginate_by_cursor(request, queryset, cursor, page_size)
+
+
+def _paginate_by_page(request, queryset, page, page_size):
+    queryset = queryset.order_by('-created_at', '-id')
+    total_count = queryset.count()
+    
+    start_index = (page - 1) * page_size
+    end_index = start_index + page_size
+    items = list(queryset[start_index:end_index])
+    
+    base_url = request.build_absolute_uri(request.path)
+    next_url = None
+    previous_url = None
+    
+    if end_index < total_count:
+        next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
+    
+    if page > 1:
+        previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
+    
+    return items, {'count': total_count, 'next': next_url, 'previous': previous_url}
+
+
+def _paginate_by_cursor(request, queryset, cursor, page_size):
+    count = None
+    if request.query_params.get('with_count', '').lower() in ['true', '1', 'yes']:
+        count = cached_count(queryset)
+    
+    direction = 'next'
+    if cursor:
+        created_at, item_id, direction = decode_cursor(cursor)
+        # A plain range on created_at lets SQLite seek the (created_at, id)
+        # index; the equivalent OR of both columns makes it scan from the top
+        if direction == 'next':
+            queryset = queryset.filter(created_at__lte=created_at).exclude(
+                created_at=created_at, id__gte=item_id
+            )
+        else:
+            queryset = queryset.filter(created_at__gte=created_at).exclude(
+                created_at=created_at, id__lte=item_id
+            )
+    
+    # One extra row tells whether there is anything beyond this page
+    if direction == 'next':
+        items = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        has_next, has_previous = has_more, bool(cursor)
+    else:
+        items = list(queryset.order_by('created_at', 'id')[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size][::-1]
+        has_next, has_previous = True, has_more
+    
+    return items, {
+        'count': count,
+        'next': _cursor_url(request, items[-1], 'next') if has_next and items else None,
+        'previous': _cursor_url(request, items[0], 'previous') if has_previous and items else None,
+    }
+
+
+def _cursor_url(request, item, direction):
+    params = request.query_params.copy()
+    params['cursor'] = encode_cursor(item, direction)
+    params.pop('page', None)
+    return f"{request.build_absolute_uri(request.path)}?{urlencode(params, doseq=True)}"
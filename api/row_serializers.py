@@ -0,0 +1,131 @@
+"""
+Read-only row serializers for hot list endpoints
+
+The list views only ever output a handful of columns, so instead of
+hydrating model instances and walking DRF fields for every row they fetch
+exactly those columns with values() and render each row through a
+precomputed getter per output field. Every converter reproduces what the
+matching DRF field emits, so the JSON is byte-identical to the
+ModelSerializer output for the same rows.
+"""
+from decimal import Decimal
+from operator import itemgetter
+
+from django.utils import timezone
+
+
+def iso_datetime(value):
+    """DRF DateTimeField representation: ISO 8601 in the current time zone, 'Z' for UTC"""
+    if not value:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def decimal_string(decimal_places):
+    """Return the DRF DecimalField (coerced to string) converter for decimal_places"""
+    exponent = Decimal(1).scaleb(-decimal_places)
+    
+    def convert(value):
+        if value is None:
+            return ''
+        return f'{value.quantize(exponent):f}'
+    return convert
+
+
+def column(name, converter=None):
+    """Getter of a values() column, optionally passed through converter"""
+    getter = itemgetter(name)
+    if converter is None:
+        return getter
+    return lambda row: converter(getter(row))
+
+
+def constant(value):
+    """Getter returning the same value for every row"""
+    return lambda row: value
+
+
+class RowSerializer:
+    """
+    Render values() rows as a list of dicts
+    
+    Subclasses set `columns`, the values() columns to fetch (id and
+    created_at included, for cursor pagination), and `fields`, a list of
+    (output name, getter) pairs in output order.
+    """
+    columns = ()
+    fields = ()
+    
+    @classmethod
+    def rows(cls, queryset):
+        """Restrict queryset to the columns the serializer needs"""
+        return queryset.values(*cls.columns)
+    
+    @classmethod
+    def serialize(cls, rows):
+        fields = cls.fields
+        return [{name: get(row) for name, get in fields} for row in rows]
+
+
+def related_user_name(row):
+    if row['related_user_id'] is None:
+        return None
+    return f"{row['related_user__first_name']} {row['related_user__last_name']}".strip()
+
+
+class TransactionRowSerializer(RowSerializer):
+    """Rows of TransactionSerializer"""
+    columns = (
+        'id', 'transaction_type', 'currency_type', 'amount', 'description', 'referral_level',
+        'related_user_id', 'related_user__first_name', 'related_user__last_name', 'created_at'
+    )
+    fields = (
+        ('id', column('id')),
+        ('transaction_type', column('transaction_type')),
+        ('currency_type', column('currency_type')),
+        ('amount', column('amount', decimal_string(2))),
+        ('description', column('description')),
+        ('referral_level', column('referral_level')),
+        ('related_user_id', column('related_user_id')),
+        ('related_user_name', related_user_name),
+        ('status', constant('completed')),
+        ('created_at', column('created_at', iso_datetime)),
+    )
+
+
+class WithdrawalRowSerializer(RowSerializer):
+    """Rows of WithdrawalSerializer"""
+    columns = (
+        'id', 'user_id', 'amount', 'method', 'wallet_address', 'status',
+        'rejection_reason', 'created_at', 'processed_at', 'transaction_id'
+    )
+    fields = (
+        ('id', column('id')),
+        ('user_id', column('user_id')),
+        ('amount', column('amount', decimal_string(2))),
+        ('method', column('method')),
+        ('wallet_address', column('wallet_address')),
+        ('status', column('status')),
+        ('rejection_reason', column('rejection_reason')),
+        ('created_at', column('created_at', iso_datetime)),
+        ('processed_at', column('processed_at', iso_datetime)),
+        ('transaction_id', column('transaction_id')),
+    )
+
+
+class NotificationRowSerializer(RowSerializer):
+    """Rows of NotificationSerializer"""
+    columns = ('id', 'title', 'message', 'notification_type', 'is_read', 'created_at', 'data')
+    fields = (
+        ('id', column('id')),
+        ('title', column('title')),
+        ('message', column('message')),
+        ('notification_type', column('notification_type')),
+        ('is_read', column('is_read')),
+        ('created_at', column('created_at', iso_datetime)),
+        # NotificationSerializer renders a missing payload as {}
+        ('data', column('data', lambda data: {} if data is None else data)),
+    )
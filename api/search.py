@@ -0,0 +1,143 @@
+"""
+Member search for the admin Users screen
+
+Names are matched through the member_search FTS5 index (username,
+first_name, last_name), which triggers on the members table keep in step
+with every insert, update and delete. Every search token is a prefix
+query, so typing narrows the results keystroke by keystroke.
+
+Identifiers are matched by prefix through their unique indexes:
+
+- referral codes as one range on the code;
+- telegram IDs as one range per possible number of remaining digits,
+  e.g. '123' is [123, 124), [1230, 1240), [12300, 12400), ...
+
+Results are either paginated newest first like every other list, or
+ranked: identifier matches first, then name matches by BM25.
+"""
+from functools import reduce
+import operator
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+MEMBER_SEARCH_TABLE = 'member_search'
+
+# Name matches considered for ranked results before the other filters apply
+RANKED_CANDIDATES = 500
+
+_BIGINT_MAX = 2 ** 63 - 1
+_TOKEN = re.compile(r'\w+')
+_REFERRAL_CODE = re.compile(r'[A-Z0-9]+')
+
+
+def match_expression(search):
+    """
+    FTS5 query matching members whose names start with every search token
+    
+    Returns:
+        The MATCH expression, or None if search has no word characters
+    """
+    tokens = _TOKEN.findall(search.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def telegram_id_ranges(search):
+    """
+    Return (low, high) ranges of the telegram IDs starting with search
+    """
+    if not search.isdigit() or search.startswith('0'):
+        return []
+    prefix = int(search)
+    ranges = []
+    scale = 1
+    while prefix * scale <= _BIGINT_MAX:
+        ranges.append((prefix * scale, min((prefix + 1) * scale, _BIGINT_MAX)))
+        scale *= 10
+    return ranges
+
+
+def identifier_filters(search):
+    """
+    Prefix conditions on the member identifiers that could start with search
+    
+    Returns:
+        List of (Q, indexed column) pairs, one per identifier
+    """
+    search = search.strip()
+    filters = []
+    ranges = telegram_id_ranges(search)
+    if ranges:
+        filters.append((
+            reduce(operator.or_, [Q(telegram_id__gte=low, telegram_id__lt=high) for low, high in ranges]),
+            'telegram_id'
+        ))
+    code = search.upper()
+    if _REFERRAL_CODE.fullmatch(code):
+        filters.append((Q(referral_code__gte=code, referral_code__lt=code + '\uffff'), 'referral_code'))
+    return filters
+
+
+def name_match_ids(match):
+    """Subquery of the IDs of members whose names match the FTS5 expression"""
+    return RawSQL(
+        f'SELECT rowid FROM {MEMBER_SEARCH_TABLE} WHERE {MEMBER_SEARCH_TABLE} MATCH %s',
+        [match]
+    )
+
+
+def search_filter(search):
+    """
+    Q of the members matching search by name or identifier prefix
+    
+    Returns:
+        Q, or None if nothing can match
+    """
+    conditions = []
+    match = match_expression(search)
+    if match:
+        conditions.append(Q(id__in=name_match_ids(match)))
+    conditions.extend(condition for condition, _ in identifier_filters(search))
+    if not conditions:
+        return None
+    return reduce(operator.or_, conditions)
+
+
+def ranked_search(queryset, search, limit):
+    """
+    Return up to limit members of queryset matching search, best first
+    
+    Identifier matches come first in identifier order, then name matches
+    by BM25 relevance.
+    """
+    results = []
+    seen = set()
+    for condition, column in identifier_filters(search):
+        # Ordered by the indexed column, so the scan stops after limit rows
+        for member in queryset.filter(condition).order_by(column)[:limit - len(results)]:
+            if member.id not in seen:
+                results.append(member)
+                seen.add(member.id)
+        if len(results) >= limit:
+            return results
+    
+    match = match_expression(search)
+    if match and len(results) < limit:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {MEMBER_SEARCH_TABLE} WHERE {MEMBER_SEARCH_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s',
+                [match, RANKED_CANDIDATES]
+            )
+            ranked_ids = [row[0] for row in cursor.fetchall() if row[0] not in seen]
+        # Apply the other filters on IDs, then load only the members returned
+        allowed = set(queryset.filter(id__in=ranked_ids).values_list('id', flat=True))
+        ranked_ids = [member_id for member_id in ranked_ids if member_id in allowed][:limit - len(results)]
+        members = queryset.in_bulk(ranked_ids)
+        results.extend(members[member_id] for member_id in ranked_ids)
+    
+    return results[:limit]
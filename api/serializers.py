@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from api.models import Member, Transaction, Withdrawal, Notification, PushSubscription
+from api.earnings import total_earnings
 
 
 class MessageSerializer(serializers.Serializer):
@@ -107,7 +108,6 @@ class TransactionSerializer(serializers.ModelSerializer):
     """Transaction serializer"""
     related_user_id = serializers.IntegerField(source='related_user.id', read_only=True, allow_null=True)
     related_user_name = serializers.SerializerMethodField()
-    referral_level = serializers.SerializerMethodField()
     status = serializers.SerializerMethodField()
     
     class Meta:
@@ -131,16 +131,6 @@ class TransactionSerializer(serializers.ModelSerializer):
             return f"{obj.related_user.first_name} {obj.related_user.last_name}".strip()
         return None
     
-    def get_referral_level(self, obj):
-        # Extract level from description if it's a referral bonus
-        if obj.transaction_type in ['referral_bonus', 'depth_bonus', 'deposit_percent']:
-            # Try to parse level from description
-            import re
-            match = re.search(r'level (\d+)', obj.description, re.IGNORECASE)
-            if match:
-                return int(match.group(1))
-        return None
-    
     def get_status(self, obj):
         # All transactions in our system are completed
         return 'completed'
@@ -264,13 +254,10 @@ class AdminUserSerializer(serializers.ModelSerializer):
         return None
     
     def get_total_referrals(self, obj):
-        return obj.referrals.count()
+        return obj.direct_referrals_count
     
     def get_total_earnings(self, obj):
-        total = obj.transactions.filter(
-            transaction_type__in=['referral_bonus', 'depth_bonus', 'deposit_percent']
-        ).aggregate(total=serializers.models.Sum('amount'))['total']
-        return total or 0
+        return total_earnings(obj.id)
 
 
 class AdminUserUpdateSerializer(serializers.ModelSerializer):
@@ -311,6 +298,29 @@ class AdminAnalyticsSerializer(serializers.Serializer):
     )
 
 
+class LeaderboardEntrySerializer(serializers.Serializer):
+    """Member on a leaderboard"""
+    rank = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    username = serializers.CharField(allow_null=True)
+    user_type = serializers.CharField()
+    score = serializers.FloatField()
+
+
+class LeaderboardRankSerializer(serializers.Serializer):
+    """Rank of the current user, null without a score"""
+    rank = serializers.IntegerField(allow_null=True)
+    score = serializers.FloatField()
+
+
+class LeaderboardSerializer(serializers.Serializer):
+    """Top referrers by one score"""
+    by = serializers.ChoiceField(choices=['descendants', 'direct', 'earnings'])
+    entries = LeaderboardEntrySerializer(many=True)
+    me = LeaderboardRankSerializer()
+
+
 class PushSubscriptionSerializer(serializers.ModelSerializer):
     """Push notification subscription"""
     subscription = serializers.JSONField(source='subscription_data')
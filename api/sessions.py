@@ -0,0 +1,93 @@
+"""
+API login sessions
+
+The cookie carries a random token; only its SHA-256 hash is stored, as
+the primary key of ApiSession. Authenticating is a single primary key
+lookup joined to the member, and all sessions of a member can be revoked
+with one DELETE on the indexed user column.
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ApiSession
+
+# Sessions closer than this to expiry are replaced instead of reused on login
+SESSION_RENEW_BEFORE = timedelta(days=1)
+
+
+def hash_token(token):
+    """Return the stored representation of a session token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_api_session(user):
+    """
+    Create a session for user
+    
+    Returns:
+        The raw session token to put in the cookie
+    """
+    return _create_api_session(user)[0]
+
+
+def _create_api_session(user):
+    token = secrets.token_urlsafe(32)
+    expires_at = timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    ApiSession.objects.create(
+        token_hash=hash_token(token),
+        user=user,
+        expires_at=expires_at
+    )
+    return token, expires_at
+
+
+def reuse_or_create_session(user, token=None):
+    """
+    Return the session the client already holds for user, or a new one
+    
+    A presented token is reused while it belongs to user and has more than
+    SESSION_RENEW_BEFORE left, so repeated logins from the same device do
+    not write anything.
+    
+    Returns:
+        Tuple of (token, expires_at)
+    """
+    if token:
+        session = ApiSession.objects.filter(
+            token_hash=hash_token(token),
+            user_id=user.id,
+            expires_at__gt=timezone.now() + SESSION_RENEW_BEFORE
+        ).values_list('expires_at', flat=True).first()
+        if session is not None:
+            return token, session
+    return _create_api_session(user)
+
+
+def get_api_session(token):
+    """
+    Return the unexpired session of token with its member, or None
+    """
+    return ApiSession.objects.select_related('user').filter(
+        token_hash=hash_token(token),
+        expires_at__gt=timezone.now()
+    ).first()
+
+
+def revoke_session(token):
+    """Delete a single session"""
+    ApiSession.objects.filter(token_hash=hash_token(token)).delete()
+
+
+def revoke_all_sessions(user_id):
+    """
+    Delete every session of a member
+    
+    Returns:
+        Number of deleted sessions
+    """
+    deleted, _ = ApiSession.objects.filter(user_id=user_id).delete()
+    return deleted
@@ -0,0 +1,160 @@
+"""
+Short-lived snapshots of admin aggregates shared by all workers
+
+The admin dashboard polls AdminStatsView constantly, and every poll used
+to aggregate the members, transactions and withdrawals tables. A
+SharedSnapshot keeps the last computed value in worker memory and in the
+stats_snapshots table:
+
+- For `ttl` seconds after it was computed the in-memory copy is served
+  without touching the database.
+- Once it is older, requests keep getting that copy while a background
+  thread of the worker refreshes it. The thread adopts a fresher row
+  written by another worker, or else claims the row for a short lease so
+  that only one worker at a time recomputes, and publishes the new value.
+- Only a worker with nothing to serve, on a database without a snapshot
+  yet, computes on the request thread.
+"""
+from datetime import timedelta
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Member, StatsSnapshot, Transaction, Withdrawal
+
+# Seconds a worker may spend recomputing before another one takes over
+REFRESH_LEASE_SECONDS = 60
+
+
+def start_background_refresh(refresh, name):
+    """
+    Run refresh() on a daemon thread and return the started thread
+    """
+    def run():
+        try:
+            refresh()
+        finally:
+            # The thread got its own connection, do not leak it
+            connection.close()
+    
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+class SharedSnapshot:
+    """
+    Value of compute() cached in memory and in a StatsSnapshot row
+    """
+    
+    def __init__(self, name, compute, ttl):
+        self.name = name
+        self.compute = compute
+        self.ttl = ttl
+        # Refresh stale values on a background thread (off in tests)
+        self.background = True
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+    
+    def reset(self):
+        """Forget the in-memory copy"""
+        self.value = None
+        self.computed_at = None
+        self._attempted_at = float('-inf')
+    
+    def _is_fresh(self):
+        return (
+            self.computed_at is not None
+            and (timezone.now() - self.computed_at).total_seconds() < self.ttl
+        )
+    
+    def get(self):
+        """
+        Return the snapshot, scheduling a refresh if it is stale
+        """
+        value = self.value
+        if value is None:
+            self.refresh()
+            return self.value
+        if not self._is_fresh():
+            self._schedule_refresh()
+        return value
+    
+    def refresh(self):
+        """
+        Adopt a fresh snapshot of another worker, or recompute and publish it
+        """
+        row = StatsSnapshot.objects.filter(name=self.name).values('data', 'computed_at').first()
+        if row is not None:
+            self.value, self.computed_at = row['data'], row['computed_at']
+            if self._is_fresh():
+                return
+            now = timezone.now()
+            claimed = StatsSnapshot.objects.filter(name=self.name).filter(
+                Q(refreshing_until__isnull=True) | Q(refreshing_until__lt=now)
+            ).update(refreshing_until=now + timedelta(seconds=REFRESH_LEASE_SECONDS))
+            if not claimed:
+                # Another worker is on it, its result is adopted on a later refresh
+                return
+        
+        value = self.compute()
+        computed_at = timezone.now()
+        StatsSnapshot.objects.bulk_create(
+            [StatsSnapshot(name=self.name, data=value, computed_at=computed_at, refreshing_until=None)],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['data', 'computed_at', 'refreshing_until']
+        )
+        self.value, self.computed_at = value, computed_at
+    
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # At most one attempt per ttl while another worker holds the lease
+            if time.monotonic() - self._attempted_at < self.ttl:
+                return
+            self._attempted_at = time.monotonic()
+            if self.background:
+                self._thread = start_background_refresh(self.refresh, f'snapshot-{self.name}')
+                return
+        self.refresh()
+
+
+def compute_admin_stats():
+    """
+    System statistics of AdminStatsView, one conditional aggregate per table
+    """
+    members = Member.objects.aggregate(
+        total_users=Count('id'),
+        total_players=Count('id', filter=Q(user_type='player')),
+        total_influencers=Count('id', filter=Q(user_type='influencer')),
+        total_v_coins=Sum('v_coins_balance')
+    )
+    transactions = Transaction.objects.aggregate(
+        total_transactions=Count('id'),
+        total_cash_payouts=Sum('amount', filter=Q(transaction_type='withdrawal'))
+    )
+    pending = Withdrawal.objects.filter(status='pending').aggregate(
+        pending_withdrawals=Count('id'),
+        pending_withdrawals_amount=Sum('amount')
+    )
+    
+    return {
+        'total_users': members['total_users'],
+        'total_players': members['total_players'],
+        'total_influencers': members['total_influencers'],
+        'total_v_coins': float(members['total_v_coins'] or 0),
+        'total_cash_payouts': float(transactions['total_cash_payouts'] or 0),
+        'total_transactions': transactions['total_transactions'],
+        'pending_withdrawals': pending['pending_withdrawals'],
+        'pending_withdrawals_amount': float(pending['pending_withdrawals_amount'] or 0)
+    }
+
+
+admin_stats = SharedSnapshot('admin_stats', compute_admin_stats, settings.ADMIN_STATS_SNAPSHOT_TTL)
@@ -1,3 +1,1334 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import balances
+from .ancestry import ancestor_cache, get_ancestor_ids, unpack_ancestor_ids
+from .benchmarks import build_synthetic_tree, call_view, create_members
+from .bloom import BloomFilter, member_filter
+from .db import immediate_atomic
+from .idempotency import get_stored_responses
+from .jobs import process_batch
+from .leaderboard import leaderboards
+from .rollups import activity_series
+from .snapshots import admin_stats
+from .row_serializers import NotificationRowSerializer, TransactionRowSerializer, WithdrawalRowSerializer
+from .models import ApiSession, DailyRollup, Member, MemberEarnings, Notification, PayoutJob, ReferralCodePool, ReferralRelation, StatsSnapshot, Transaction, Withdrawal, REFERRAL_LEVEL_FIELDS
+from .serializers import NotificationSerializer, TransactionSerializer, WithdrawalSerializer
+from .views import (
+    AdminAnalyticsView, AdminStatsView, AdminTransactionListView, AdminUserListView, AdminUserUpdateView, AdminWithdrawalUpdateView, DepositProcessedView, EventBatchView,
+    FirstTournamentCompletedView, LeaderboardView, ReferralTreeView, TransactionListView, UserReferralsView, UserStatsView,
+    plan_deposit_bonus
+)
+
+
+class ReferralTreeViewTests(TestCase):
+    """GET /api/user/{user_id}/referral-tree"""
+
+    def get_tree(self, root):
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(
+                ReferralTreeView, 'get', f'/api/user/{root.id}/referral-tree',
+                root, user_id=root.id
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_query_count_is_constant(self):
+        small, small_queries = self.get_tree(build_synthetic_tree(5, fanout=2))
+        large, large_queries = self.get_tree(build_synthetic_tree(300, fanout=3))
+
+        self.assertEqual(small['total_referrals'], 5)
+        self.assertEqual(large['total_referrals'], 300)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_nodes_are_nested_under_referrer(self):
+        root = build_synthetic_tree(6, fanout=2)
+        data, _ = self.get_tree(root)
+
+        self.assertEqual(data['levels'], {'1': 2, '2': 4})
+        self.assertEqual(len(data['tree']), 2)
+        first = data['tree'][0]
+        self.assertEqual(first['level'], 1)
+        self.assertEqual(first['direct_referrals_count'], 2)
+        self.assertEqual(first['total_referrals_count'], 2)
+        self.assertEqual([child['level'] for child in first['children']], [2, 2])
+
+
+class UserReferralsViewTests(TestCase):
+    """GET /api/user/{user_id}/referrals"""
+
+    def get_referrals(self, root, depth):
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(
+                UserReferralsView, 'get', f'/api/user/{root.id}/referrals?depth={depth}',
+                root, user_id=root.id
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_query_count_is_independent_of_depth_and_fanout(self):
+        narrow = build_synthetic_tree(10, fanout=1)
+        wide = build_synthetic_tree(200, fanout=5)
+
+        counts = set()
+        for root in (narrow, wide):
+            for depth in (1, 5, 10):
+                _, queries = self.get_referrals(root, depth)
+                counts.add(queries)
+
+        self.assertEqual(len(counts), 1)
+
+    def test_referrals_are_nested_by_referrer(self):
+        root = build_synthetic_tree(10, fanout=1)
+        data, _ = self.get_referrals(root, 3)
+
+        self.assertEqual(data['total_referrals'], 3)
+        node = data['referrals'][0]
+        for level in (1, 2, 3):
+            self.assertEqual(node['level'], level)
+            children = node['referrals']
+            if level < 3:
+                self.assertEqual(len(children), 1)
+                node = children[0]
+        self.assertEqual(node['referrals'], [])
+
+
+class RegistrationMixin:
+
+    def setUp(self):
+        super().setUp()
+        ancestor_cache.clear()
+        member_filter.reset()
+        member_filter.background = False
+        leaderboards.reset()
+
+    def tearDown(self):
+        member_filter.background = True
+        super().tearDown()
+
+    def register(self, telegram_id, referrer=None):
+        response = self.client.post('/api/user/register', {
+            'telegram_id': telegram_id,
+            'first_name': f'user{telegram_id}',
+            'referrer_code': referrer.referral_code if referrer else None,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return Member.objects.get(id=response.json()['id'])
+
+
+class ReferralCountersTests(RegistrationMixin, TestCase):
+    """Materialized downline counters on Member"""
+
+    def counters(self, member):
+        member.refresh_from_db()
+        return [member.total_referrals_count] + [
+            getattr(member, field) for field in REFERRAL_LEVEL_FIELDS
+        ]
+
+    def test_registration_updates_whole_chain(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        self.register(3, child)
+        self.register(4, child)
+
+        root.refresh_from_db()
+        self.assertEqual(root.total_referrals_count, 3)
+        self.assertEqual(root.direct_referrals_count, 1)
+        self.assertEqual(root.referrals_by_level(), {'1': 1, '2': 2})
+        child.refresh_from_db()
+        self.assertEqual(child.referrals_by_level(), {'1': 2})
+
+    def test_rebuild_matches_incremental_counters(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        self.register(3, child)
+        before = [self.counters(member) for member in (root, child)]
+
+        Member.objects.update(total_referrals_count=0, referrals_level_1=0)
+        call_command('rebuild_referral_counters', stdout=StringIO())
+
+        self.assertEqual([self.counters(member) for member in (root, child)], before)
+
+    def test_migration_fills_counters_from_closure_table(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        self.register(3, child)
+        before = [self.counters(member) for member in (root, child)]
+
+        Member.objects.update(total_referrals_count=0, referrals_level_1=0, referrals_level_2=0)
+        import_module('api.migrations.0004_member_referral_counters').build_referral_counters(apps, None)
+
+        self.assertEqual([self.counters(member) for member in (root, child)], before)
+
+
+class AncestorChainTests(RegistrationMixin, TestCase):
+    """Packed ancestor chains and first tournament payouts"""
+
+    def test_chain_is_stored_at_registration(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        grandchild = self.register(3, child)
+
+        self.assertEqual(unpack_ancestor_ids(root.ancestor_chain), ())
+        self.assertEqual(unpack_ancestor_ids(grandchild.ancestor_chain), (child.id, root.id))
+        self.assertEqual(get_ancestor_ids(grandchild.id), (child.id, root.id))
+
+    def test_chain_is_capped_at_max_depth(self):
+        members = [self.register(1)]
+        for telegram_id in range(2, 13):
+            members.append(self.register(telegram_id, members[-1]))
+
+        expected = tuple(member.id for member in reversed(members[1:-1]))
+        self.assertEqual(get_ancestor_ids(members[-1]), expected)
+
+    def test_backfill_rebuilds_chains_from_closure_table(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        grandchild = self.register(3, child)
+        Member.objects.update(ancestor_chain=b'')
+
+        call_command('backfill_ancestor_chains', stdout=StringIO())
+
+        grandchild.refresh_from_db()
+        self.assertEqual(unpack_ancestor_ids(grandchild.ancestor_chain), (child.id, root.id))
+
+    def test_migration_backfills_chains_from_closure_table(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        grandchild = self.register(3, child)
+        Member.objects.update(ancestor_chain=b'')
+
+        import_module('api.migrations.0005_member_ancestor_chain').backfill_ancestor_chains(apps, None)
+
+        grandchild.refresh_from_db()
+        self.assertEqual(unpack_ancestor_ids(grandchild.ancestor_chain), (child.id, root.id))
+
+    def test_missing_chain_is_read_from_closure_table_and_not_cached(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        grandchild = self.register(3, child)
+        Member.objects.update(ancestor_chain=b'')
+        ancestor_cache.clear()
+
+        self.assertEqual(get_ancestor_ids(grandchild.id), (child.id, root.id))
+        self.assertIsNone(ancestor_cache.get(grandchild.id))
+
+    def test_first_tournament_pays_upline_once(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        grandchild = self.register(3, child)
+
+        def complete():
+            return call_view(
+                FirstTournamentCompletedView, 'post', '/api/tournament/first-completed',
+                grandchild, {'user_id': grandchild.id, 'tournament_id': 7}
+            )
+
+        first = complete().data['bonuses_distributed']
+        self.assertEqual([bonus['recipient_id'] for bonus in first], [child.id, root.id])
+        self.assertEqual([bonus['level'] for bonus in first], [1, 2])
+        self.assertFalse(ReferralRelation.objects.filter(
+            descendant=grandchild, has_paid_first_bonus=False
+        ).exists())
+
+        # A retry replays the stored response without paying again
+        transactions = Transaction.objects.count()
+        replay = complete()
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['bonuses_distributed'], first)
+        self.assertEqual(Transaction.objects.count(), transactions)
+
+
+class BalanceTests(RegistrationMixin, TestCase):
+    """Atomic balance mutations"""
+    
+    def test_credit_and_debit_return_new_balance(self):
+        member = self.register(1)
+        
+        self.assertEqual(balances.credit(member.id, 'cash', Decimal('10.50')), Decimal('10.50'))
+        self.assertEqual(balances.debit(member.id, 'cash', Decimal('4.25')), Decimal('6.25'))
+        with self.assertRaises(balances.InsufficientBalance):
+            balances.debit(member.id, 'cash', Decimal('6.26'))
+        member.refresh_from_db()
+        self.assertEqual(member.cash_balance, Decimal('6.25'))
+    
+    def test_credit_many_sums_per_member(self):
+        first = self.register(1)
+        second = self.register(2)
+        
+        result = balances.credit_many([
+            (first.id, 'cash', Decimal('1.00')),
+            (first.id, 'cash', Decimal('2.00')),
+            (first.id, 'v_coins', Decimal('5.00')),
+            (second.id, 'v_coins', Decimal('7.00')),
+        ])
+        
+        self.assertEqual(result[first.id], {'cash': Decimal('3.00'), 'v_coins': Decimal('5.00')})
+        self.assertEqual(result[second.id]['v_coins'], Decimal('7.00'))
+    
+    def test_withdrawal_approval_is_rejected_without_funds(self):
+        admin = self.register(1)
+        Member.objects.filter(id=admin.id).update(is_admin=True)
+        admin.refresh_from_db()
+        member = self.register(2)
+        withdrawal = Withdrawal.objects.create(
+            user=member, amount=Decimal('50.00'), method='card', wallet_address='4242'
+        )
+        
+        response = call_view(
+            AdminWithdrawalUpdateView, 'patch', f'/api/admin/withdrawals/{withdrawal.id}',
+            admin, {'status': 'approved'}, id=withdrawal.id
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'rejected')
+        self.assertEqual(withdrawal.rejection_reason, 'Insufficient balance')
+
+
+@override_settings(PAYOUTS_ASYNC=True)
+class PayoutJobTests(RegistrationMixin, TestCase):
+    """Asynchronous payouts through the payout job queue"""
+    
+    def deposit(self, user, deposit_id, amount='1000'):
+        return call_view(
+            DepositProcessedView, 'post', '/api/deposit/processed',
+            user, {'user_id': user.id, 'amount': amount, 'deposit_id': deposit_id}
+        )
+    
+    def test_webhook_queues_job_and_worker_pays_it(self):
+        root = self.register(1)
+        Member.objects.filter(id=root.id).update(user_type='influencer')
+        child = self.register(2, root)
+        
+        response = self.deposit(child, 'DEP-1')
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.data['queued'])
+        root.refresh_from_db()
+        balance = root.cash_balance
+        
+        self.assertEqual(process_batch(10), (1, 0))
+        root.refresh_from_db()
+        self.assertEqual(root.cash_balance - balance, Decimal('100.00'))
+        job = PayoutJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result[0]['recipient_id'], root.id)
+    
+    def test_duplicate_event_is_queued_once(self):
+        root = self.register(1)
+        child = self.register(2, root)
+        
+        first = self.deposit(child, 'DEP-1')
+        second = self.deposit(child, 'DEP-1')
+        
+        self.assertEqual(first.data['job_id'], second.data['job_id'])
+        self.assertEqual(PayoutJob.objects.count(), 1)
+    
+    @override_settings(PAYOUT_JOB_MAX_ATTEMPTS=2, PAYOUT_JOB_RETRY_DELAY=0)
+    def test_failing_job_backs_off_then_fails(self):
+        child = self.register(1)
+        self.deposit(child, 'DEP-1')
+        PayoutJob.objects.update(payload={'user_id': 0, 'amount': '1000', 'deposit_id': 'DEP-1'})
+        
+        self.assertEqual(process_batch(10), (0, 1))
+        job = PayoutJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('DoesNotExist', job.last_error)
+        
+        self.assertEqual(process_batch(10), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(process_batch(10), (0, 0))
+
+
+class EventBatchTests(RegistrationMixin, TestCase):
+    """POST /api/events/batch"""
+    
+    def setUp(self):
+        super().setUp()
+        self.root = self.register(1)
+        Member.objects.filter(id=self.root.id).update(user_type='influencer')
+        self.child = self.register(2, self.root)
+        self.grandchild = self.register(3, self.child)
+    
+    def post_batch(self, events):
+        return call_view(EventBatchView, 'post', '/api/events/batch', self.root, events)
+    
+    def test_mixed_batch_reports_per_event_results(self):
+        events = [
+            {'type': 'first_tournament', 'user_id': self.grandchild.id, 'tournament_id': 'T1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '200', 'deposit_id': 'D1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '200', 'deposit_id': 'D1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '-5', 'deposit_id': 'D2'},
+            {'type': 'first_tournament', 'user_id': 999999, 'tournament_id': 'T1'},
+        ]
+        response = self.post_batch(events)
+        
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['processed', 'processed', 'duplicate', 'error', 'error']
+        )
+        self.assertEqual(
+            [bonus['recipient_id'] for bonus in results[0]['bonuses_distributed']],
+            [self.child.id, self.root.id]
+        )
+        self.assertEqual(results[1]['bonuses_distributed'][0]['amount'], '20.00')
+        self.assertEqual(results[2]['duplicate_of'], 1)
+        self.assertEqual(results[4]['detail'], 'User not found')
+        # Validation works on normalized copies
+        self.assertEqual(events[1]['amount'], '200')
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.total_deposits, Decimal('200'))
+    
+    def test_batch_matches_sequential_payouts(self):
+        sibling = self.register(4, self.child)
+        self.post_batch([
+            {'type': 'first_tournament', 'user_id': member.id, 'tournament_id': 'T1'}
+            for member in (self.grandchild, sibling)
+        ])
+        
+        self.child.refresh_from_db()
+        self.root.refresh_from_db()
+        self.assertEqual(self.child.active_referrals_count, 2)
+        self.assertFalse(ReferralRelation.objects.filter(has_paid_first_bonus=False).exclude(
+            descendant=self.child
+        ).exists())
+        
+        # Replaying the same users returns the stored results
+        transactions = Transaction.objects.count()
+        response = self.post_batch([
+            {'type': 'first_tournament', 'user_id': self.grandchild.id, 'tournament_id': 'T2'}
+        ])
+        result = response.data['results'][0]
+        self.assertEqual(result['status'], 'replayed')
+        self.assertEqual(result['tournament_id'], 'T1')
+        self.assertEqual(Transaction.objects.count(), transactions)
+    
+    def test_member_side_effects_are_one_update(self):
+        siblings = [self.register(telegram_id, self.root) for telegram_id in (4, 5)]
+        events = [
+            {'type': 'first_tournament', 'user_id': member.id, 'tournament_id': 'T1'}
+            for member in [self.grandchild] + siblings
+        ]
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.post_batch(events)
+        
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "members" SET "active_referrals_count"')]
+        self.assertEqual(len(updates), 1)
+        self.child.refresh_from_db()
+        self.root.refresh_from_db()
+        self.assertEqual((self.child.active_referrals_count, self.root.active_referrals_count), (1, 3))
+    
+    def test_ndjson_body(self):
+        body = (
+            f'{{"type": "deposit", "user_id": {self.child.id}, "amount": 50, "deposit_id": "D1"}}\n'
+            f'\n'
+            f'{{"type": "deposit", "user_id": {self.child.id}, "amount": 70, "deposit_id": "D2"}}\n'
+        )
+        request = APIRequestFactory().post(
+            '/api/events/batch', body, content_type='application/x-ndjson'
+        )
+        force_authenticate(request, user=self.root)
+        
+        response = EventBatchView.as_view()(request)
+        
+        self.assertEqual(response.data['processed'], 2)
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.total_deposits, Decimal('120'))
+
+
+class ReferralLevelTests(RegistrationMixin, TestCase):
+    """Transaction.referral_level"""
+    
+    def setUp(self):
+        super().setUp()
+        self.root = self.register(1)
+        Member.objects.filter(id=self.root.id).update(user_type='influencer')
+        self.child = self.register(2, self.root)
+        self.grandchild = self.register(3, self.child)
+    
+    def test_every_bonus_path_records_the_level(self):
+        call_view(EventBatchView, 'post', '/api/events/batch', self.root, [
+            {'type': 'first_tournament', 'user_id': self.grandchild.id, 'tournament_id': 'T1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '200', 'deposit_id': 'D1'},
+        ])
+        
+        levels = set(Transaction.objects.values_list('user_id', 'transaction_type', 'referral_level'))
+        self.assertEqual(levels, {
+            (self.root.id, 'referral_bonus', 1),
+            (self.child.id, 'referral_bonus', 1),
+            (self.root.id, 'depth_bonus', 2),
+            (self.root.id, 'deposit_percent', 1),
+        })
+    
+    def test_transactions_filter_by_level(self):
+        call_view(EventBatchView, 'post', '/api/events/batch', self.root, [
+            {'type': 'first_tournament', 'user_id': self.grandchild.id, 'tournament_id': 'T1'},
+        ])
+        
+        response = call_view(TransactionListView, 'get', '/api/transactions?referral_level=2', self.root)
+        
+        self.assertEqual(
+            [(item['transaction_type'], item['referral_level']) for item in response.data['results']],
+            [('depth_bonus', 2)]
+        )
+
+
+class EarningsSummaryTests(RegistrationMixin, TestCase):
+    """MemberEarnings rollup"""
+    
+    def setUp(self):
+        super().setUp()
+        self.root = self.register(1)
+        Member.objects.filter(id=self.root.id).update(user_type='influencer')
+        self.child = self.register(2, self.root)
+        self.grandchild = self.register(3, self.child)
+        call_view(EventBatchView, 'post', '/api/events/batch', self.root, [
+            {'type': 'first_tournament', 'user_id': self.grandchild.id, 'tournament_id': 'T1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '200', 'deposit_id': 'D1'},
+        ])
+    
+    def summaries(self):
+        return {
+            earnings.member_id: (earnings.total, earnings.cash_total, earnings.depth_bonus_total)
+            for earnings in MemberEarnings.objects.all()
+        }
+    
+    def test_bonus_inserts_keep_summary_in_step_with_transactions(self):
+        expected = {}
+        for member_id, amount, currency_type, transaction_type in Transaction.objects.values_list(
+            'user_id', 'amount', 'currency_type', 'transaction_type'
+        ):
+            total, cash, depth = expected.get(member_id, (0, 0, 0))
+            expected[member_id] = (
+                total + amount,
+                cash + (amount if currency_type == 'cash' else 0),
+                depth + (amount if transaction_type == 'depth_bonus' else 0),
+            )
+        
+        self.assertEqual(self.summaries(), expected)
+        self.assertEqual(set(expected), {self.root.id, self.child.id})
+    
+    def test_stats_read_the_summary(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(UserStatsView, 'get', f'/api/users/{self.root.id}/stats', self.root, user_id=self.root.id)
+        
+        self.assertEqual(Decimal(response.data['total_earnings']), MemberEarnings.objects.get(member=self.root).total)
+        self.assertFalse([query for query in queries if 'SUM(' in query['sql']])
+    
+    def test_reconcile_rebuilds_drifted_summaries(self):
+        expected = self.summaries()
+        MemberEarnings.objects.filter(member=self.root).update(total=0)
+        MemberEarnings.objects.filter(member=self.child).delete()
+        
+        out = StringIO()
+        call_command('reconcile_earnings', stdout=out)
+        
+        self.assertIn('Rebuilt earnings of 2 members, 2 had drifted', out.getvalue())
+        self.assertEqual(self.summaries(), expected)
+    
+    def test_admin_user_list_reads_joined_summaries(self):
+        Member.objects.filter(id=self.root.id).update(is_admin=True)
+        self.root.refresh_from_db()
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(AdminUserListView, 'get', '/api/admin/users?page_size=10', self.root)
+        
+        self.assertEqual(len([query for query in queries if 'member_earnings' in query['sql']]), 1)
+        totals = {row['id']: row['total_earnings'] for row in response.data['results']}
+        self.assertEqual(totals, {
+            self.root.id: float(MemberEarnings.objects.get(member=self.root).total),
+            self.child.id: float(MemberEarnings.objects.get(member=self.child).total),
+            self.grandchild.id: 0.0,
+        })
+
+
+class DailyRollupTests(RegistrationMixin, TestCase):
+    """DailyRollup maintenance and AdminAnalyticsView"""
+    
+    def setUp(self):
+        super().setUp()
+        self.admin = self.register(1)
+        Member.objects.filter(id=self.admin.id).update(user_type='influencer', is_admin=True)
+        self.admin.refresh_from_db()
+        self.child = self.register(2, self.admin)
+        call_view(EventBatchView, 'post', '/api/events/batch', self.admin, [
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '200', 'deposit_id': 'D1'},
+        ])
+    
+    def rollups(self):
+        return set(DailyRollup.objects.values_list('date', 'kind', 'currency_type', 'count', 'amount'))
+    
+    def analytics(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(AdminAnalyticsView, 'get', f'/api/admin/analytics?{query}', self.admin)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+    
+    def test_incremental_rollups_match_rebuild(self):
+        incremental = self.rollups()
+        
+        call_command('rebuild_daily_rollups', stdout=StringIO())
+        
+        self.assertEqual(self.rollups(), incremental)
+        today = timezone.localdate()
+        self.assertIn((today, 'registration', '', 2, Decimal('0')), incremental)
+        self.assertIn((today, 'deposit_percent', 'cash', 1, Decimal('20')), incremental)
+    
+    def test_telegram_signup_and_rollup_commit_together(self):
+        login = {'telegram_id': 3, 'first_name': 'user3', 'auth_date': 1, 'hash': 'x'}
+        
+        with mock.patch('api.views.record_registration', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/auth/telegram', login, content_type='application/json')
+        self.assertFalse(Member.objects.filter(telegram_id=3).exists())
+        
+        self.client.post('/api/auth/telegram', login, content_type='application/json')
+        self.assertIn((timezone.localdate(), 'registration', '', 3, Decimal('0')), self.rollups())
+    
+    def test_year_of_analytics_is_a_constant_number_of_queries(self):
+        # The first request loads the in-memory leaderboards
+        self.analytics('period=7days')
+        data, queries = self.analytics('period=1year&bucket=day')
+        
+        self.assertEqual(len(data['registrations_by_day']), 366)
+        self.assertEqual(data['registrations_by_day'][-1]['count'], 2)
+        self.assertEqual(data['activity_by_day'][-1]['transactions_count'], 2)
+        self.assertEqual(data['activity_by_day'][-1]['total_amount'], 520.0)
+        _, month_queries = self.analytics('period=7days')
+        self.assertEqual(queries, month_queries)
+    
+    def test_weekly_and_monthly_buckets(self):
+        DailyRollup.objects.all().delete()
+        for day, count in (('2024-01-01', 1), ('2024-01-07', 2), ('2024-01-08', 4), ('2024-02-01', 8)):
+            DailyRollup.objects.create(date=day, kind='registration', count=count)
+        start, end = date(2024, 1, 1), date(2024, 2, 29)
+        
+        weekly, _ = activity_series(start, end, 'week')
+        monthly, _ = activity_series(start, end, 'month')
+        
+        self.assertEqual(weekly[:2], [{'date': '2024-01-01', 'count': 3}, {'date': '2024-01-08', 'count': 4}])
+        self.assertEqual(len(weekly), 9)
+        self.assertEqual(monthly, [{'date': '2024-01-01', 'count': 7}, {'date': '2024-02-01', 'count': 8}])
+
+
+class AdminStatsSnapshotTests(RegistrationMixin, TestCase):
+    """AdminStatsView served from the shared snapshot"""
+    
+    def setUp(self):
+        super().setUp()
+        admin_stats.reset()
+        admin_stats.background = False
+        self.admin = self.register(1)
+        Member.objects.filter(id=self.admin.id).update(user_type='influencer', is_admin=True, v_coins_balance=250)
+        self.admin.refresh_from_db()
+        self.register(2, self.admin)
+        Withdrawal.objects.create(user=self.admin, amount=Decimal('300'), method='card', wallet_address='x')
+    
+    def tearDown(self):
+        admin_stats.background = True
+        admin_stats.reset()
+    
+    def stats(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(AdminStatsView, 'get', '/api/admin/stats', self.admin)
+        self.assertEqual(response.status_code, 200)
+        return response.data, [query['sql'] for query in queries]
+    
+    def expire(self):
+        admin_stats.computed_at -= timedelta(seconds=admin_stats.ttl)
+        admin_stats._attempted_at = float('-inf')
+        StatsSnapshot.objects.update(computed_at=admin_stats.computed_at)
+    
+    def test_one_aggregate_per_table_then_memory(self):
+        data, queries = self.stats()
+        
+        self.assertEqual(data, {
+            'total_users': 2,
+            'total_players': 1,
+            'total_influencers': 1,
+            'total_v_coins': 250.0,
+            'total_cash_payouts': 0.0,
+            'total_transactions': 1,
+            'pending_withdrawals': 1,
+            'pending_withdrawals_amount': 300.0,
+        })
+        for table in ('"members"', '"transactions"', '"withdrawals"'):
+            self.assertEqual(len([sql for sql in queries if f'FROM {table}' in sql]), 1)
+        
+        _, queries = self.stats()
+        self.assertEqual([sql for sql in queries if 'FROM "members"' not in sql], [])
+        self.assertFalse(any('COUNT' in sql for sql in queries))
+    
+    def test_stale_snapshot_is_served_while_refreshing(self):
+        self.stats()
+        self.expire()
+        self.register(3, self.admin)
+        
+        stale, _ = self.stats()
+        fresh, _ = self.stats()
+        
+        self.assertEqual(stale['total_users'], 2)
+        self.assertEqual(fresh['total_users'], 3)
+        self.assertEqual(StatsSnapshot.objects.get(name='admin_stats').data['total_users'], 3)
+    
+    def test_snapshot_of_another_worker_is_adopted(self):
+        self.stats()
+        StatsSnapshot.objects.update(data={'total_users': 42})
+        admin_stats.reset()
+        
+        data, queries = self.stats()
+        
+        self.assertEqual(data, {'total_users': 42})
+        self.assertFalse(any('COUNT' in sql for sql in queries))
+    
+    def test_leased_snapshot_is_not_recomputed(self):
+        self.stats()
+        self.expire()
+        StatsSnapshot.objects.update(refreshing_until=timezone.now() + timedelta(seconds=30))
+        self.register(3, self.admin)
+        
+        self.stats()
+        data, queries = self.stats()
+        
+        self.assertEqual(data['total_users'], 2)
+        self.assertFalse(any('COUNT' in sql for sql in queries))
+
+
+class LeaderboardTests(RegistrationMixin, TestCase):
+    """In-memory leaderboards and GET /api/leaderboard"""
+    
+    def setUp(self):
+        super().setUp()
+        leaderboards.background = False
+        self.root = self.register(1)
+        Member.objects.filter(id=self.root.id).update(user_type='influencer', is_admin=True)
+        self.root.refresh_from_db()
+        self.first = self.register(2, self.root)
+        self.second = self.register(3, self.root)
+        self.grandchild = self.register(4, self.first)
+    
+    def tearDown(self):
+        leaderboards.background = True
+        leaderboards.reset()
+        super().tearDown()
+    
+    def leaderboard(self, member, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = call_view(LeaderboardView, 'get', f'/api/leaderboard?{query}', member)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+    
+    def test_top_members_and_own_rank(self):
+        data, _ = self.leaderboard(self.first)
+        
+        self.assertEqual(data['by'], 'descendants')
+        self.assertEqual(
+            [(entry['rank'], entry['user_id'], entry['score']) for entry in data['entries']],
+            [(1, self.root.id, 3.0), (2, self.first.id, 1.0)]
+        )
+        self.assertEqual(data['me'], {'rank': 2, 'score': 1.0})
+        
+        data, queries = self.leaderboard(self.grandchild, 'by=direct&limit=1')
+        self.assertEqual([entry['user_id'] for entry in data['entries']], [self.root.id])
+        self.assertEqual(data['me'], {'rank': None, 'score': 0.0})
+        self.assertEqual(queries, 1)
+    
+    def test_equal_scores_share_a_rank(self):
+        self.register(5, self.second)
+        leaderboards.reset()
+        
+        data, _ = self.leaderboard(self.second, 'by=direct')
+        
+        self.assertEqual([entry['rank'] for entry in data['entries']], [1, 2, 2])
+        self.assertEqual(
+            [entry['user_id'] for entry in data['entries']],
+            [self.root.id, self.first.id, self.second.id]
+        )
+        self.assertEqual(data['me']['rank'], 2)
+    
+    def test_earnings_board_follows_member_earnings(self):
+        data, _ = self.leaderboard(self.root, 'by=earnings')
+        
+        expected = list(MemberEarnings.objects.filter(total__gt=0).order_by('-total', 'member_id').values_list(
+            'member_id', 'total'
+        ))
+        self.assertEqual([(entry['user_id'], entry['score']) for entry in data['entries']], [
+            (member_id, float(total)) for member_id, total in expected
+        ])
+    
+    def test_stale_boards_are_reloaded(self):
+        self.leaderboard(self.root)
+        self.register(5, self.grandchild)
+        
+        cached, _ = self.leaderboard(self.root)
+        leaderboards.loaded_at -= leaderboards.refresh_seconds
+        self.leaderboard(self.root)
+        reloaded, _ = self.leaderboard(self.root)
+        
+        self.assertEqual(cached['entries'][0]['score'], 3.0)
+        self.assertEqual(reloaded['entries'][0]['score'], 4.0)
+        self.assertEqual(reloaded['entries'][2]['user_id'], self.grandchild.id)
+    
+    def test_admin_analytics_top_referrers(self):
+        response = call_view(AdminAnalyticsView, 'get', '/api/admin/analytics', self.root)
+        
+        self.assertEqual(
+            [(referrer['user_id'], referrer['referrals_count']) for referrer in response.data['top_referrers']],
+            [(self.root.id, 3), (self.first.id, 1)]
+        )
+        self.assertEqual(
+            response.data['top_referrers'][0]['total_earnings'],
+            float(MemberEarnings.objects.get(member=self.root).total)
+        )
+
+
+class IdempotencyTests(RegistrationMixin, TestCase):
+    """Idempotency ledger of deposit and first tournament events"""
+    
+    def setUp(self):
+        super().setUp()
+        self.root = self.register(1)
+        Member.objects.filter(id=self.root.id).update(user_type='influencer')
+        self.child = self.register(2, self.root)
+    
+    def deposit(self, deposit_id, amount='1000'):
+        return call_view(
+            DepositProcessedView, 'post', '/api/deposit/processed',
+            self.child, {'user_id': self.child.id, 'amount': amount, 'deposit_id': deposit_id}
+        )
+    
+    def test_deposit_retry_is_not_credited_twice(self):
+        first = self.deposit('DEP-1')
+        self.root.refresh_from_db()
+        balance = self.root.cash_balance
+        
+        with CaptureQueriesContext(connection) as queries:
+            replay = self.deposit('DEP-1')
+        
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(replay.data, first.data)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.cash_balance, balance)
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.total_deposits, Decimal('1000'))
+    
+    def test_batch_and_single_endpoints_share_the_ledger(self):
+        self.deposit('DEP-1')
+        
+        response = call_view(EventBatchView, 'post', '/api/events/batch', self.root, [
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '1000', 'deposit_id': 'DEP-1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '500', 'deposit_id': 'DEP-2'},
+        ])
+        
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['replayed', 'processed']
+        )
+        self.assertEqual((response.data['processed'], response.data['replayed']), (1, 1))
+        self.assertEqual(self.deposit('DEP-2', amount='500').data['amount'], '500')
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.total_deposits, Decimal('1500'))
+    
+    def test_batch_replays_events_applied_concurrently(self):
+        events = [
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '1000', 'deposit_id': 'DEP-1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '500', 'deposit_id': 'DEP-2'},
+        ]
+        
+        def applied_after_ledger_check(keys):
+            # A single-event call applies DEP-1 right after the batch checked the ledger
+            if not self.applied:
+                self.applied = True
+                self.deposit('DEP-1')
+                return {}
+            return get_stored_responses(keys)
+        
+        self.applied = False
+        with mock.patch('api.views.get_stored_responses', side_effect=applied_after_ledger_check):
+            response = call_view(EventBatchView, 'post', '/api/events/batch', self.root, events)
+        
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['replayed', 'processed']
+        )
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.total_deposits, Decimal('1500'))
+    
+    def test_failing_event_does_not_fail_its_chunk(self):
+        events = [
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '1000', 'deposit_id': 'DEP-1'},
+            {'type': 'deposit', 'user_id': self.child.id, 'amount': '500', 'deposit_id': 'DEP-2'},
+        ]
+        def failing_plan_deposit_bonus(user, amount, referrer):
+            if amount == Decimal('500'):
+                raise ValueError('broken deposit')
+            return plan_deposit_bonus(user, amount, referrer)
+        
+        with mock.patch('api.views.plan_deposit_bonus', side_effect=failing_plan_deposit_bonus):
+            with self.assertLogs('api.views', 'ERROR'):
+                response = call_view(EventBatchView, 'post', '/api/events/batch', self.root, events)
+        
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['processed', 'error']
+        )
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.total_deposits, Decimal('1000'))
+
+
+class AuthenticationTests(TestCase):
+    """Telegram login sessions and CookieAuthentication"""
+    
+    def login(self, telegram_id):
+        response = self.client.post('/api/auth/telegram', {
+            'telegram_id': telegram_id,
+            'first_name': f'user{telegram_id}',
+            'auth_date': 1,
+            'hash': 'x',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return Member.objects.get(id=response.json()['id'])
+    
+    def me(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/me')
+        return response.status_code, len(queries)
+    
+    def test_repeated_login_is_read_only(self):
+        self.login(1)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.login(1)
+        
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if not query['sql'].startswith('SELECT')
+        ])
+        self.assertEqual(ApiSession.objects.count(), 1)
+    
+    def test_profile_change_is_saved_on_login(self):
+        member = self.login(1)
+        
+        self.client.post('/api/auth/telegram', {
+            'telegram_id': 1,
+            'first_name': 'renamed',
+            'auth_date': 1,
+            'hash': 'x',
+        }, content_type='application/json')
+        
+        member.refresh_from_db()
+        self.assertEqual(member.first_name, 'renamed')
+    
+    def test_authentication_is_a_single_query(self):
+        self.login(1)
+        
+        status_code, queries = self.me()
+        
+        self.assertEqual(status_code, 200)
+        self.assertEqual(queries, 1)
+    
+    def test_blocking_revokes_all_sessions(self):
+        admin = self.login(1)
+        Member.objects.filter(id=admin.id).update(is_admin=True)
+        admin.refresh_from_db()
+        member = self.login(2)
+        # Second device
+        self.client.cookies.clear()
+        self.login(2)
+        self.assertEqual(ApiSession.objects.filter(user=member).count(), 2)
+        
+        response = call_view(
+            AdminUserUpdateView, 'patch', f'/api/admin/users/{member.id}',
+            admin, {'is_blocked': True}, user_id=member.id
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ApiSession.objects.filter(user=member).exists())
+        self.assertTrue(ApiSession.objects.filter(user=admin).exists())
+    
+    def test_block_takes_effect_immediately(self):
+        member = self.login(1)
+        self.me()
+        
+        Member.objects.filter(id=member.id).update(is_blocked=True)
+        
+        self.assertEqual(self.me()[0], 401)
+    
+    def test_logged_out_token_is_rejected(self):
+        self.login(1)
+        token = self.client.cookies['session_token'].value
+        self.me()
+        
+        self.client.post('/api/auth/logout')
+        self.client.cookies['session_token'] = token
+        
+        self.assertEqual(self.me()[0], 401)
+
+
+class PurgeExpiredSessionsTests(TestCase):
+    """manage.py purge_expired_sessions"""
+    
+    def test_deletes_only_expired_sessions_in_batches(self):
+        member = Member.objects.create(telegram_id=1, first_name='user1')
+        now = timezone.now()
+        ApiSession.objects.bulk_create([
+            ApiSession(token_hash=f'expired{i}', user=member, expires_at=now - timedelta(days=1))
+            for i in range(5)
+        ] + [ApiSession(token_hash='live', user=member, expires_at=now + timedelta(days=1))])
+        out = StringIO()
+        
+        call_command('purge_expired_sessions', '--batch-size', '2', '--pause', '0', stdout=out)
+        
+        self.assertEqual(list(ApiSession.objects.values_list('token_hash', flat=True)), ['live'])
+        self.assertIn('Purged 5 expired API sessions', out.getvalue())
+
+
+class ReferralCodePoolTests(RegistrationMixin, TestCase):
+    """Pre-generated referral code pool"""
+    
+    def test_registration_claims_pooled_code_without_probe(self):
+        call_command('refill_referral_codes', '--target', '5', stdout=StringIO())
+        pooled = set(ReferralCodePool.objects.values_list('code', flat=True))
+        self.assertEqual(len(pooled), 5)
+        
+        with CaptureQueriesContext(connection) as queries:
+            member = Member.objects.create(telegram_id=1, first_name='user1')
+        
+        self.assertIn(member.referral_code, pooled)
+        self.assertFalse(ReferralCodePool.objects.filter(code=member.referral_code).exists())
+        # Claim and insert only, no uniqueness probe
+        self.assertEqual(len(queries), 2)
+    
+    def test_empty_pool_falls_back_to_generation(self):
+        member = self.register(1)
+        
+        self.assertEqual(len(member.referral_code), 8)
+    
+    def test_refill_skips_codes_taken_by_members(self):
+        member = self.register(1)
+        
+        call_command('refill_referral_codes', '--target', '50', '--batch-size', '20', stdout=StringIO())
+        
+        self.assertEqual(ReferralCodePool.objects.count(), 50)
+        self.assertFalse(ReferralCodePool.objects.filter(code=member.referral_code).exists())
+    
+    def test_pool_never_receives_codes_of_members(self):
+        member = self.register(1)
+        ReferralCodePool.objects.create(code='POOLED01')
+        
+        added = ReferralCodePool.add_unused([member.referral_code, 'POOLED01', 'FRESH001'])
+        
+        self.assertEqual(added, 1)
+        self.assertEqual(set(ReferralCodePool.objects.values_list('code', flat=True)), {'POOLED01', 'FRESH001'})
+
+
+class MemberFilterTests(RegistrationMixin, TestCase):
+    """Bloom filter in front of registration existence checks"""
+    
+    def post_register(self, telegram_id, referrer_code=None):
+        return self.client.post('/api/user/register', {
+            'telegram_id': telegram_id,
+            'first_name': f'user{telegram_id}',
+            'referrer_code': referrer_code,
+        }, content_type='application/json')
+    
+    def test_invalid_code_is_rejected_without_member_lookup(self):
+        self.register(1)
+        member_filter.refresh(force=True)
+        
+        with mock.patch.object(member_filter, 'miss_refresh_seconds', 60):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post_register(2, 'NOSUCHCD')
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'Invalid referral code')
+        self.assertFalse([q for q in queries if 'FROM "members"' in q['sql']])
+        self.assertEqual(member_filter.stats()['referral_codes']['negatives'], 1)
+    
+    def test_registration_finds_members_created_elsewhere(self):
+        member_filter.refresh(force=True)
+        referrer = create_members(1, 'bulk')[0]
+        
+        member_filter.refresh(force=True)
+        
+        self.assertEqual(self.post_register(referrer.telegram_id).status_code, 400)
+        self.assertEqual(self.post_register(1, referrer.referral_code).status_code, 201)
+    
+    def test_code_of_member_created_elsewhere_before_catch_up_is_accepted(self):
+        member_filter.refresh(force=True)
+        # Registered by another worker, this worker's catch-up is not due yet
+        referrer = create_members(1, 'bulk')[0]
+        member_filter.refreshed_at = time.monotonic() - member_filter.miss_refresh_seconds
+        
+        response = self.post_register(1, referrer.referral_code)
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Member.objects.get(telegram_id=1).referrer_id, referrer.id)
+    
+    @mock.patch.object(member_filter, 'miss_refresh_seconds', 60)
+    def test_miss_catch_ups_are_rate_limited(self):
+        member_filter.refresh(force=True)
+        
+        with CaptureQueriesContext(connection) as queries:
+            for code in ('NOSUCH01', 'NOSUCH02', 'NOSUCH03'):
+                self.assertFalse(member_filter.may_have_referral_code(code))
+        self.assertEqual(len(queries), 0)
+        
+        member_filter.refreshed_at -= member_filter.miss_refresh_seconds
+        with CaptureQueriesContext(connection) as queries:
+            for code in ('NOSUCH01', 'NOSUCH02'):
+                member_filter.may_have_referral_code(code)
+        self.assertEqual(len(queries), 1)
+    
+    def test_first_check_builds_in_background(self):
+        create_members(1, 'bulk')
+        member_filter.background = True
+        
+        with mock.patch('api.bloom.start_background_refresh', return_value=None) as start:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(member_filter.may_have_referral_code('NOSUCHCD'))
+        
+        start.assert_called_once_with(member_filter.build, 'member-filter')
+        self.assertEqual(len(queries), 0)
+    
+    def test_duplicate_missed_by_filter_is_still_rejected(self):
+        self.register(1)
+        member_filter.telegram_ids = BloomFilter(100, 0.01)
+        
+        response = self.post_register(1)
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'User already exists')
+        self.assertEqual(Member.objects.filter(telegram_id=1).count(), 1)
+    
+    def test_false_positives_are_counted(self):
+        bloom = BloomFilter(10, 0.5)
+        for value in range(10):
+            bloom.add(value)
+        
+        for value in range(10, 1010):
+            if value in bloom:
+                bloom.record_false_positive()
+        stats = bloom.stats()
+        
+        self.assertEqual(stats['negatives'] + stats['false_positives'], 1000)
+        self.assertGreater(stats['false_positives'], 0)
+        self.assertAlmostEqual(stats['false_positive_rate'], stats['false_positives'] / 1000)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pagination of list endpoints"""
+    
+    def setUp(self):
+        self.member, self.other = create_members(2, 'pages')
+        Transaction.objects.bulk_create([
+            Transaction(user=member, amount=Decimal(i), currency_type='v_coins', transaction_type='referral_bonus')
+            for i in range(7)
+            for member in (self.member, self.other)
+        ])
+        self.expected = list(
+            Transaction.objects.filter(user=self.member).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+    
+    def get(self, url):
+        path = url.replace('http://testserver', '')
+        response = call_view(TransactionListView, 'get', path, self.member)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_cursors_walk_every_row_once_in_both_directions(self):
+        pages = [self.get('/api/transactions?cursor=&page_size=3')]
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+        
+        forward = [item['id'] for page in pages for item in page['results']]
+        self.assertEqual(forward, self.expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertIsNone(pages[0]['count'])
+        
+        back = [self.get(pages[-1]['previous'])]
+        while back[-1]['previous']:
+            back.append(self.get(back[-1]['previous']))
+        backward = [item['id'] for page in reversed(back) for item in page['results']]
+        self.assertEqual(backward, self.expected[:6])
+    
+    def test_cursor_page_is_a_single_query_with_optional_count(self):
+        first = self.get('/api/transactions?cursor=&page_size=3&with_count=true')
+        
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get(first['next'])
+        
+        self.assertEqual(first['count'], 7)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('with_count=true', first['next'])
+        self.assertEqual(second['count'], 7)
+    
+    def test_page_numbers_still_work(self):
+        data = self.get('/api/transactions?page=2&page_size=3')
+        
+        self.assertEqual(data['count'], 7)
+        self.assertEqual([item['id'] for item in data['results']], self.expected[3:6])
+        self.assertTrue(data['next'].endswith('?page=3&page_size=3'))
+        self.assertTrue(data['previous'].endswith('?page=1&page_size=3'))
+    
+    def test_invalid_cursor_is_rejected(self):
+        admin = create_members(1, 'admin', is_admin=True)[0]
+        
+        response = call_view(AdminTransactionListView, 'get', '/api/admin/transactions?cursor=garbage', admin)
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class MemberSearchTests(TestCase):
+    """FTS5 and identifier prefix search of AdminUserListView"""
+    
+    def setUp(self):
+        self.admin = Member.objects.create(telegram_id=1, first_name='Admin', is_admin=True)
+        self.ivan = Member.objects.create(
+            telegram_id=555123, first_name='Иван', last_name='Петров', username='ivan_p', referral_code='IVAN0001'
+        )
+        self.ivanna = Member.objects.create(
+            telegram_id=777555, first_name='Ivanna', last_name='Smith', user_type='influencer', referral_code='ANNA0002'
+        )
+        self.peter = Member.objects.create(
+            telegram_id=123555, first_name='Peter', last_name='Ivanov', referral_code='PETE0003'
+        )
+    
+    def search(self, query):
+        response = call_view(AdminUserListView, 'get', f'/api/admin/users?{query}', self.admin)
+        self.assertEqual(response.status_code, 200)
+        return [user['id'] for user in response.data['results']]
+    
+    def test_name_prefixes_of_every_token(self):
+        self.assertEqual(set(self.search('search=iva')), {self.ivan.id, self.ivanna.id, self.peter.id})
+        self.assertEqual(self.search('search=ив'), [self.ivan.id])
+        self.assertEqual(self.search('search=ivanov'), [self.peter.id])
+        self.assertEqual(self.search('search=ИВАН%20пет'), [self.ivan.id])
+        self.assertEqual(self.search('search=ivan_p'), [self.ivan.id])
+        self.assertEqual(self.search('search=vanna'), [])
+        self.assertEqual(self.search('search=ivan&user_type=influencer'), [self.ivanna.id])
+    
+    def test_identifier_prefixes(self):
+        self.assertEqual(self.search('search=555'), [self.ivan.id])
+        self.assertEqual(self.search('search=5551'), [self.ivan.id])
+        self.assertEqual(self.search('search=555123'), [self.ivan.id])
+        self.assertEqual(self.search('search=5551234'), [])
+        self.assertEqual(self.search('search=anna0'), [self.ivanna.id])
+    
+    def test_index_follows_member_writes(self):
+        self.peter.first_name = 'Zorro'
+        self.peter.save()
+        Member.objects.filter(id=self.ivanna.id).update(last_name='Zeta')
+        self.ivan.delete()
+        
+        self.assertEqual(self.search('search=peter'), [])
+        self.assertEqual(set(self.search('search=z')), {self.peter.id, self.ivanna.id})
+        self.assertEqual(self.search('search=иван'), [])
+        self.assertEqual(set(self.search('search=iva')), {self.ivanna.id, self.peter.id})
+    
+    def test_ranked_typeahead(self):
+        Member.objects.create(telegram_id=999, first_name='Ivan', last_name='Ivanovich')
+        
+        ranked = self.search('search=ivan&ordering=relevance')
+        
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual(ranked[0], self.ivan.id)
+        self.assertEqual(self.search('search=ivan&ordering=relevance&limit=2'), ranked[:2])
+        self.assertEqual(self.search('search=ivan&ordering=relevance&user_type=influencer'), [self.ivanna.id])
+
+
+class SqliteProfileTests(TransactionTestCase):
+    """Connection pragmas and BEGIN IMMEDIATE write transactions"""
+    
+    def test_pragmas_are_applied_to_new_connections(self):
+        connection.close()
+        with connection.cursor() as cursor:
+            for name, expected in (('synchronous', 1), ('temp_store', 2), ('cache_size', -65536)):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], expected)
+    
+    def test_write_transactions_begin_immediate(self):
+        member = create_members(1, 'immediate')[0]
+        
+        with CaptureQueriesContext(connection) as queries:
+            with immediate_atomic():
+                balances.credit(member.id, 'cash', Decimal('5'))
+            with transaction.atomic():
+                balances.credit(member.id, 'cash', Decimal('5'))
+        
+        begins = [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+        member.refresh_from_db()
+        self.assertEqual(member.cash_balance, Decimal('10'))
+    
+    def test_nested_write_transaction_is_a_savepoint(self):
+        member = create_members(1, 'nested')[0]
+        
+        with transaction.atomic():
+            with self.assertRaises(balances.InsufficientBalance):
+                with immediate_atomic():
+                    balances.credit(member.id, 'cash', Decimal('5'))
+                    balances.debit(member.id, 'cash', Decimal('10'))
+            balances.credit(member.id, 'cash', Decimal('1'))
+        
+        member.refresh_from_db()
+        self.assertEqual(member.cash_balance, Decimal('1'))
+
+
+class RowSerializerTests(TestCase):
+    """values() row serializers match the DRF serializers byte for byte"""
+    
+    def setUp(self):
+        self.member, self.named, self.unnamed = create_members(3, 'rows')
+        Member.objects.filter(id=self.named.id).update(last_name='Smith')
+        Transaction.objects.bulk_create([
+            Transaction(user=self.member, amount=Decimal('1000'), currency_type='v_coins', transaction_type='referral_bonus',
+                        related_user=self.named, referral_level=1, description='Direct referral bonus (level 1)'),
+            Transaction(user=self.member, amount=Decimal('12.5'), currency_type='cash', transaction_type='depth_bonus',
+                        related_user=self.unnamed, referral_level=3),
+            Transaction(user=self.member, amount=Decimal('-7.25'), currency_type='cash', transaction_type='withdrawal'),
+        ])
+        Withdrawal.objects.bulk_create([
+            Withdrawal(user=self.member, amount=Decimal('500'), method='card', wallet_address='4111'),
+            Withdrawal(user=self.member, amount=Decimal('0.10'), method='crypto', wallet_address='0xabc', status='rejected',
+                       rejection_reason='Invalid wallet', processed_at=timezone.now(), transaction_id='tx1'),
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=self.member, title='Hi', message='Hello', notification_type='system', data=None),
+            Notification(user=self.member, title='Bonus', message='Paid', notification_type='referral_bonus',
+                         is_read=True, data={'amount': '1.00', 'levels': [1, 2]}),
+        ])
+    
+    def assertSameJSON(self, model_serializer, row_serializer, queryset):
+        queryset = queryset.filter(user=self.member).order_by('id')
+        expected = JSONRenderer().render(model_serializer(queryset, many=True).data)
+        actual = JSONRenderer().render(row_serializer.serialize(row_serializer.rows(queryset)))
+        self.assertEqual(actual, expected)
+    
+    def test_transactions(self):
+        self.assertSameJSON(TransactionSerializer, TransactionRowSerializer, Transaction.objects.all())
+    
+    def test_withdrawals(self):
+        self.assertSameJSON(WithdrawalSerializer, WithdrawalRowSerializer, Withdrawal.objects.all())
+    
+    def test_notifications(self):
+        self.assertSameJSON(NotificationSerializer, NotificationRowSerializer, Notification.objects.all())
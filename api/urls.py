@@ -10,9 +10,11 @@ from .views import (
     UserReferralsView,
     ReferralTreeView,
     ReferralLinkView,
+    LeaderboardView,
     TransactionListView,
     FirstTournamentCompletedView,
     DepositProcessedView,
+    EventBatchView,
     WithdrawalCreateView,
     WithdrawalListView,
     WithdrawalDetailView,
@@ -26,6 +28,7 @@ from .views import (
     AdminWithdrawalUpdateView,
     AdminStatsView,
     AdminAnalyticsView,
+    AdminMemberFilterMetricsView,
 )
 
 urlpatterns = [
@@ -43,11 +46,13 @@ urlpatterns = [
     path('user/<int:user_id>/referrals', UserReferralsView.as_view(), name='user-referrals'),
     path('user/<int:user_id>/referral-tree', ReferralTreeView.as_view(), name='referral-tree'),
     path('referral/link/<int:user_id>', ReferralLinkView.as_view(), name='referral-link'),
+    path('leaderboard', LeaderboardView.as_view(), name='leaderboard'),
     
     # Transactions
     path('transactions', TransactionListView.as_view(), name='transaction-list'),
     path('tournament/first-completed', FirstTournamentCompletedView.as_view(), name='first-tournament-completed'),
     path('deposit/processed', DepositProcessedView.as_view(), name='deposit-processed'),
+    path('events/batch', EventBatchView.as_view(), name='event-batch'),
     
     # Withdrawals
     path('withdrawals', WithdrawalListView.as_view(), name='withdrawal-list'),
@@ -67,4 +72,5 @@ urlpatterns = [
     path('admin/withdrawals/<int:id>', AdminWithdrawalUpdateView.as_view(), name='admin-withdrawal-update'),
     path('admin/stats', AdminStatsView.as_view(), name='admin-stats'),
     path('admin/analytics', AdminAnalyticsView.as_view(), name='admin-analytics'),
+    path('admin/metrics/member-filter', AdminMemberFilterMetricsView.as_view(), name='admin-member-filter-metrics'),
 ]
\ No newline at end of file
@@ -3,15 +3,16 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
 from django.utils import timezone
-from django.contrib.sessions.models import Session
-from django.db import transaction as db_transaction
-from django.db.models import Count, Q, Sum
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser
 from drf_spectacular.utils import extend_schema
 import hashlib
 import hmac
-import secrets
+import logging
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -33,9 +34,34 @@ from .serializers import (
     AdminUserSerializer,
     AdminUserUpdateSerializer,
     AdminStatsSerializer,
-    AdminAnalyticsSerializer
+    AdminAnalyticsSerializer,
+    LeaderboardSerializer
 )
-from .models import Member, Transaction, ReferralRelation, Notification, Withdrawal, PushSubscription
+from .models import (
+    Member,
+    Transaction,
+    ReferralRelation,
+    Notification,
+    Withdrawal,
+    PushSubscription,
+    ProcessedEvent,
+    REFERRAL_LEVEL_FIELDS
+)
+from . import balances
+from .bloom import member_filter
+from .db import immediate_atomic
+from .earnings import member_total_earnings, record_earnings, total_earnings, total_earnings_many
+from .ancestry import get_ancestor_ids
+from .idempotency import event_key, get_stored_response, get_stored_responses, record_processed_event
+from .jobs import enqueue_payout
+from .leaderboard import BOARDS, leaderboards
+from .pagination import paginate
+from .parsers import NDJSONParser
+from .rollups import activity_series, record_registration, record_transactions
+from .search import ranked_search, search_filter
+from .row_serializers import NotificationRowSerializer, TransactionRowSerializer, WithdrawalRowSerializer
+from .sessions import get_api_session, reuse_or_create_session, revoke_all_sessions, revoke_session
+from .snapshots import admin_stats
 
 # Constants for bonus calculation
 PLAYER_DIRECT_BONUS = 1000  # V-Coins
@@ -65,6 +91,13 @@ DEPTH_BONUSES_INFLUENCER = {
 MAX_REFERRAL_DEPTH = 10
 DEPOSIT_PERCENT = Decimal('0.10')  # 10% from deposit for influencer
 
+EVENT_BATCH_MAX_SIZE = 10000
+EVENT_BATCH_CHUNK_SIZE = 500
+# Members per CASE UPDATE of payout side effects (rank, active referrals)
+MEMBER_UPDATE_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
 
 class CookieAuthentication(BaseAuthentication):
     """
@@ -76,31 +109,17 @@ class CookieAuthentication(BaseAuthentication):
         if not session_token:
             return None
         
-        try:
-            # Get session from database
-            session = Session.objects.get(session_key=session_token)
-            session_data = session.get_decoded()
-            
-            # Check if session has expired
-            if session.expire_date < timezone.now():
-                return None
-            
-            # Get user ID from session
-            user_id = session_data.get('user_id')
-            if not user_id:
-                return None
-            
-            # Get user
-            user = Member.objects.get(id=user_id)
-            
-            # Check if user is blocked
-            if user.is_blocked:
-                raise AuthenticationFailed('User is blocked')
-            
-            return (user, None)
-        
-        except (Session.DoesNotExist, Member.DoesNotExist):
+        # Single indexed lookup of the hashed token joined to its member
+        session = get_api_session(session_token)
+        if session is None:
             return None
+        user = session.user
+        
+        # Check if user is blocked
+        if user.is_blocked:
+            raise AuthenticationFailed('User is blocked')
+        
+        return (user, None)
     
     def authenticate_header(self, request):
         return 'Cookie'
@@ -118,54 +137,87 @@ def build_referral_chain(new_user, referrer):
     if new_user.id == referrer.id:
         return
     
-    # Get all ancestors of the referrer
-    ancestor_relations = ReferralRelation.objects.filter(
-        descendant=referrer,
-        level__lt=MAX_REFERRAL_DEPTH
-    ).select_related('ancestor')
+    # Copy the referrer's ancestor rows one level down plus the level 1 row
+    # in a single INSERT ... SELECT, without hydrating any model instances
+    table = connection.ops.quote_name(ReferralRelation._meta.db_table)
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
     
-    relations_to_create = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (ancestor_id, descendant_id, level, has_paid_first_bonus, created_at)
+            SELECT %s, %s, 1, %s, %s
+            UNION ALL
+            SELECT ancestor_id, %s, level + 1, %s, %s
+            FROM {table}
+            WHERE descendant_id = %s AND level < %s AND ancestor_id <> %s
+            ON CONFLICT DO NOTHING
+            RETURNING ancestor_id, level
+            """,
+            [
+                referrer.id, new_user.id, False, created_at,
+                new_user.id, False, created_at,
+                referrer.id, MAX_REFERRAL_DEPTH, new_user.id
+            ]
+        )
+        ancestor_levels = dict(cursor.fetchall())
     
-    # Direct referral relationship (level 1)
-    relations_to_create.append(
-        ReferralRelation(
-            ancestor=referrer,
-            descendant=new_user,
-            level=1
+    # Keep materialized downline counters in sync with the closure table
+    increment_referral_counters(ancestor_levels)
+
+
+def increment_referral_counters(ancestor_levels):
+    """
+    Add one new descendant to the downline counters of every ancestor
+    Issues a single UPDATE for the whole chain
+    
+    Args:
+        ancestor_levels: Mapping of ancestor ID to the new descendant's level
+    """
+    if not ancestor_levels:
+        return
+    
+    updates = {'total_referrals_count': F('total_referrals_count') + 1}
+    for ancestor_id, level in ancestor_levels.items():
+        field = REFERRAL_LEVEL_FIELDS[level - 1]
+        updates[field] = Case(
+            When(id=ancestor_id, then=F(field) + 1),
+            default=F(field)
         )
-    )
     
-    # Add relationships with all ancestors up to level 10
-    for relation in ancestor_relations:
-        new_level = relation.level + 1
-        if new_level <= MAX_REFERRAL_DEPTH:
-            # Check for circular reference
-            if relation.ancestor.id != new_user.id:
-                relations_to_create.append(
-                    ReferralRelation(
-                        ancestor=relation.ancestor,
-                        descendant=new_user,
-                        level=new_level
-                    )
-                )
+    Member.objects.filter(id__in=ancestor_levels.keys()).update(**updates)
+
+
+def assemble_referral_tree(root_id, nodes, children_key):
+    """
+    Assemble downline nodes into a nested tree in a single pass
+    
+    Args:
+        root_id: ID of the member at the top of the tree
+        nodes: (referrer_id, node) pairs ordered by level, so parents come first
+        children_key: Node key holding the list of direct referrals
+    
+    Returns:
+        List of direct referral nodes of the root
+    """
+    children_by_parent = {root_id: []}
     
-    # Bulk create all relations
-    ReferralRelation.objects.bulk_create(relations_to_create, ignore_conflicts=True)
+    for referrer_id, node in nodes:
+        siblings = children_by_parent.get(referrer_id)
+        # Referrer is outside the loaded window (e.g. deleted member)
+        if siblings is None:
+            continue
+        siblings.append(node)
+        children_by_parent[node['id']] = node[children_key]
+    
+    return children_by_parent[root_id]
 
 
 def check_rank_upgrade(user):
     """
     Check and update user rank based on active referrals count
     """
-    active_count = user.active_referrals_count
-    
-    new_rank = 'standard'
-    if active_count >= RANK_THRESHOLDS['platinum']:
-        new_rank = 'platinum'
-    elif active_count >= RANK_THRESHOLDS['gold']:
-        new_rank = 'gold'
-    elif active_count >= RANK_THRESHOLDS['silver']:
-        new_rank = 'silver'
+    new_rank = get_rank_for_active_count(user.active_referrals_count)
     
     if new_rank != user.rank:
         old_rank = user.rank
@@ -173,12 +225,32 @@ def check_rank_upgrade(user):
         user.save(update_fields=['rank'])
         
         # Create notification about rank upgrade
-        create_notification(
-            user=user,
-            title='Rank Upgrade',
-            message=f'Congratulations! Your rank has been upgraded from {old_rank} to {new_rank}',
-            notification_type='rank_upgrade'
-        )
+        build_rank_upgrade_notification(user, old_rank, new_rank).save()
+
+
+def get_rank_for_active_count(active_count):
+    """
+    Map an active referrals count to the rank it qualifies for
+    """
+    if active_count >= RANK_THRESHOLDS['platinum']:
+        return 'platinum'
+    elif active_count >= RANK_THRESHOLDS['gold']:
+        return 'gold'
+    elif active_count >= RANK_THRESHOLDS['silver']:
+        return 'silver'
+    return 'standard'
+
+
+def build_rank_upgrade_notification(user, old_rank, new_rank):
+    """
+    Build unsaved rank upgrade notification
+    """
+    return build_notification(
+        user=user,
+        title='Rank Upgrade',
+        message=f'Congratulations! Your rank has been upgraded from {old_rank} to {new_rank}',
+        notification_type='rank_upgrade'
+    )
 
 
 def get_depth_bonus_amount(user_type, rank, level):
@@ -208,7 +280,17 @@ def create_notification(user, title, message, notification_type, data=None):
     Returns:
         Notification instance
     """
-    return Notification.objects.create(
+    notification = build_notification(user, title, message, notification_type, data)
+    notification.save()
+    return notification
+
+
+def build_notification(user, title, message, notification_type, data=None):
+    """
+    Build unsaved notification for user, e.g. for bulk_create
+    Takes the same arguments as create_notification
+    """
+    return Notification(
         user=user,
         title=title,
         message=message,
@@ -217,6 +299,571 @@ def create_notification(user, title, message, notification_type, data=None):
     )
 
 
+def currency_label(currency_type):
+    """
+    Human readable currency label used in notification messages
+    """
+    return "₽" if currency_type == "cash" else "V-Coins"
+
+
+def distribute_first_tournament_bonuses(user):
+    """
+    Pay first tournament bonuses to all unpaid ancestors of user
+    
+    All payouts are computed up front and written with a fixed number of
+    statements whatever the depth of the upline. Must run inside a
+    transaction.
+    
+    Args:
+        user: Member who completed their first tournament
+    
+    Returns:
+        List of distributed bonuses in API response format
+    """
+    ancestors, already_paid = load_first_tournament_state([user])
+    plan = plan_first_tournament_bonuses(user, ancestors, already_paid)
+    write_bonus_payouts([plan])
+    return format_bonuses(plan['payouts'])
+
+
+def load_first_tournament_state(users):
+    """
+    Load everything needed to plan first tournament bonuses for users
+    
+    Args:
+        users: Members who completed their first tournament
+    
+    Returns:
+        Tuple of (ancestors by ID, dict of user ID -> set of already paid ancestor IDs)
+    """
+    ancestor_ids = set()
+    for user in users:
+        ancestor_ids.update(get_ancestor_ids(user))
+    ancestors = Member.objects.in_bulk(ancestor_ids)
+    
+    already_paid = {user.id: set() for user in users}
+    paid_relations = ReferralRelation.objects.filter(
+        descendant_id__in=already_paid,
+        has_paid_first_bonus=True
+    ).values_list('descendant_id', 'ancestor_id')
+    for descendant_id, ancestor_id in paid_relations:
+        already_paid[descendant_id].add(ancestor_id)
+    
+    return ancestors, already_paid
+
+
+def plan_first_tournament_bonuses(user, ancestors, already_paid):
+    """
+    Compute first tournament payouts for user without writing anything
+    
+    The in-memory ancestors and already_paid sets are updated as if the
+    plan had been written, so several plans can be computed in a row and
+    written together.
+    
+    Args:
+        user: Member who completed their first tournament
+        ancestors: Preloaded ancestors by ID
+        already_paid: Dict of user ID -> set of already paid ancestor IDs
+    
+    Returns:
+        Dict with payouts, notifications, member_updates and paid_relations
+    """
+    paid = already_paid.setdefault(user.id, set())
+    
+    payouts = []
+    notifications = []
+    member_updates = {}
+    newly_paid = []
+    
+    for level, ancestor_id in enumerate(get_ancestor_ids(user), start=1):
+        ancestor = ancestors.get(ancestor_id)
+        # Skip if already paid or the ancestor no longer exists
+        if ancestor is None or ancestor_id in paid:
+            continue
+        newly_paid.append(ancestor_id)
+        currency_type = 'cash' if ancestor.user_type == 'influencer' else 'v_coins'
+        
+        # Level 1: Direct bonus
+        if level == 1:
+            if ancestor.user_type == 'influencer':
+                bonus_amount = Decimal(INFLUENCER_DIRECT_BONUS)
+            else:
+                bonus_amount = Decimal(PLAYER_DIRECT_BONUS)
+            transaction_type = 'referral_bonus'
+            description = f'First tournament bonus from {user.first_name} (level {level})'
+            
+            # Update active referrals count for direct referrer and check rank upgrade
+            active_count = ancestor.direct_referrals_count
+            new_rank = get_rank_for_active_count(active_count)
+            ancestor.active_referrals_count = active_count
+            member_updates[ancestor_id] = {'active_referrals_count': active_count}
+            if new_rank != ancestor.rank:
+                member_updates[ancestor_id]['rank'] = new_rank
+                notifications.append(
+                    build_rank_upgrade_notification(ancestor, ancestor.rank, new_rank)
+                )
+                ancestor.rank = new_rank
+            
+            notifications.append(build_notification(
+                user=ancestor,
+                title='Tournament Bonus',
+                message=f'{user.first_name} completed their first tournament! You received {bonus_amount} {currency_label(currency_type)}',
+                notification_type='tournament_bonus'
+            ))
+        
+        # Levels 2-10: Depth cashback based on rank
+        else:
+            bonus_amount = Decimal(get_depth_bonus_amount(
+                ancestor.user_type,
+                ancestor.rank,
+                level
+            ))
+            if bonus_amount <= 0:
+                continue
+            transaction_type = 'depth_bonus'
+            description = f'Depth bonus from {user.first_name} (level {level})'
+            
+            notifications.append(build_notification(
+                user=ancestor,
+                title='Depth Bonus',
+                message=f'Level {level} referral {user.first_name} completed first tournament! You received {bonus_amount} {currency_label(currency_type)}',
+                notification_type='tournament_bonus'
+            ))
+        
+        payouts.append((level, Transaction(
+            user=ancestor,
+            amount=bonus_amount,
+            currency_type=currency_type,
+            transaction_type=transaction_type,
+            related_user=user,
+            referral_level=level,
+            description=description
+        )))
+    
+    paid.update(newly_paid)
+    
+    return {
+        'payouts': payouts,
+        'notifications': notifications,
+        'member_updates': member_updates,
+        'paid_relations': [(user.id, newly_paid)] if newly_paid else [],
+    }
+
+
+def write_bonus_payouts(plans):
+    """
+    Write several payout plans with a fixed number of statements
+    
+    Transactions in the plans get their primary keys assigned. Must run
+    inside a transaction.
+    
+    Args:
+        plans: Dicts as returned by plan_first_tournament_bonuses and
+            plan_deposit_bonus
+    """
+    transactions = []
+    notifications = []
+    member_updates = {}
+    total_deposits = {}
+    paid_relations = []
+    
+    for plan in plans:
+        transactions.extend(transaction for _, transaction in plan['payouts'])
+        notifications.extend(plan['notifications'])
+        for member_id, values in plan['member_updates'].items():
+            member_updates.setdefault(member_id, {}).update(values)
+        for member_id, amount in plan.get('deposits', []):
+            total_deposits[member_id] = total_deposits.get(member_id, Decimal('0')) + amount
+        paid_relations.extend(plan['paid_relations'])
+    
+    Transaction.objects.bulk_create(transactions)
+    record_earnings(transactions)
+    record_transactions(transactions)
+    Notification.objects.bulk_create(notifications)
+    apply_member_payouts(transactions, member_updates)
+    
+    # Update users' total deposits
+    if total_deposits:
+        Member.objects.filter(id__in=total_deposits).update(total_deposits=F('total_deposits') + Case(
+            *[When(id=member_id, then=Value(amount)) for member_id, amount in total_deposits.items()],
+            output_field=DecimalField(max_digits=20, decimal_places=2)
+        ))
+    
+    # Mark as paid
+    if paid_relations:
+        condition = Q()
+        for descendant_id, ancestor_ids in paid_relations:
+            condition |= Q(descendant_id=descendant_id, ancestor_id__in=ancestor_ids)
+        ReferralRelation.objects.filter(condition).update(has_paid_first_bonus=True)
+
+
+def format_bonuses(payouts):
+    """
+    Render written (level, Transaction) payouts in API response format
+    """
+    return [
+        {
+            'recipient_id': transaction.user_id,
+            'level': level,
+            'amount': str(transaction.amount),
+            'currency_type': 'rubles' if transaction.currency_type == 'cash' else 'vcoins',
+            'transaction_id': transaction.id
+        }
+        for level, transaction in payouts
+    ]
+
+
+def apply_member_payouts(transactions, member_updates=None):
+    """
+    Credit payout transactions to member balances
+    
+    Balances are incremented atomically in a single UPDATE, so concurrent
+    credits to the same member are never lost. The extra field values are
+    set with one CASE UPDATE per MEMBER_UPDATE_BATCH_SIZE members.
+    
+    Args:
+        transactions: Transaction instances to credit
+        member_updates: Optional mapping of member ID to extra field values
+    """
+    balances.credit_many(
+        (transaction.user_id, transaction.currency_type, transaction.amount)
+        for transaction in transactions
+    )
+    
+    updates = sorted((member_updates or {}).items())
+    for start in range(0, len(updates), MEMBER_UPDATE_BATCH_SIZE):
+        batch = updates[start:start + MEMBER_UPDATE_BATCH_SIZE]
+        fields = sorted({field for _, values in batch for field in values})
+        Member.objects.filter(id__in=[member_id for member_id, _ in batch]).update(**{
+            field: Case(
+                *[
+                    When(id=member_id, then=Value(values[field]))
+                    for member_id, values in batch if field in values
+                ],
+                default=F(field),
+                output_field=Member._meta.get_field(field)
+            )
+            for field in fields
+        })
+
+
+def distribute_deposit_bonuses(user, amount):
+    """
+    Record a deposit and pay the deposit percent to an influencer referrer
+    
+    Must run inside a transaction.
+    
+    Args:
+        user: Member who made the deposit
+        amount: Deposit amount as Decimal
+    
+    Returns:
+        List of distributed bonuses in API response format
+    """
+    # Find direct referrer (level 1)
+    ancestor_ids = get_ancestor_ids(user)
+    referrer = Member.objects.filter(id=ancestor_ids[0]).first() if ancestor_ids else None
+    
+    plan = plan_deposit_bonus(user, amount, referrer)
+    write_bonus_payouts([plan])
+    return format_bonuses(plan['payouts'])
+
+
+def plan_deposit_bonus(user, amount, referrer):
+    """
+    Compute the deposit payout for user without writing anything
+    
+    Args:
+        user: Member who made the deposit
+        amount: Deposit amount as Decimal
+        referrer: Direct referrer of user or None
+    
+    Returns:
+        Payout plan in the format of plan_first_tournament_bonuses
+    """
+    plan = {
+        'payouts': [],
+        'notifications': [],
+        'member_updates': {},
+        'paid_relations': [],
+        'deposits': [(user.id, amount)],
+    }
+    
+    # Check if referrer is influencer
+    if referrer is not None and referrer.user_type == 'influencer':
+        # Calculate 10% bonus
+        bonus_amount = amount * DEPOSIT_PERCENT
+        
+        plan['payouts'].append((1, Transaction(
+            user=referrer,
+            amount=bonus_amount,
+            currency_type='cash',
+            transaction_type='deposit_percent',
+            related_user=user,
+            referral_level=1,
+            description=f'10% from {user.first_name} deposit of {amount}₽ (level 1)'
+        )))
+        plan['notifications'].append(build_notification(
+            user=referrer,
+            title='Deposit Bonus',
+            message=f'{user.first_name} made a deposit of {amount}₽! You received {bonus_amount}₽ (10%)',
+            notification_type='deposit_bonus'
+        ))
+    
+    return plan
+
+
+def process_first_tournament_event(user, tournament_id):
+    """
+    Pay first tournament bonuses and record the event in the idempotency ledger
+    
+    Must run inside a transaction.
+    
+    Returns:
+        Response data of the event
+    """
+    data = {
+        'success': True,
+        'user_id': user.id,
+        'tournament_id': tournament_id,
+        'bonuses_distributed': distribute_first_tournament_bonuses(user)
+    }
+    record_processed_event(*event_key('first_tournament', user_id=user.id), data)
+    return data
+
+
+def process_deposit_event(user, amount, deposit_id):
+    """
+    Pay deposit bonuses and record the event in the idempotency ledger
+    
+    Must run inside a transaction.
+    
+    Returns:
+        Response data of the event
+    """
+    data = {
+        'success': True,
+        'user_id': user.id,
+        'deposit_id': deposit_id,
+        'amount': str(amount),
+        'bonuses_distributed': distribute_deposit_bonuses(user, amount)
+    }
+    record_processed_event(*event_key('deposit', deposit_id=deposit_id), data)
+    return data
+
+
+def replayed_response(data):
+    """
+    Response for an event already present in the idempotency ledger
+    """
+    return Response(data, status=status.HTTP_200_OK, headers={'Idempotent-Replayed': 'true'})
+
+
+def validate_event(event):
+    """
+    Validate and normalize one batch event
+    
+    The incoming event is left untouched.
+    
+    Returns:
+        Tuple of (normalized event, error message); exactly one of them is
+        None. The normalized event has an int user_id, a Decimal amount for
+        deposits and its ledger key under 'key'.
+    """
+    if not isinstance(event, dict):
+        return None, 'Event must be an object'
+    
+    event_type = event.get('type')
+    user_id = event.get('user_id')
+    if user_id:
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            return None, 'Invalid user_id'
+    
+    if event_type == 'first_tournament':
+        tournament_id = event.get('tournament_id')
+        if not user_id or not tournament_id:
+            return None, 'user_id and tournament_id are required'
+        return {
+            'key': event_key(event_type, user_id=user_id),
+            'type': event_type,
+            'user_id': user_id,
+            'tournament_id': tournament_id,
+        }, None
+    
+    if event_type == 'deposit':
+        deposit_id = event.get('deposit_id')
+        if not user_id or not event.get('amount') or not deposit_id:
+            return None, 'user_id, amount and deposit_id are required'
+        try:
+            amount = Decimal(str(event['amount']))
+            if amount <= 0:
+                raise ValueError
+        except (ValueError, TypeError, ArithmeticError):
+            return None, 'Invalid amount'
+        return {
+            'key': event_key(event_type, deposit_id=deposit_id),
+            'type': event_type,
+            'user_id': user_id,
+            'deposit_id': deposit_id,
+            'amount': amount,
+        }, None
+    
+    return None, 'type must be first_tournament or deposit'
+
+
+def ingest_events(events, chunk_size=EVENT_BATCH_CHUNK_SIZE):
+    """
+    Apply a batch of first tournament and deposit events
+    
+    Events are deduplicated by tournament/deposit, users and their uplines
+    are loaded with set-based queries and payouts are written in chunked
+    transactions. A failing chunk is rolled back without affecting the
+    others, and only its failing events are reported as errors.
+    
+    Args:
+        events: List of event dicts as received
+        chunk_size: Number of events written per transaction
+    
+    Returns:
+        List of per-event results in request order
+    """
+    results = []
+    accepted = []
+    seen = {}
+    
+    for index, raw_event in enumerate(events):
+        event, error = validate_event(raw_event)
+        result = {'index': index, 'type': raw_event.get('type') if isinstance(raw_event, dict) else None}
+        results.append(result)
+        if error:
+            result.update(status='error', detail=error)
+        elif event['key'] in seen:
+            result.update(status='duplicate', duplicate_of=seen[event['key']])
+        else:
+            seen[event['key']] = index
+            accepted.append((index, event))
+    
+    # Events applied by earlier requests are answered from the ledger
+    stored = get_stored_responses(seen)
+    if stored:
+        pending = []
+        for index, event in accepted:
+            response = stored.get(event['key'])
+            if response is None:
+                pending.append((index, event))
+            else:
+                set_event_result(results[index], 'replayed', response)
+        accepted = pending
+    
+    users = Member.objects.in_bulk({event['user_id'] for _, event in accepted})
+    
+    for start in range(0, len(accepted), chunk_size):
+        chunk = []
+        for index, event in accepted[start:start + chunk_size]:
+            user = users.get(event['user_id'])
+            if user is None:
+                results[index].update(status='error', detail='User not found')
+            else:
+                chunk.append((index, event, user))
+        apply_event_chunk(chunk, results)
+    
+    return results
+
+
+def set_event_result(result, outcome, response):
+    """Copy a processed event's response into its batch result"""
+    result.update(status=outcome, **response)
+    del result['success']
+
+
+def apply_event_chunk(chunk, results):
+    """
+    Apply a chunk of events in one transaction and fill in their results
+    
+    Events recorded in the ledger by a concurrent request in the meantime
+    make the ledger insert fail. They are answered from the ledger and the
+    rest of the chunk is retried. Any other failure is narrowed down to
+    the failing events by applying the chunk one event at a time.
+    """
+    while chunk:
+        try:
+            responses = write_event_chunk(chunk)
+        except Exception as exc:
+            stored = {}
+            if isinstance(exc, IntegrityError):
+                stored = get_stored_responses(event['key'] for _, event, _ in chunk)
+            if stored:
+                pending = []
+                for index, event, user in chunk:
+                    response = stored.get(event['key'])
+                    if response is None:
+                        pending.append((index, event, user))
+                    else:
+                        set_event_result(results[index], 'replayed', response)
+                chunk = pending
+                continue
+            if len(chunk) > 1:
+                for item in chunk:
+                    apply_event_chunk([item], results)
+                return
+            index = chunk[0][0]
+            logger.exception('Processing event %s of the batch failed', index)
+            results[index].update(status='error', detail='Processing failed')
+            return
+        
+        for (index, _, _), response in zip(chunk, responses):
+            set_event_result(results[index], 'processed', response)
+        return
+
+
+def write_event_chunk(chunk):
+    """
+    Write the payouts and ledger rows of a chunk of events in one transaction
+    
+    Returns:
+        List of the events' responses in chunk order
+    
+    Raises:
+        IntegrityError: If an event of the chunk has already been recorded
+    """
+    with immediate_atomic():
+        # Ancestors are reloaded per chunk so earlier chunks' rank changes are seen
+        ancestors, already_paid = load_first_tournament_state(
+            [user for _, _, user in chunk]
+        )
+        plans = []
+        for index, event, user in chunk:
+            if event['type'] == 'first_tournament':
+                plan = plan_first_tournament_bonuses(user, ancestors, already_paid)
+            else:
+                ancestor_ids = get_ancestor_ids(user)
+                referrer = ancestors.get(ancestor_ids[0]) if ancestor_ids else None
+                plan = plan_deposit_bonus(user, event['amount'], referrer)
+            plans.append((event, plan))
+        write_bonus_payouts([plan for _, plan in plans])
+        
+        ledger = []
+        for event, plan in plans:
+            data = {'success': True, 'user_id': event['user_id']}
+            if event['type'] == 'first_tournament':
+                data['tournament_id'] = event['tournament_id']
+            else:
+                data['deposit_id'] = event['deposit_id']
+                data['amount'] = str(event['amount'])
+            data['bonuses_distributed'] = format_bonuses(plan['payouts'])
+            event_type, external_id = event['key']
+            ledger.append(ProcessedEvent(
+                event_type=event_type,
+                external_id=external_id,
+                response=data
+            ))
+        ProcessedEvent.objects.bulk_create(ledger)
+    
+    return [processed.response for processed in ledger]
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
@@ -252,19 +899,35 @@ class TelegramAuthView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        # Create or update user
-        user, created = Member.objects.update_or_create(
-            telegram_id=data['telegram_id'],
-            defaults={
-                'username': data.get('username'),
-                'first_name': data.get('first_name', ''),
-                'last_name': data.get('last_name', ''),
-                'photo_url': data.get('photo_url'),
-            }
-        )
+        profile = {
+            'username': data.get('username'),
+            'first_name': data.get('first_name', ''),
+            'last_name': data.get('last_name', ''),
+            'photo_url': data.get('photo_url'),
+        }
         
-        # Create session
-        session_token = self.create_session(user)
+        # Create user, or update the profile only if Telegram reports a change
+        user = Member.objects.filter(telegram_id=data['telegram_id']).first()
+        if user is None:
+            # The registration rollup commits together with the member row
+            with immediate_atomic():
+                user, created = Member.objects.get_or_create(
+                    telegram_id=data['telegram_id'],
+                    defaults=profile
+                )
+                if created:
+                    record_registration(user)
+        else:
+            changed = [field for field, value in profile.items() if getattr(user, field) != value]
+            if changed:
+                for field in changed:
+                    setattr(user, field, profile[field])
+                user.save(update_fields=changed + ['updated_at'])
+        
+        # Reuse the session this device already holds, create one otherwise
+        session_token, expires_at = reuse_or_create_session(
+            user, request.COOKIES.get('session_token')
+        )
         
         # Prepare response
         response_serializer = MemberSerializer(user)
@@ -276,7 +939,7 @@ class TelegramAuthView(APIView):
             value=session_token,
             httponly=True,
             samesite='Lax',
-            max_age=60 * 60 * 24 * 30,  # 30 days
+            max_age=int((expires_at - timezone.now()).total_seconds()),
             secure=False  # Set to True in production with HTTPS
         )
         
@@ -297,25 +960,6 @@ class TelegramAuthView(APIView):
         # 4. Compare with provided hash
         
         return True
-    
-    def create_session(self, user):
-        """
-        Create a session for the user and return session token
-        """
-        # Generate session token
-        session_token = secrets.token_urlsafe(32)
-        
-        # Create session
-        session = Session.objects.create(
-            session_key=session_token,
-            session_data=Session.objects.encode({
-                'user_id': user.id,
-                'created_at': timezone.now().isoformat()
-            }),
-            expire_date=timezone.now() + timezone.timedelta(days=30)
-        )
-        
-        return session_token
 
 
 class LogoutView(APIView):
@@ -338,11 +982,7 @@ class LogoutView(APIView):
         # Delete session
         session_token = request.COOKIES.get('session_token')
         if session_token:
-            try:
-                session = Session.objects.get(session_key=session_token)
-                session.delete()
-            except Session.DoesNotExist:
-                pass
+            revoke_session(session_token)
         
         # Prepare response
         response = Response(
@@ -482,20 +1122,14 @@ class UserStatsView(APIView):
         balance = user.cash_balance if user.user_type == 'influencer' else user.v_coins_balance
         
         # Count referrals
-        referral_count = user.referrals.count()
-        
-        # Calculate total earnings
-        total_earnings = Transaction.objects.filter(
-            user=user,
-            transaction_type__in=['referral_bonus', 'depth_bonus', 'deposit_percent']
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        referral_count = user.direct_referrals_count
         
         stats = {
             'user_id': user.id,
             'balance': balance,
             'rank': user.rank,
             'referral_count': referral_count,
-            'total_earnings': total_earnings
+            'total_earnings': total_earnings(user.id)
         }
         
         serializer = MemberStatsSerializer(stats)
@@ -525,35 +1159,48 @@ class RegisterWithReferralView(APIView):
         data = serializer.validated_data
         referrer_code = data.get('referrer_code')
         
-        # Check if user already exists
-        if Member.objects.filter(telegram_id=data['telegram_id']).exists():
-            return Response(
-                {'detail': 'User already exists'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Check if user already exists, the Bloom filter answers definite negatives
+        if member_filter.may_have_telegram_id(data['telegram_id']):
+            if Member.objects.filter(telegram_id=data['telegram_id']).exists():
+                return Response(
+                    {'detail': 'User already exists'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            member_filter.record_false_positive('telegram_ids')
         
         # Find referrer if code provided
         referrer = None
         if referrer_code:
-            try:
-                referrer = Member.objects.get(referral_code=referrer_code)
-            except Member.DoesNotExist:
+            if member_filter.may_have_referral_code(referrer_code):
+                referrer = Member.objects.filter(referral_code=referrer_code).first()
+                if referrer is None:
+                    member_filter.record_false_positive('referral_codes')
+            if referrer is None:
                 return Response(
                     {'detail': 'Invalid referral code'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
         # Create user with atomic transaction
-        with db_transaction.atomic():
+        with immediate_atomic():
             # Create new user
-            new_user = Member.objects.create(
-                telegram_id=data['telegram_id'],
-                username=data.get('username'),
-                first_name=data.get('first_name', ''),
-                last_name=data.get('last_name', ''),
-                photo_url=data.get('photo_url'),
-                referrer=referrer
-            )
+            try:
+                new_user = Member.objects.create(
+                    telegram_id=data['telegram_id'],
+                    username=data.get('username'),
+                    first_name=data.get('first_name', ''),
+                    last_name=data.get('last_name', ''),
+                    photo_url=data.get('photo_url'),
+                    referrer=referrer
+                )
+            except IntegrityError:
+                # Registered by another worker since this worker's filter was refreshed
+                db_transaction.set_rollback(True)
+                return Response(
+                    {'detail': 'User already exists'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            record_registration(new_user)
             
             # Build referral chain if referrer exists
             if referrer:
@@ -570,27 +1217,32 @@ class RegisterWithReferralView(APIView):
                 
                 # Give direct bonus to referrer
                 if referrer.user_type == 'influencer':
-                    referrer.cash_balance += INFLUENCER_DIRECT_BONUS
                     bonus_amount = INFLUENCER_DIRECT_BONUS
                     currency_type = 'cash'
                 else:
-                    referrer.v_coins_balance += PLAYER_DIRECT_BONUS
                     bonus_amount = PLAYER_DIRECT_BONUS
                     currency_type = 'v_coins'
+                new_balance = balances.credit(referrer.id, currency_type, Decimal(bonus_amount))
+                setattr(referrer, balances.BALANCE_FIELDS[currency_type], new_balance)
                 
                 # Update active referrals count
+                Member.objects.filter(id=referrer.id).update(
+                    active_referrals_count=F('active_referrals_count') + 1
+                )
                 referrer.active_referrals_count += 1
-                referrer.save(update_fields=['cash_balance', 'v_coins_balance', 'active_referrals_count'])
                 
                 # Create transaction record for direct bonus
-                Transaction.objects.create(
+                bonus = Transaction.objects.create(
                     user=referrer,
                     amount=bonus_amount,
                     currency_type=currency_type,
                     transaction_type='referral_bonus',
                     related_user=new_user,
+                    referral_level=1,
                     description=f'Direct referral bonus from {new_user.first_name} (level 1)'
                 )
+                record_earnings([bonus])
+                record_transactions([bonus])
                 
                 # Create notification for referrer
                 create_notification(
@@ -646,56 +1298,44 @@ class UserReferralsView(APIView):
         elif depth > MAX_REFERRAL_DEPTH:
             depth = MAX_REFERRAL_DEPTH
         
-        # Get all referrals up to specified depth
-        referral_relations = ReferralRelation.objects.filter(
+        # Get all referrals up to specified depth along with their referrer
+        rows = ReferralRelation.objects.filter(
             ancestor=user,
             level__lte=depth
-        ).select_related('descendant').order_by('level', 'created_at')
-        
-        # Build nested structure
-        referrals_by_level = {}
-        for relation in referral_relations:
-            level = relation.level
-            if level not in referrals_by_level:
-                referrals_by_level[level] = []
-            
-            descendant = relation.descendant
-            referral_data = {
-                'id': descendant.id,
-                'telegram_id': descendant.telegram_id,
-                'username': descendant.username,
-                'first_name': descendant.first_name,
-                'last_name': descendant.last_name,
-                'photo_url': descendant.photo_url,
-                'user_type': descendant.user_type,
+        ).order_by('level', 'created_at').values_list(
+            'descendant_id',
+            'descendant__referrer_id',
+            'descendant__telegram_id',
+            'descendant__username',
+            'descendant__first_name',
+            'descendant__last_name',
+            'descendant__photo_url',
+            'descendant__user_type',
+            'level',
+            'descendant__created_at'
+        )
+        
+        nodes = []
+        for (
+            descendant_id, referrer_id, telegram_id, username, first_name,
+            last_name, photo_url, user_type, level, created_at
+        ) in rows:
+            nodes.append((referrer_id, {
+                'id': descendant_id,
+                'telegram_id': telegram_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'photo_url': photo_url,
+                'user_type': user_type,
                 'level': level,
-                'registered_at': descendant.created_at,
+                'registered_at': created_at,
                 'referrals': []
-            }
-            referrals_by_level[level].append(referral_data)
+            }))
         
         # Build hierarchical structure
-        def build_tree(parent_id, current_level):
-            if current_level > depth:
-                return []
-            
-            children = []
-            for ref in referrals_by_level.get(current_level, []):
-                # Check if this referral belongs to this parent
-                if current_level == 1:
-                    # Direct referrals
-                    if Member.objects.filter(id=ref['id'], referrer_id=user.id).exists():
-                        ref['referrals'] = build_tree(ref['id'], current_level + 1)
-                        children.append(ref)
-                else:
-                    # Indirect referrals
-                    if Member.objects.filter(id=ref['id'], referrer_id=parent_id).exists():
-                        ref['referrals'] = build_tree(ref['id'], current_level + 1)
-                        children.append(ref)
-            return children
-        
-        referrals = build_tree(user.id, 1)
-        total_referrals = sum(len(refs) for refs in referrals_by_level.values())
+        referrals = assemble_referral_tree(user.id, nodes, 'referrals')
+        total_referrals = len(nodes)
         
         return Response({
             'user_id': user.id,
@@ -737,56 +1377,44 @@ class ReferralTreeView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get all descendant relations
-        all_relations = ReferralRelation.objects.filter(
-            ancestor=user
-        ).select_related('descendant').order_by('level', 'created_at')
-        
-        # Count referrals per level
-        levels = {}
-        for relation in all_relations:
-            level = str(relation.level)
-            levels[level] = levels.get(level, 0) + 1
+        # Load the whole downline with a single closure-table scan
+        rows = ReferralRelation.objects.filter(
+            ancestor=user,
+            level__lte=MAX_REFERRAL_DEPTH
+        ).order_by('level', 'descendant__created_at', 'descendant_id').values_list(
+            'descendant_id',
+            'descendant__referrer_id',
+            'descendant__telegram_id',
+            'descendant__username',
+            'descendant__first_name',
+            'descendant__user_type',
+            'level',
+            'descendant__referrals_level_1',
+            'descendant__total_referrals_count',
+            'descendant__created_at'
+        )
         
-        # Build tree structure recursively
-        def build_tree_node(node_user, current_level=1):
-            if current_level > MAX_REFERRAL_DEPTH:
-                return None
-            
-            # Get direct referrals
-            direct_referrals = Member.objects.filter(referrer=node_user).order_by('created_at')
-            
-            children = []
-            for child in direct_referrals:
-                # Count this child's total referrals
-                child_total = ReferralRelation.objects.filter(ancestor=child).count()
-                child_direct = Member.objects.filter(referrer=child).count()
-                
-                child_node = {
-                    'id': child.id,
-                    'telegram_id': child.telegram_id,
-                    'username': child.username,
-                    'first_name': child.first_name,
-                    'user_type': child.user_type,
-                    'level': current_level,
-                    'direct_referrals_count': child_direct,
-                    'total_referrals_count': child_total,
-                    'registered_at': child.created_at,
-                    'children': []
-                }
-                
-                # Recursively build children if not at max depth
-                if current_level < MAX_REFERRAL_DEPTH:
-                    child_tree = build_tree_node(child, current_level + 1)
-                    if child_tree:
-                        child_node['children'] = child_tree
-                
-                children.append(child_node)
-            
-            return children
+        nodes = []
+        for (
+            descendant_id, referrer_id, telegram_id, username, first_name,
+            user_type, level, direct_count, total_count, created_at
+        ) in rows:
+            nodes.append((referrer_id, {
+                'id': descendant_id,
+                'telegram_id': telegram_id,
+                'username': username,
+                'first_name': first_name,
+                'user_type': user_type,
+                'level': level,
+                'direct_referrals_count': direct_count,
+                'total_referrals_count': total_count,
+                'registered_at': created_at,
+                'children': []
+            }))
         
-        tree = build_tree_node(user, 1)
-        total_referrals = ReferralRelation.objects.filter(ancestor=user).count()
+        tree = assemble_referral_tree(user.id, nodes, 'children')
+        total_referrals = user.total_referrals_count
+        levels = user.referrals_by_level()
         
         return Response({
             'user_id': user.id,
@@ -842,6 +1470,69 @@ class ReferralLinkView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class LeaderboardView(APIView):
+    """
+    Get the top referrers and the rank of the current user
+    GET /api/leaderboard
+    """
+    authentication_classes = [CookieAuthentication]
+    
+    @extend_schema(
+        parameters=[
+            {'name': 'by', 'in': 'query', 'schema': {'type': 'string', 'enum': list(BOARDS)}},
+            {'name': 'limit', 'in': 'query', 'schema': {'type': 'integer'}},
+        ],
+        responses={200: LeaderboardSerializer}
+    )
+    def get(self, request):
+        if not request.user or not request.user.is_authenticated:
+            return Response(
+                {'detail': 'Not authenticated'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        board_name = request.query_params.get('by', 'descendants')
+        if board_name not in BOARDS:
+            board_name = 'descendants'
+        
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = max(1, min(limit, 100))
+        
+        board = leaderboards.board(board_name)
+        top = board.top(limit)
+        members = {
+            row['id']: row
+            for row in Member.objects.filter(
+                id__in=[member_id for member_id, _, _ in top]
+            ).values('id', 'first_name', 'username', 'user_type')
+        }
+        
+        entries = []
+        for member_id, rank, score in top:
+            member = members.get(member_id)
+            if member is None:
+                continue
+            entries.append({
+                'rank': rank,
+                'user_id': member_id,
+                'first_name': member['first_name'],
+                'username': member['username'],
+                'user_type': member['user_type'],
+                'score': float(score)
+            })
+        
+        rank, score = board.rank(request.user.id)
+        
+        return Response({
+            'by': board_name,
+            'entries': entries,
+            'me': {'rank': rank, 'score': float(score)}
+        }, status=status.HTTP_200_OK)
+
+
 class TransactionListView(APIView):
     """
     Get list of transactions for current user
@@ -857,6 +1548,9 @@ class TransactionListView(APIView):
             {'name': 'transaction_type', 'in': 'query', 'schema': {'type': 'string'}},
             {'name': 'date_from', 'in': 'query', 'schema': {'type': 'string', 'format': 'date'}},
             {'name': 'date_to', 'in': 'query', 'schema': {'type': 'string', 'format': 'date'}},
+            {'name': 'referral_level', 'in': 'query', 'schema': {'type': 'integer'}},
+            {'name': 'cursor', 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': 'with_count', 'in': 'query', 'schema': {'type': 'boolean'}},
         ],
         responses={200: TransactionSerializer(many=True)}
     )
@@ -874,6 +1568,7 @@ class TransactionListView(APIView):
         transaction_type = request.query_params.get('transaction_type')
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
+        referral_level = request.query_params.get('referral_level')
         
         # Validate page_size
         if page_size < 1:
@@ -882,7 +1577,7 @@ class TransactionListView(APIView):
             page_size = 100
         
         # Build query
-        queryset = Transaction.objects.filter(user=request.user).select_related('related_user')
+        queryset = Transaction.objects.filter(user=request.user)
         
         # Apply filters
         if currency_type:
@@ -908,6 +1603,9 @@ class TransactionListView(APIView):
             if model_type:
                 queryset = queryset.filter(transaction_type=model_type)
         
+        if referral_level and referral_level.isdigit():
+            queryset = queryset.filter(referral_level=int(referral_level))
+        
         if date_from:
             try:
                 date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
@@ -924,38 +1622,12 @@ class TransactionListView(APIView):
             except ValueError:
                 pass
         
-        # Order by date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Get total count
-        total_count = queryset.count()
-        
-        # Calculate pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        
-        # Get paginated results
-        transactions = queryset[start_index:end_index]
-        
-        # Serialize data
-        serializer = TransactionSerializer(transactions, many=True)
-        
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        next_url = None
-        previous_url = None
-        
-        if end_index < total_count:
-            next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if page > 1:
-            previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
+        # Paginate newest first, by page number or by cursor
+        transactions, pagination = paginate(request, TransactionRowSerializer.rows(queryset), page, page_size)
         
         return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
-            'results': serializer.data
+            **pagination,
+            'results': TransactionRowSerializer.serialize(transactions)
         }, status=status.HTTP_200_OK)
 
 
@@ -968,7 +1640,7 @@ class FirstTournamentCompletedView(APIView):
     
     @extend_schema(
         request={'type': 'object'},
-        responses={200: {'type': 'object'}}
+        responses={200: {'type': 'object'}, 202: {'type': 'object'}}
     )
     def post(self, request):
         if not request.user or not request.user.is_authenticated:
@@ -987,6 +1659,12 @@ class FirstTournamentCompletedView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Replay the stored response if the event was already applied
+        key = event_key('first_tournament', user_id=user_id)
+        stored = get_stored_response(*key)
+        if stored is not None:
+            return replayed_response(stored)
+        
         # Get user
         try:
             user = Member.objects.get(id=user_id)
@@ -996,124 +1674,31 @@ class FirstTournamentCompletedView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        bonuses_distributed = []
+        if settings.PAYOUTS_ASYNC:
+            job, _ = enqueue_payout(
+                'first_tournament',
+                f'first_tournament:{user.id}',
+                {'user_id': user.id, 'tournament_id': tournament_id}
+            )
+            return Response({
+                'success': True,
+                'queued': True,
+                'job_id': job.id,
+                'user_id': user.id,
+                'tournament_id': tournament_id
+            }, status=status.HTTP_202_ACCEPTED)
         
-        with db_transaction.atomic():
-            # Get all ancestor relations
-            ancestor_relations = ReferralRelation.objects.filter(
-                descendant=user
-            ).select_related('ancestor').order_by('level')
-            
-            for relation in ancestor_relations:
-                # Skip if already paid
-                if relation.has_paid_first_bonus:
-                    continue
-                
-                ancestor = relation.ancestor
-                level = relation.level
-                
-                # Level 1: Direct bonus
-                if level == 1:
-                    if ancestor.user_type == 'influencer':
-                        bonus_amount = Decimal(INFLUENCER_DIRECT_BONUS)
-                        currency_type = 'cash'
-                        ancestor.cash_balance += bonus_amount
-                    else:
-                        bonus_amount = Decimal(PLAYER_DIRECT_BONUS)
-                        currency_type = 'v_coins'
-                        ancestor.v_coins_balance += bonus_amount
-                    
-                    ancestor.save(update_fields=['cash_balance', 'v_coins_balance'])
-                    
-                    # Create transaction
-                    transaction = Transaction.objects.create(
-                        user=ancestor,
-                        amount=bonus_amount,
-                        currency_type=currency_type,
-                        transaction_type='referral_bonus',
-                        related_user=user,
-                        description=f'First tournament bonus from {user.first_name} (level {level})'
-                    )
-                    
-                    # Update active referrals count for direct referrer
-                    ancestor.active_referrals_count = Member.objects.filter(
-                        referrer=ancestor
-                    ).count()
-                    ancestor.save(update_fields=['active_referrals_count'])
-                    
-                    # Check rank upgrade
-                    check_rank_upgrade(ancestor)
-                    
-                    # Create notification
-                    create_notification(
-                        user=ancestor,
-                        title='Tournament Bonus',
-                        message=f'{user.first_name} completed their first tournament! You received {bonus_amount} {"₽" if currency_type == "cash" else "V-Coins"}',
-                        notification_type='tournament_bonus'
-                    )
-                    
-                    bonuses_distributed.append({
-                        'recipient_id': ancestor.id,
-                        'level': level,
-                        'amount': str(bonus_amount),
-                        'currency_type': 'rubles' if currency_type == 'cash' else 'vcoins',
-                        'transaction_id': transaction.id
-                    })
-                
-                # Levels 2-10: Depth cashback based on rank
-                elif 2 <= level <= MAX_REFERRAL_DEPTH:
-                    bonus_amount = Decimal(get_depth_bonus_amount(
-                        ancestor.user_type,
-                        ancestor.rank,
-                        level
-                    ))
-                    
-                    if bonus_amount > 0:
-                        if ancestor.user_type == 'influencer':
-                            currency_type = 'cash'
-                            ancestor.cash_balance += bonus_amount
-                        else:
-                            currency_type = 'v_coins'
-                            ancestor.v_coins_balance += bonus_amount
-                        
-                        ancestor.save(update_fields=['cash_balance', 'v_coins_balance'])
-                        
-                        # Create transaction
-                        transaction = Transaction.objects.create(
-                            user=ancestor,
-                            amount=bonus_amount,
-                            currency_type=currency_type,
-                            transaction_type='depth_bonus',
-                            related_user=user,
-                            description=f'Depth bonus from {user.first_name} (level {level})'
-                        )
-                        
-                        # Create notification
-                        create_notification(
-                            user=ancestor,
-                            title='Depth Bonus',
-                            message=f'Level {level} referral {user.first_name} completed first tournament! You received {bonus_amount} {"₽" if currency_type == "cash" else "V-Coins"}',
-                            notification_type='tournament_bonus'
-                        )
-                        
-                        bonuses_distributed.append({
-                            'recipient_id': ancestor.id,
-                            'level': level,
-                            'amount': str(bonus_amount),
-                            'currency_type': 'rubles' if currency_type == 'cash' else 'vcoins',
-                            'transaction_id': transaction.id
-                        })
-                
-                # Mark as paid
-                relation.has_paid_first_bonus = True
-                relation.save(update_fields=['has_paid_first_bonus'])
+        try:
+            with immediate_atomic():
+                data = process_first_tournament_event(user, tournament_id)
+        except IntegrityError:
+            # A concurrent request applied the same event first
+            stored = get_stored_response(*key)
+            if stored is None:
+                raise
+            return replayed_response(stored)
         
-        return Response({
-            'success': True,
-            'user_id': user.id,
-            'tournament_id': tournament_id,
-            'bonuses_distributed': bonuses_distributed
-        }, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class DepositProcessedView(APIView):
@@ -1125,7 +1710,7 @@ class DepositProcessedView(APIView):
     
     @extend_schema(
         request={'type': 'object'},
-        responses={200: {'type': 'object'}}
+        responses={200: {'type': 'object'}, 202: {'type': 'object'}}
     )
     def post(self, request):
         if not request.user or not request.user.is_authenticated:
@@ -1156,6 +1741,12 @@ class DepositProcessedView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Replay the stored response if the deposit was already applied
+        key = event_key('deposit', deposit_id=deposit_id)
+        stored = get_stored_response(*key)
+        if stored is not None:
+            return replayed_response(stored)
+        
         # Get user
         try:
             user = Member.objects.get(id=user_id)
@@ -1165,66 +1756,80 @@ class DepositProcessedView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        bonuses_distributed = []
+        if settings.PAYOUTS_ASYNC:
+            job, _ = enqueue_payout(
+                'deposit',
+                f'deposit:{deposit_id}',
+                {'user_id': user.id, 'amount': str(amount), 'deposit_id': deposit_id}
+            )
+            return Response({
+                'success': True,
+                'queued': True,
+                'job_id': job.id,
+                'user_id': user.id,
+                'deposit_id': deposit_id,
+                'amount': str(amount)
+            }, status=status.HTTP_202_ACCEPTED)
         
-        with db_transaction.atomic():
-            # Update user's total deposits
-            user.total_deposits += amount
-            user.save(update_fields=['total_deposits'])
-            
-            # Find direct referrer (level 1)
-            try:
-                direct_relation = ReferralRelation.objects.get(
-                    descendant=user,
-                    level=1
-                )
-                referrer = direct_relation.ancestor
-                
-                # Check if referrer is influencer
-                if referrer.user_type == 'influencer':
-                    # Calculate 10% bonus
-                    bonus_amount = amount * DEPOSIT_PERCENT
-                    
-                    # Add to referrer's cash balance
-                    referrer.cash_balance += bonus_amount
-                    referrer.save(update_fields=['cash_balance'])
-                    
-                    # Create transaction
-                    transaction = Transaction.objects.create(
-                        user=referrer,
-                        amount=bonus_amount,
-                        currency_type='cash',
-                        transaction_type='deposit_percent',
-                        related_user=user,
-                        description=f'10% from {user.first_name} deposit of {amount}₽ (level 1)'
-                    )
-                    
-                    # Create notification
-                    create_notification(
-                        user=referrer,
-                        title='Deposit Bonus',
-                        message=f'{user.first_name} made a deposit of {amount}₽! You received {bonus_amount}₽ (10%)',
-                        notification_type='deposit_bonus'
-                    )
-                    
-                    bonuses_distributed.append({
-                        'recipient_id': referrer.id,
-                        'level': 1,
-                        'amount': str(bonus_amount),
-                        'currency_type': 'rubles',
-                        'transaction_id': transaction.id
-                    })
-            
-            except ReferralRelation.DoesNotExist:
-                # User has no referrer
-                pass
+        try:
+            with immediate_atomic():
+                data = process_deposit_event(user, amount, deposit_id)
+        except IntegrityError:
+            # A concurrent request applied the same deposit first
+            stored = get_stored_response(*key)
+            if stored is None:
+                raise
+            return replayed_response(stored)
+        
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class EventBatchView(APIView):
+    """
+    Apply a batch of first tournament and deposit events
+    POST /api/events/batch
+    
+    Accepts a JSON array (or {"events": [...]}) or an NDJSON stream.
+    """
+    authentication_classes = [CookieAuthentication]
+    parser_classes = [JSONParser, NDJSONParser]
+    
+    @extend_schema(
+        request={'type': 'array', 'items': {'type': 'object'}},
+        responses={200: {'type': 'object'}}
+    )
+    def post(self, request):
+        if not request.user or not request.user.is_authenticated:
+            return Response(
+                {'detail': 'Not authenticated'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        events = request.data
+        if isinstance(events, dict):
+            events = events.get('events')
+        
+        if not isinstance(events, list):
+            return Response(
+                {'detail': 'A list of events is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(events) > EVENT_BATCH_MAX_SIZE:
+            return Response(
+                {'detail': f'At most {EVENT_BATCH_MAX_SIZE} events per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = ingest_events(events)
         
         return Response({
             'success': True,
-            'user_id': user.id,
-            'deposit_id': deposit_id,
-            'amount': str(amount),
-            'bonuses_distributed': bonuses_distributed
+            'processed': sum(1 for result in results if result['status'] == 'processed'),
+            'replayed': sum(1 for result in results if result['status'] == 'replayed'),
+            'duplicates': sum(1 for result in results if result['status'] == 'duplicate'),
+            'errors': sum(1 for result in results if result['status'] == 'error'),
+            'results': results
         }, status=status.HTTP_200_OK)
 
 
@@ -1319,38 +1924,12 @@ class WithdrawalListView(APIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Order by date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Get total count
-        total_count = queryset.count()
-        
-        # Calculate pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        
-        # Get paginated results
-        withdrawals = queryset[start_index:end_index]
-        
-        # Serialize data
-        serializer = WithdrawalSerializer(withdrawals, many=True)
-        
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        next_url = None
-        previous_url = None
-        
-        if end_index < total_count:
-            next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if page > 1:
-            previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
+        # Paginate newest first, by page number or by cursor
+        withdrawals, pagination = paginate(request, WithdrawalRowSerializer.rows(queryset), page, page_size)
         
         return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
-            'results': serializer.data
+            **pagination,
+            'results': WithdrawalRowSerializer.serialize(withdrawals)
         }, status=status.HTTP_200_OK)
 
 
@@ -1428,38 +2007,12 @@ class NotificationListView(APIView):
             elif is_read.lower() in ['false', '0', 'no']:
                 queryset = queryset.filter(is_read=False)
         
-        # Order by date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Get total count
-        total_count = queryset.count()
-        
-        # Calculate pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        
-        # Get paginated results
-        notifications = queryset[start_index:end_index]
-        
-        # Serialize data
-        serializer = NotificationSerializer(notifications, many=True)
-        
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        next_url = None
-        previous_url = None
-        
-        if end_index < total_count:
-            next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if page > 1:
-            previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
+        # Paginate newest first, by page number or by cursor
+        notifications, pagination = paginate(request, NotificationRowSerializer.rows(queryset), page, page_size)
         
         return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
-            'results': serializer.data
+            **pagination,
+            'results': NotificationRowSerializer.serialize(notifications)
         }, status=status.HTTP_200_OK)
 
 
@@ -1577,8 +2130,8 @@ class AdminUserListView(APIView):
         if page_size > 100:
             page_size = 100
         
-        # Build query
-        queryset = Member.objects.all()
+        # Build query, with the earnings summary of each member joined in
+        queryset = Member.objects.select_related('earnings')
         
         # Apply filters
         if user_type:
@@ -1587,26 +2140,22 @@ class AdminUserListView(APIView):
         if rank:
             queryset = queryset.filter(rank=rank)
         
-        if search:
-            queryset = queryset.filter(
-                Q(username__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(telegram_id__icontains=search)
-            )
-        
-        # Order by created_at (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Get total count
-        total_count = queryset.count()
-        
-        # Calculate pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        
-        # Get paginated results
-        users = queryset[start_index:end_index]
+        if search and request.query_params.get('ordering') == 'relevance':
+            # Typeahead: best matches only, without pagination
+            try:
+                limit = int(request.query_params.get('limit', 10))
+            except ValueError:
+                limit = 10
+            limit = max(1, min(limit, 50))
+            users = ranked_search(queryset, search, limit)
+            pagination = {'count': None, 'next': None, 'previous': None}
+        else:
+            if search:
+                condition = search_filter(search)
+                queryset = queryset.filter(condition) if condition is not None else queryset.none()
+            
+            # Paginate newest first, by page number or by cursor
+            users, pagination = paginate(request, queryset, page, page_size)
         
         # Serialize data
         results = []
@@ -1624,24 +2173,12 @@ class AdminUserListView(APIView):
                 'cash_balance': float(user.cash_balance),
                 'is_blocked': user.is_blocked,
                 'referral_code': user.referral_code,
+                'total_earnings': float(member_total_earnings(user)),
                 'created_at': user.created_at.isoformat()
             })
         
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        next_url = None
-        previous_url = None
-        
-        if end_index < total_count:
-            next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if page > 1:
-            previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
-        
         return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
+            **pagination,
             'results': results
         }, status=status.HTTP_200_OK)
 
@@ -1671,7 +2208,7 @@ class AdminUserDetailView(APIView):
             )
         
         try:
-            user = Member.objects.get(id=user_id)
+            user = Member.objects.select_related('earnings').get(id=user_id)
         except Member.DoesNotExist:
             return Response(
                 {'detail': 'User not found'},
@@ -1679,11 +2216,8 @@ class AdminUserDetailView(APIView):
             )
         
         # Calculate statistics
-        total_referrals = ReferralRelation.objects.filter(ancestor=user).count()
-        total_earnings = Transaction.objects.filter(
-            user=user,
-            transaction_type__in=['referral_bonus', 'depth_bonus', 'deposit_percent']
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        total_referrals = user.total_referrals_count
+        earnings = member_total_earnings(user)
         
         # Build response
         response_data = {
@@ -1701,7 +2235,7 @@ class AdminUserDetailView(APIView):
             'referral_code': user.referral_code,
             'referred_by': None,
             'total_referrals': total_referrals,
-            'total_earnings': float(total_earnings),
+            'total_earnings': float(earnings),
             'created_at': user.created_at.isoformat(),
             'updated_at': user.created_at.isoformat()
         }
@@ -1757,6 +2291,9 @@ class AdminUserUpdateView(APIView):
             )
         
         serializer.save()
+        if serializer.validated_data.get('is_blocked'):
+            # Log a blocked user out everywhere
+            revoke_all_sessions(user.id)
         user.refresh_from_db()
         
         # Build response
@@ -1851,18 +2388,8 @@ class AdminTransactionListView(APIView):
             except ValueError:
                 pass
         
-        # Order by date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Get total count
-        total_count = queryset.count()
-        
-        # Calculate pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        
-        # Get paginated results
-        transactions = queryset[start_index:end_index]
+        # Paginate newest first, by page number or by cursor
+        transactions, pagination = paginate(request, queryset, page, page_size)
         
         # Serialize data
         results = []
@@ -1881,21 +2408,8 @@ class AdminTransactionListView(APIView):
                 'created_at': trans.created_at.isoformat()
             })
         
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        next_url = None
-        previous_url = None
-        
-        if end_index < total_count:
-            next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if page > 1:
-            previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
-        
         return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
+            **pagination,
             'results': results
         }, status=status.HTTP_200_OK)
 
@@ -1946,18 +2460,8 @@ class AdminWithdrawalListView(APIView):
         if user_id:
             queryset = queryset.filter(user_id=user_id)
         
-        # Order by date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Get total count
-        total_count = queryset.count()
-        
-        # Calculate pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        
-        # Get paginated results
-        withdrawals = queryset[start_index:end_index]
+        # Paginate newest first, by page number or by cursor
+        withdrawals, pagination = paginate(request, queryset, page, page_size)
         
         # Serialize data
         results = []
@@ -1979,21 +2483,8 @@ class AdminWithdrawalListView(APIView):
                 'updated_at': withdrawal.created_at.isoformat()
             })
         
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        next_url = None
-        previous_url = None
-        
-        if end_index < total_count:
-            next_url = f"{base_url}?page={page + 1}&page_size={page_size}"
-        
-        if page > 1:
-            previous_url = f"{base_url}?page={page - 1}&page_size={page_size}"
-        
         return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
+            **pagination,
             'results': results
         }, status=status.HTTP_200_OK)
 
@@ -2046,7 +2537,7 @@ class AdminWithdrawalUpdateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        with db_transaction.atomic():
+        with immediate_atomic():
             # Update withdrawal status
             withdrawal.status = new_status
             withdrawal.processed_at = timezone.now()
@@ -2059,18 +2550,22 @@ class AdminWithdrawalUpdateView(APIView):
             # If approved, deduct balance
             if new_status == 'approved':
                 user = withdrawal.user
-                if user.cash_balance >= withdrawal.amount:
-                    user.cash_balance -= withdrawal.amount
-                    user.save(update_fields=['cash_balance'])
-                    
+                try:
+                    user.cash_balance = balances.debit(user.id, 'cash', withdrawal.amount)
+                except balances.InsufficientBalance:
+                    # Insufficient balance, reject the withdrawal
+                    withdrawal.status = 'rejected'
+                    withdrawal.rejection_reason = 'Insufficient balance'
+                    withdrawal.save()
+                else:
                     # Create transaction record
-                    Transaction.objects.create(
+                    record_transactions([Transaction.objects.create(
                         user=user,
                         amount=withdrawal.amount,
                         currency_type='cash',
                         transaction_type='withdrawal',
                         description=f'Withdrawal to {withdrawal.method}: {withdrawal.wallet_address}'
-                    )
+                    )])
                     
                     # Create notification
                     create_notification(
@@ -2079,11 +2574,6 @@ class AdminWithdrawalUpdateView(APIView):
                         message=f'Your withdrawal request for {withdrawal.amount}₽ has been approved and processed.',
                         notification_type='withdrawal_approved'
                     )
-                else:
-                    # Insufficient balance, reject the withdrawal
-                    withdrawal.status = 'rejected'
-                    withdrawal.rejection_reason = 'Insufficient balance'
-                    withdrawal.save()
             
             # If rejected, create notification
             if new_status == 'rejected':
@@ -2134,36 +2624,8 @@ class AdminStatsView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Calculate statistics
-        total_users = Member.objects.count()
-        total_players = Member.objects.filter(user_type='player').count()
-        total_influencers = Member.objects.filter(user_type='influencer').count()
-        
-        total_v_coins = Member.objects.aggregate(
-            total=Sum('v_coins_balance')
-        )['total'] or 0
-        
-        total_cash_payouts = Transaction.objects.filter(
-            transaction_type='withdrawal'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        total_transactions = Transaction.objects.count()
-        
-        pending_withdrawals = Withdrawal.objects.filter(status='pending').count()
-        pending_withdrawals_amount = Withdrawal.objects.filter(
-            status='pending'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        stats = {
-            'total_users': total_users,
-            'total_players': total_players,
-            'total_influencers': total_influencers,
-            'total_v_coins': float(total_v_coins),
-            'total_cash_payouts': float(total_cash_payouts),
-            'total_transactions': total_transactions,
-            'pending_withdrawals': pending_withdrawals,
-            'pending_withdrawals_amount': float(pending_withdrawals_amount)
-        }
+        # Served from the shared snapshot, refreshed in the background
+        stats = dict(admin_stats.get())
         
         return Response(stats, status=status.HTTP_200_OK)
 
@@ -2176,6 +2638,10 @@ class AdminAnalyticsView(APIView):
     authentication_classes = [CookieAuthentication]
     
     @extend_schema(
+        parameters=[
+            {'name': 'period', 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': 'bucket', 'in': 'query', 'schema': {'type': 'string'}},
+        ],
         responses={200: AdminAnalyticsSerializer}
     )
     def get(self, request):
@@ -2206,50 +2672,35 @@ class AdminAnalyticsView(APIView):
         else:  # default 30days
             start_date = now - timedelta(days=30)
         
-        # Registrations by day
-        registrations_by_day = []
-        for i in range((now.date() - start_date.date()).days + 1):
-            date = start_date.date() + timedelta(days=i)
-            count = Member.objects.filter(
-                created_at__date=date
-            ).count()
-            registrations_by_day.append({
-                'date': date.isoformat(),
-                'count': count
-            })
+        # Long periods are downsampled unless a bucket is requested
+        bucket = request.query_params.get('bucket')
+        if bucket not in ['day', 'week', 'month']:
+            bucket = 'week' if period == '1year' else 'day'
         
-        # Activity by day (transactions)
-        activity_by_day = []
-        for i in range((now.date() - start_date.date()).days + 1):
-            date = start_date.date() + timedelta(days=i)
-            transactions = Transaction.objects.filter(
-                created_at__date=date
-            )
-            activity_by_day.append({
-                'date': date.isoformat(),
-                'transactions_count': transactions.count(),
-                'total_amount': float(transactions.aggregate(total=Sum('amount'))['total'] or 0)
-            })
+        # Registrations and activity (transactions) per bucket from the daily rollups
+        registrations_by_day, activity_by_day = activity_series(
+            timezone.localdate(start_date),
+            timezone.localdate(now),
+            bucket
+        )
         
-        # Top referrers
+        # Top referrers from the in-memory leaderboard
+        top = leaderboards.board('descendants').top(10)
+        referrer_ids = [member_id for member_id, _, _ in top]
+        referrers = Member.objects.in_bulk(referrer_ids)
+        earnings = total_earnings_many(referrer_ids)
         top_referrers = []
-        referrers = Member.objects.annotate(
-            referrals_count=Count('descendant_relations')
-        ).filter(referrals_count__gt=0).order_by('-referrals_count')[:10]
-        
-        for referrer in referrers:
-            total_earnings = Transaction.objects.filter(
-                user=referrer,
-                transaction_type__in=['referral_bonus', 'depth_bonus', 'deposit_percent']
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
+        for member_id, _, referrals_count in top:
+            referrer = referrers.get(member_id)
+            if referrer is None:
+                continue
             top_referrers.append({
                 'user_id': referrer.id,
                 'username': referrer.username,
                 'first_name': referrer.first_name,
                 'user_type': referrer.user_type,
-                'referrals_count': referrer.referrals_count,
-                'total_earnings': float(total_earnings)
+                'referrals_count': referrals_count,
+                'total_earnings': float(earnings[referrer.id])
             })
         
         analytics = {
@@ -2261,11 +2712,38 @@ class AdminAnalyticsView(APIView):
         return Response(analytics, status=status.HTTP_200_OK)
 
 
+class AdminMemberFilterMetricsView(APIView):
+    """
+    Get registration Bloom filter metrics of the serving worker (Admin only)
+    GET /api/admin/metrics/member-filter
+    """
+    authentication_classes = [CookieAuthentication]
+    
+    @extend_schema(
+        responses={200: {'type': 'object'}}
+    )
+    def get(self, request):
+        if not request.user or not request.user.is_authenticated:
+            return Response(
+                {'detail': 'Not authenticated'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        # Check if user is admin
+        if not request.user.is_admin:
+            return Response(
+                {'detail': 'Admin access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response(member_filter.stats(), status=status.HTTP_200_OK)
+
+
 class HelloView(APIView):
     """
     A simple API endpoint that returns a greeting message.
     """
-
+    
     @extend_schema(
         responses={200: MessageSerializer}, description="Get a hello world message"
     )
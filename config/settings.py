@@ -62,6 +62,38 @@ SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
 SESSION_SAVE_EVERY_REQUEST = False
 
+# Per-worker LRU of unpacked member ancestor chains (entries)
+ANCESTOR_CACHE_SIZE = int(os.environ.get("ANCESTOR_CACHE_SIZE", "100000"))
+
+# Unused referral codes kept ready by the refill_referral_codes command
+REFERRAL_CODE_POOL_SIZE = int(os.environ.get("REFERRAL_CODE_POOL_SIZE", "10000"))
+
+# Seconds a list count requested in cursor pagination mode is reused
+PAGINATION_COUNT_CACHE_TTL = int(os.environ.get("PAGINATION_COUNT_CACHE_TTL", "60"))
+
+# Seconds an admin stats snapshot is served before a background refresh
+ADMIN_STATS_SNAPSHOT_TTL = int(os.environ.get("ADMIN_STATS_SNAPSHOT_TTL", "10"))
+
+# Seconds a worker serves its in-memory leaderboards before reloading them
+LEADERBOARD_REFRESH_SECONDS = int(os.environ.get("LEADERBOARD_REFRESH_SECONDS", "30"))
+
+# Per-worker Bloom filters of member telegram IDs and referral codes
+MEMBER_FILTER_CAPACITY = int(os.environ.get("MEMBER_FILTER_CAPACITY", "1000000"))
+MEMBER_FILTER_ERROR_RATE = float(os.environ.get("MEMBER_FILTER_ERROR_RATE", "0.01"))
+# Seconds between catch-up scans for members created by other workers
+MEMBER_FILTER_REFRESH_SECONDS = float(os.environ.get("MEMBER_FILTER_REFRESH_SECONDS", "1.0"))
+# Minimum seconds between the early catch-ups triggered by referral code misses
+MEMBER_FILTER_MISS_REFRESH_SECONDS = float(os.environ.get("MEMBER_FILTER_MISS_REFRESH_SECONDS", "0.1"))
+
+# Queue first tournament and deposit payouts for the process_payout_jobs worker
+# instead of paying them inside the webhook request
+PAYOUTS_ASYNC = os.environ.get("PAYOUTS_ASYNC") == "1"
+PAYOUT_JOB_MAX_ATTEMPTS = int(os.environ.get("PAYOUT_JOB_MAX_ATTEMPTS", "5"))
+# Base retry delay in seconds, doubled after every failed attempt
+PAYOUT_JOB_RETRY_DELAY = int(os.environ.get("PAYOUT_JOB_RETRY_DELAY", "10"))
+# Processing jobs older than this are assumed orphaned by a crashed worker
+PAYOUT_JOB_LEASE_SECONDS = int(os.environ.get("PAYOUT_JOB_LEASE_SECONDS", "300"))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -128,9 +160,27 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "persistent" / "db" / "db.sqlite3",
+        # Persistent connections per worker, checked before reuse
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Seconds a connection waits for a lock before "database is locked"
+            "timeout": float(os.environ.get("SQLITE_BUSY_TIMEOUT", "10")),
+        },
     }
 }
 
+# Pragmas run on every new SQLite connection by api.db, in this order
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "normal"),
+    # Bytes of the database file memory-mapped per connection
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Page cache per connection, negative values are KiB
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "memory"),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -40,3 +40,16 @@ export const getTransactionsForAnalytics = async (params = {}) => {
   });
   return response.data;
 };
+
+/**
+ * Get the top referrers leaderboard with the current user's rank
+ * @param {string} by - Score: 'descendants', 'direct' or 'earnings'
+ * @param {number} limit - Number of entries (1-100)
+ * @returns {Promise} Leaderboard data
+ */
+export const getLeaderboard = async (by = 'descendants', limit = 10) => {
+  const response = await instance.get('/api/leaderboard', {
+    params: { by, limit }
+  });
+  return response.data;
+};
@@ -15,9 +15,9 @@ import {
   ResponsiveContainer,
   Cell
 } from 'recharts';
-import { TrendingUp, Users, Award, DollarSign, Calendar } from 'lucide-react';
+import { TrendingUp, Users, Award, DollarSign, Calendar, Trophy } from 'lucide-react';
 import useAuthStore from '../../store/authStore';
-import { getUserStatistics, getUserReferralsStats, getTransactionsForAnalytics } from '../../api/statistics';
+import { getUserStatistics, getUserReferralsStats, getTransactionsForAnalytics, getLeaderboard } from '../../api/statistics';
 import Layout from '../Layout';
 import Card from '../common/Card';
 import './styles.css';
@@ -29,6 +29,11 @@ const RANK_REQUIREMENTS = {
   gold: { next: 'platinum', required: 50 },
   platinum: { next: null, required: 0 }
 };
+const LEADERBOARD_TABS = [
+  { by: 'descendants', label: 'Вся структура' },
+  { by: 'direct', label: 'Прямые рефералы' },
+  { by: 'earnings', label: 'Заработок' }
+];
 
 const Statistics = () => {
   const navigate = useNavigate();
@@ -38,6 +43,8 @@ const Statistics = () => {
   const [stats, setStats] = useState(null);
   const [referrals, setReferrals] = useState(null);
   const [transactions, setTransactions] = useState([]);
+  const [leaderboardBy, setLeaderboardBy] = useState('descendants');
+  const [leaderboard, setLeaderboard] = useState(null);
 
   useEffect(() => {
     if (!isAuthenticated) {
@@ -47,6 +54,11 @@ const Statistics = () => {
     loadStatistics();
   }, [isAuthenticated, user, period]);
 
+  useEffect(() => {
+    if (!isAuthenticated || !user) return;
+    loadLeaderboard();
+  }, [isAuthenticated, user, leaderboardBy]);
+
   const loadStatistics = async () => {
     if (!user) return;
     
@@ -71,6 +83,21 @@ const Statistics = () => {
     }
   };
 
+  const loadLeaderboard = async () => {
+    try {
+      setLeaderboard(await getLeaderboard(leaderboardBy, 10));
+    } catch (error) {
+      console.error('Failed to load leaderboard:', error);
+    }
+  };
+
+  const formatLeaderboardScore = (score) => {
+    if (leaderboardBy === 'earnings') {
+      return Math.round(score).toLocaleString('ru-RU');
+    }
+    return `${score} реф.`;
+  };
+
   const getDateBefore = (days) => {
     const date = new Date();
     date.setDate(date.getDate() - days);
@@ -505,6 +532,55 @@ const Statistics = () => {
             )}
           </div>
         </Card>
+
+        {/* Leaderboard */}
+        <Card className="top-referrals-card leaderboard-card">
+          <div className="leaderboard-header">
+            <h2>
+              <Trophy size={24} />
+              Рейтинг рефереров
+            </h2>
+            <div className="period-selector">
+              {LEADERBOARD_TABS.map(tab => (
+                <button
+                  key={tab.by}
+                  className={leaderboardBy === tab.by ? 'active' : ''}
+                  onClick={() => setLeaderboardBy(tab.by)}
+                >
+                  {tab.label}
+                </button>
+              ))}
+            </div>
+          </div>
+          <div className="top-referrals-list">
+            {leaderboard?.entries.length > 0 ? (
+              leaderboard.entries.map(entry => (
+                <div
+                  key={entry.user_id}
+                  className={`top-referral-item${entry.user_id === user?.id ? ' leaderboard-me' : ''}`}
+                >
+                  <div className="referral-rank">#{entry.rank}</div>
+                  <div className="referral-info">
+                    <p className="referral-name">
+                      {entry.first_name}
+                      {entry.username && <span className="referral-username">@{entry.username}</span>}
+                    </p>
+                  </div>
+                  <div className="referral-income">{formatLeaderboardScore(entry.score)}</div>
+                </div>
+              ))
+            ) : (
+              <p className="no-referrals">Рейтинг пока пуст</p>
+            )}
+          </div>
+          {leaderboard && (
+            <p className="leaderboard-my-rank">
+              {leaderboard.me.rank
+                ? <>Ваше место: <strong>#{leaderboard.me.rank}</strong> ({formatLeaderboardScore(leaderboard.me.score)})</>
+                : 'Вы пока не в рейтинге'}
+            </p>
+          )}
+        </Card>
       </div>
     </Layout>
   );